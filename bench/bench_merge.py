@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""单位合并微基准：总单位数增长时，单次移动+合并的耗时应保持平稳
+
+对比旧实现（每次合并重建整个单位列表）与按格子原地合并。
+用法: python bench/bench_merge.py
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'game'))
+
+from game_state import GameState
+from units import Unit
+
+UNIT_COUNTS = [100, 1000, 10000, 50000]
+MOVES = 2000
+LEGACY_MOVES = 200
+
+
+def legacy_merge_units_at_location(units, x, y, owner_id):
+    """旧版合并：遍历并重建全部单位列表（仅用于对比）"""
+    type_groups = {}
+    other_units = []
+    for unit in units:
+        if unit.x == x and unit.y == y and unit.owner_id == owner_id:
+            type_groups.setdefault(unit.unit_type, []).append(unit)
+        else:
+            other_units.append(unit)
+    merged = []
+    for group in type_groups.values():
+        main_unit = group[0]
+        for other in group[1:]:
+            main_unit.merge_with(other)
+        merged.append(main_unit)
+    return other_units + merged
+
+
+def build_state(unit_count: int) -> GameState:
+    """构建含指定数量单位的对局（单位随机分布在全图，避开基准用的格子）"""
+    state = GameState()
+    state.initialize_game(['A', 'B'], map_seed=1, map_width=180, map_height=90)
+    reserved = set(bench_cells(state))
+    rng = random.Random(unit_count)
+    while len(state.units) < unit_count:
+        x = rng.randrange(state.game_map.width)
+        y = rng.randrange(state.game_map.height)
+        if (x, y) not in reserved:
+            state.units.add(Unit('basic_infantry', x, y, rng.randint(0, 1), count=1))
+    return state
+
+
+def bench_cells(state: GameState):
+    """基准中来回移动的两个相邻格子（首都附近的己方领土）"""
+    player = state.get_player(0)
+    return [(player.capital_x, player.capital_y + 2), (player.capital_x + 1, player.capital_y + 2)]
+
+
+def bench_moves(state: GameState) -> float:
+    """在两个格子的摩托兵堆之间来回拆出1k并移动（每次移动都会触发合并），返回每次耗时(us)"""
+    cells = bench_cells(state)
+    stacks = {}
+    for cell in cells:
+        stacks[cell] = Unit('motorcycle', cell[0], cell[1], 0, count=MOVES)
+        state.units.add(stacks[cell])
+
+    start = time.perf_counter()
+    for i in range(MOVES):
+        src, dst = cells[i % 2], cells[(i + 1) % 2]
+        mover = stacks[src].split(1)
+        state.units.add(mover)
+        mover.reset_moves()
+        success, msg = state.move_unit(0, mover.id, dst[0], dst[1])
+        assert success, msg
+    elapsed = time.perf_counter() - start
+    return elapsed / MOVES * 1e6
+
+
+def bench_legacy(state: GameState) -> float:
+    """旧实现：每次移动后对整个单位列表做一次合并重建，返回每次耗时(us)"""
+    units = list(state.units)
+    mover = Unit('motorcycle', 0, 0, 0, count=1)
+    units.append(mover)
+    start = time.perf_counter()
+    for i in range(LEGACY_MOVES):
+        mover.x = i % 2
+        units = legacy_merge_units_at_location(units, mover.x, 0, 0)
+    elapsed = time.perf_counter() - start
+    return elapsed / LEGACY_MOVES * 1e6
+
+
+def main():
+    print(f"{'总单位数':>10} | {'原地合并(us/次)':>16} | {'旧版重建(us/次)':>16}")
+    print("-" * 50)
+    for count in UNIT_COUNTS:
+        legacy = bench_legacy(build_state(count))
+        per_move = bench_moves(build_state(count))
+        print(f"{count:>10} | {per_move:>16.1f} | {legacy:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
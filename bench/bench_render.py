@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""渲染基准：在领土铺满视野的画面上测量每帧输出字节数和渲染耗时
+
+比较逐格样式（每格 样式+字符+复位）与按样式分段输出两种编码，
+并测量整屏重绘、光标移动、摄像机平移三种帧。
+用法: python bench/bench_render.py [--frames N]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'game'))
+
+from config import COLOR_RESET, RECOMMENDED_MAP_SIZES
+from game_state import GameState
+from renderer import Renderer
+from screen import ScreenBuffer, cells_text
+
+NUM_PLAYERS = 4
+
+
+def per_cell_text(cells) -> str:
+    """旧的逐格编码，作为对照"""
+    return ''.join(f'{style}{char}{COLOR_RESET}' if style else char for char, style in cells)
+
+
+def build_state() -> GameState:
+    """领土铺满地图的对局：每个玩家占据地图的一个纵向条带"""
+    width, height = RECOMMENDED_MAP_SIZES[NUM_PLAYERS]
+    state = GameState()
+    state.initialize_game([f'P{i}' for i in range(NUM_PLAYERS)], map_seed=1,
+                          map_width=width, map_height=height)
+    for x in range(width):
+        for y in range(height):
+            state.game_map.set_territory(x, y, x * NUM_PLAYERS // width)
+    return state
+
+
+def make_renderer(state: GameState) -> Renderer:
+    renderer = Renderer()
+    renderer.screen = ScreenBuffer(io.StringIO())
+    player = state.get_player(0)
+    renderer.selected_x, renderer.selected_y = player.capital_x, player.capital_y
+    renderer.center_camera_on(player.capital_x, player.capital_y, state)
+    return renderer
+
+
+def run_frames(state: GameState, renderer: Renderer, frames: int, step) -> dict:
+    """每帧先调用step修改视图再渲染，返回平均字节数和耗时"""
+    renderer.render_game(state, 0)
+    total_bytes = 0
+    start = time.perf_counter()
+    for i in range(frames):
+        step(renderer, i)
+        renderer.render_game(state, 0)
+        total_bytes += renderer.screen.last_frame_bytes
+    elapsed = time.perf_counter() - start
+    return {'bytes': total_bytes / frames, 'ms': elapsed / frames * 1000}
+
+
+def encode_map(state: GameState, renderer: Renderer, encode, frames: int) -> dict:
+    """只编码地图区域（不含差量比较），比较两种编码"""
+    rows = renderer._render_map(state, 0)
+    size = sum(len(encode(row).encode()) for row in rows)
+    start = time.perf_counter()
+    for _ in range(frames):
+        for row in rows:
+            encode(row)
+    return {'bytes': size, 'ms': (time.perf_counter() - start) / frames * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="渲染基准")
+    parser.add_argument('--frames', type=int, default=200)
+    args = parser.parse_args()
+
+    state = build_state()
+    renderer = make_renderer(state)
+    print(f"{NUM_PLAYERS}人地图 {state.game_map.width}x{state.game_map.height}，"
+          f"视野 {renderer.view_width}x{renderer.view_height}，每项 {args.frames} 帧")
+
+    print(f"\n{'地图编码':<10} {'字节/帧':>10} {'耗时(ms)':>10}")
+    for name, encode in (('逐格样式', per_cell_text), ('分段样式', cells_text)):
+        r = encode_map(state, renderer, encode, args.frames)
+        print(f"{name:<10} {r['bytes']:>10.0f} {r['ms']:>10.3f}")
+
+    def full(r, i):
+        r.screen.invalidate()
+
+    def cursor(r, i):
+        r.selected_x += 1 if i % 20 < 10 else -1
+
+    def pan(r, i):
+        r.move_camera(1 if i % 20 < 10 else -1, 0, state)
+
+    print(f"\n{'整帧':<10} {'字节/帧':>10} {'耗时(ms)':>10}")
+    for name, step in (('整屏重绘', full), ('光标移动', cursor), ('摄像机平移', pan)):
+        r = run_frames(state, make_renderer(state), args.frames, step)
+        print(f"{name:<10} {r['bytes']:>10.0f} {r['ms']:>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
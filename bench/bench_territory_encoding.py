@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""领土编码基准：比较嵌套列表（协议1）与游程编码+base64（协议2）的体积和编解码耗时
+
+在每个推荐地图尺寸上模拟中期对局的领土分布。
+用法: python bench/bench_territory_encoding.py
+"""
+
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'game'))
+
+from config import RECOMMENDED_MAP_SIZES
+from game_state import GameState
+from map_generator import create_game_map
+
+REPEATS = 50
+EXPANSIONS_PER_PLAYER = 30
+
+
+def build_state(num_players: int, width: int, height: int) -> GameState:
+    """构建对局，并让每个玩家从首都向外随机扩张领土"""
+    state = GameState()
+    state.initialize_game([f'P{i}' for i in range(num_players)], map_seed=num_players,
+                          map_width=width, map_height=height)
+    rng = random.Random(num_players)
+    for player in state.players.values():
+        x, y = player.capital_x, player.capital_y
+        for _ in range(EXPANSIONS_PER_PLAYER):
+            x = min(max(x + rng.randint(-3, 3), 0), width - 1)
+            y = min(max(y + rng.randint(-3, 3), 0), height - 1)
+            state.game_map.claim_territory_radius(x, y, rng.randint(1, 3), player.id)
+    return state
+
+
+def timed(func) -> float:
+    """返回平均耗时(ms)"""
+    start = time.perf_counter()
+    for _ in range(REPEATS):
+        func()
+    return (time.perf_counter() - start) / REPEATS * 1000
+
+
+def bench_size(num_players: int, width: int, height: int) -> dict:
+    game_map = build_state(num_players, width, height).game_map
+    target = create_game_map(width, height)
+
+    rows_payload = json.dumps(game_map.get_territory_rows())
+    rle_payload = json.dumps(game_map.encode_territory())
+
+    return {
+        'rows_bytes': len(rows_payload),
+        'rle_bytes': len(rle_payload),
+        'rows_encode': timed(lambda: json.dumps(game_map.get_territory_rows())),
+        'rle_encode': timed(lambda: json.dumps(game_map.encode_territory())),
+        'rows_decode': timed(lambda: target.load_territory(json.loads(rows_payload))),
+        'rle_decode': timed(lambda: target.load_encoded_territory(json.loads(rle_payload))),
+    }
+
+
+def main():
+    backend = type(create_game_map(1, 1)).__name__
+    print(f"地图实现: {backend}，每项重复 {REPEATS} 次")
+    print(f"{'玩家':>4} {'尺寸':>8} | {'列表(B)':>9} {'游程(B)':>8} | "
+          f"{'列表编码':>8} {'游程编码':>8} | {'列表解码':>8} {'游程解码':>8} (ms)")
+    print("-" * 86)
+    for num_players, (width, height) in sorted(RECOMMENDED_MAP_SIZES.items()):
+        r = bench_size(num_players, width, height)
+        print(f"{num_players:>4} {width:>4}x{height:<3} | {r['rows_bytes']:>9} {r['rle_bytes']:>8} | "
+              f"{r['rows_encode']:>8.3f} {r['rle_encode']:>8.3f} | {r['rows_decode']:>8.3f} {r['rle_decode']:>8.3f}")
+
+
+if __name__ == '__main__':
+    main()
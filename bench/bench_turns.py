@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+"""无界面回合基准：在每个推荐地图尺寸上构建合成对局，测量模拟核心各操作的吞吐、延迟和内存峰值
+
+不使用Renderer和网络，按固定种子执行脚本化的回合，结果以JSON输出，便于比较不同版本的扩展性。
+用法: python bench/bench_turns.py [--units-per-player N] [--buildings-per-player N]
+                                  [--stations-per-player N] [--turns N] [--sizes 2,4,8] [--output result.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'game'))
+
+from buildings import create_building
+from config import RECOMMENDED_MAP_SIZES, TERRAIN_RIVER, UNITS
+from game_state import GameState
+from units import Unit
+
+TERRITORY_RADIUS = 12
+UNIT_TYPES = list(UNITS)
+CORE_BUILDINGS = ['factory', 'city', 'barracks', 'arms_factory']
+
+
+def land_cells(state: GameState, player_id: int, rng: random.Random, count: int):
+    """随机取玩家领土内的非河流格子（可能重复）"""
+    cells = [(x, y) for x, y in state.game_map.get_owner_cells(player_id)
+             if state.game_map.get_terrain(x, y) != TERRAIN_RIVER]
+    return [rng.choice(cells) for _ in range(count)] if cells else []
+
+
+def build_game(num_players: int, width: int, height: int, units_per_player: int,
+               buildings_per_player: int, stations_per_player: int, seed: int) -> GameState:
+    """构建合成对局：扩大每个玩家的领土，按密度铺设建筑、车站和单位"""
+    state = GameState()
+    state.initialize_game([f'P{i}' for i in range(num_players)], map_seed=seed,
+                          map_width=width, map_height=height)
+    rng = random.Random(seed)
+    for player in state.players.values():
+        player.economy = 10 ** 9
+        state.game_map.claim_territory_radius(player.capital_x, player.capital_y, TERRITORY_RADIUS, player.id)
+    for player in state.players.values():
+        free = [cell for cell in dict.fromkeys(land_cells(state, player.id, rng, buildings_per_player * 4))
+                if not state.buildings.at(*cell)]
+        rng.shuffle(free)
+        types = ['train_station'] * stations_per_player + \
+                [CORE_BUILDINGS[i % len(CORE_BUILDINGS)] for i in range(buildings_per_player)]
+        for (x, y), building_type in zip(free, types):
+            state.buildings.add(create_building(building_type, x, y, player.id))
+        for x, y in land_cells(state, player.id, rng, units_per_player):
+            unit = Unit(rng.choice(UNIT_TYPES), x, y, player.id, count=rng.randint(1, 20))
+            unit.reset_moves()
+            state.units.add(unit)
+    state.rebuild_all_railways()
+    return state
+
+
+def neighbours(x: int, y: int):
+    return [(x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)]
+
+
+class OpRecorder:
+    """记录每次操作的耗时；tracemalloc只在单独的一次调用中开启，避免影响计时"""
+
+    def __init__(self):
+        self.samples = {}
+        self.failures = {}  # 返回 (False, 信息) 的次数
+        self.peaks = {}
+
+    def timed(self, name: str, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        self.samples.setdefault(name, []).append(time.perf_counter() - start)
+        if isinstance(result, tuple) and result and result[0] is False:
+            self.failures[name] = self.failures.get(name, 0) + 1
+        return result
+
+    def measure_peak(self, name: str, func, *args):
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        func(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        self.peaks[name] = max(self.peaks.get(name, 0), peak - baseline)
+
+    def report(self) -> dict:
+        ops = {}
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            total = sum(ordered)
+            ops[name] = {
+                'count': len(ordered),
+                'failed': self.failures.get(name, 0),
+                'ops_per_sec': len(ordered) / total if total else None,
+                'p50_ms': statistics.median(ordered) * 1000,
+                'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+                'peak_kb': self.peaks.get(name, 0) / 1024
+            }
+        return ops
+
+
+def script_moves(state: GameState, recorder: OpRecorder, rng: random.Random, moves: int):
+    """随机挑选单位向相邻陆地格移动（避开敌军）"""
+    units = list(state.units)
+    for unit in rng.sample(units, min(moves, len(units))):
+        if unit not in state.units:
+            continue
+        targets = [(x, y) for x, y in neighbours(unit.x, unit.y)
+                   if state.game_map.get_terrain(x, y) not in (None, TERRAIN_RIVER)
+                   and not any(u.owner_id != unit.owner_id for u in state.get_units_at(x, y))]
+        if targets:
+            unit.reset_moves()
+            recorder.timed('move_unit', state.move_unit, unit.owner_id, unit.id, *rng.choice(targets))
+
+
+def script_attacks(state: GameState, recorder: OpRecorder, rng: random.Random, attacks: int):
+    """在随机单位旁放置一支敌军并发起攻击"""
+    player_ids = list(state.players)
+    units = list(state.units)
+    for attacker in rng.sample(units, min(attacks, len(units))):
+        if attacker not in state.units:
+            continue
+        targets = [(x, y) for x, y in neighbours(attacker.x, attacker.y)
+                   if state.game_map.get_terrain(x, y) not in (None, TERRAIN_RIVER)]
+        if not targets:
+            continue
+        x, y = rng.choice(targets)
+        enemy_id = rng.choice([pid for pid in player_ids if pid != attacker.owner_id] or player_ids)
+        state.units.add(Unit(rng.choice(UNIT_TYPES), x, y, enemy_id, count=rng.randint(1, 20)))
+        attacker.reset_moves()
+        recorder.timed('attack', state.attack, attacker.owner_id, attacker.id, x, y)
+
+
+def bench_size(num_players: int, width: int, height: int, args) -> dict:
+    seed = args.seed + num_players
+    build_start = time.perf_counter()
+    state = build_game(num_players, width, height, args.units_per_player,
+                       args.buildings_per_player, args.stations_per_player, seed)
+    build_ms = (time.perf_counter() - build_start) * 1000
+    recorder = OpRecorder()
+    rng = random.Random(seed)
+    sizes = {'units': len(state.units), 'buildings': len(state.buildings)}
+
+    for _ in range(args.turns):
+        script_moves(state, recorder, rng, args.moves_per_turn)
+        script_attacks(state, recorder, rng, args.attacks_per_turn)
+        recorder.timed('rebuild_all_railways', state.rebuild_all_railways)
+        data = recorder.timed('to_dict', state.to_dict)
+        payload = json.loads(json.dumps(data))
+        recorder.timed('from_dict', GameState.from_dict, payload)
+        for player in state.players.values():
+            player.ready_for_next_turn = True
+        recorder.timed('process_turn', state.process_turn)
+
+    # 内存峰值：每种操作单独再执行一次
+    recorder.measure_peak('rebuild_all_railways', state.rebuild_all_railways)
+    recorder.measure_peak('to_dict', state.to_dict)
+    recorder.measure_peak('from_dict', GameState.from_dict, json.loads(json.dumps(state.to_dict())))
+    recorder.measure_peak('process_turn', state.process_turn)
+    recorder.measure_peak('move_unit', script_moves, state, OpRecorder(), rng, 1)
+    recorder.measure_peak('attack', script_attacks, state, OpRecorder(), rng, 1)
+
+    return {
+        'players': num_players,
+        'width': width,
+        'height': height,
+        'initial': sizes,
+        'final': {'units': len(state.units), 'buildings': len(state.buildings)},
+        'build_ms': build_ms,
+        'ops': recorder.report()
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="无界面回合基准")
+    parser.add_argument('--units-per-player', type=int, default=200)
+    parser.add_argument('--buildings-per-player', type=int, default=20)
+    parser.add_argument('--stations-per-player', type=int, default=3)
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--moves-per-turn', type=int, default=50)
+    parser.add_argument('--attacks-per-turn', type=int, default=20)
+    parser.add_argument('--sizes', default=','.join(str(n) for n in sorted(RECOMMENDED_MAP_SIZES)),
+                        help="玩家数列表（RECOMMENDED_MAP_SIZES中的键），逗号分隔")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="JSON输出文件（默认输出到标准输出）")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = []
+    for num_players in (int(n) for n in args.sizes.split(',')):
+        width, height = RECOMMENDED_MAP_SIZES[num_players]
+        print(f"{num_players}人 {width}x{height} ...", file=sys.stderr)
+        results.append(bench_size(num_players, width, height, args))
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'results': results
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
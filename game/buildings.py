@@ -1,12 +1,17 @@
 # -*- coding: utf-8 -*-
 """建筑系统"""
 
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from config import BUILDINGS, DEMOLISH_REFUND_RATE, INTERCEPTOR_COOLDOWN
 
+_UNSET = object()
+
 
 class Building:
     """建筑基类"""
 
+    _index: Optional['BuildingIndex'] = None  # 所在的建筑索引，属性变化时记入其变化集
+
     def __init__(self, building_type: str, x: int, y: int, owner_id: int, level: int = 1):
         self.building_type = building_type
         self.x = x
@@ -16,6 +21,13 @@ class Building:
         self.config = BUILDINGS[building_type]
         self.built_this_turn = False  # 是否本回合建造
 
+    def __setattr__(self, name, value):
+        # 值改变时记入所在索引的变化集（列表随后可能被原地修改，总是记入），增量同步据此只发送变化的建筑
+        index = self._index
+        if index is not None and (getattr(self, name, _UNSET) != value or type(value) is list):
+            index._changed[id(self)] = self
+        object.__setattr__(self, name, value)
+
     @property
     def name(self) -> str:
         return f"{self.config['name']}(Lv.{self.level})"
@@ -316,6 +328,99 @@ class TrainStation(Building):
         return data
 
 
+class BuildingIndex:
+    """
+    建筑索引 - 按位置、类型和所属玩家维护建筑，查询为O(1)
+    同时记录自上次take_changes以来新增或属性变化的建筑、以及移除或移走建筑的原位置（供增量同步）
+    """
+
+    def __init__(self, buildings: Iterable[Building] = ()):
+        self._all: Dict[int, Building] = {}  # 按加入顺序保存 {id(building): building}
+        self._by_pos: Dict[Tuple[int, int], Building] = {}
+        self._by_type: Dict[str, Dict[int, Building]] = {}
+        self._by_owner: Dict[int, Dict[int, Building]] = {}
+        self._version_seq = 0  # 增删、移动或转移所有权时递增
+        self._changed: Dict[int, Building] = {}  # 新增或属性变化的建筑（由Building.__setattr__记录）
+        self._removed: Set[Tuple[int, int]] = set()  # 移除或移走了建筑的位置
+        for building in buildings:
+            self.add(building)
+
+    def __iter__(self) -> Iterator[Building]:
+        # 返回快照，允许遍历时增删建筑
+        return iter(list(self._all.values()))
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    def __contains__(self, building: Building) -> bool:
+        return id(building) in self._all
+
+    def add(self, building: Building):
+        """加入建筑"""
+        key = id(building)
+        self._all[key] = building
+        self._by_pos[(building.x, building.y)] = building
+        self._by_type.setdefault(building.building_type, {})[key] = building
+        self._by_owner.setdefault(building.owner_id, {})[key] = building
+        object.__setattr__(building, '_index', self)  # 不经__setattr__记录
+        self._changed[key] = building
+        self._version_seq += 1
+
+    def remove(self, building: Building):
+        """移除建筑"""
+        key = id(building)
+        if self._all.pop(key, None) is None:
+            return
+        if self._by_pos.get((building.x, building.y)) is building:
+            del self._by_pos[(building.x, building.y)]
+            self._removed.add((building.x, building.y))
+        self._by_type.get(building.building_type, {}).pop(key, None)
+        self._by_owner.get(building.owner_id, {}).pop(key, None)
+        object.__setattr__(building, '_index', None)
+        self._changed.pop(key, None)
+        self._version_seq += 1
+
+    def update_position(self, building: Building, old_x: int, old_y: int):
+        """建筑坐标改变后更新位置索引（如移动发射平台）"""
+        if self._by_pos.get((old_x, old_y)) is building:
+            del self._by_pos[(old_x, old_y)]
+        self._by_pos[(building.x, building.y)] = building
+        self._removed.add((old_x, old_y))
+        self._version_seq += 1
+
+    def take_changes(self) -> Tuple[List[Building], List[Tuple[int, int]]]:
+        """取走上次调用以来新增或变化的建筑，以及移除或移走了建筑的位置（同一位置可能又有了新建筑）"""
+        changed = list(self._changed.values())
+        removed = sorted(self._removed)
+        self._changed = {}
+        self._removed = set()
+        return changed, removed
+
+    def set_owner(self, building: Building, owner_id: int):
+        """转移建筑所有权"""
+        key = id(building)
+        self._by_owner.get(building.owner_id, {}).pop(key, None)
+        building.owner_id = owner_id
+        self._by_owner.setdefault(owner_id, {})[key] = building
+        self._version_seq += 1
+
+    def version(self) -> int:
+        """建筑的版本号（增删、移动或转移所有权后变化）"""
+        return self._version_seq
+
+    def at(self, x: int, y: int) -> Optional[Building]:
+        """获取指定位置的建筑"""
+        return self._by_pos.get((x, y))
+
+    def of_type(self, building_type: str) -> List[Building]:
+        """获取指定类型的所有建筑"""
+        return list(self._by_type.get(building_type, {}).values())
+
+    def owned_by(self, owner_id: int) -> List[Building]:
+        """获取指定玩家的所有建筑"""
+        return list(self._by_owner.get(owner_id, {}).values())
+
+
 def create_building(building_type: str, x: int, y: int, owner_id: int, level: int = 1, extra_data: dict = None) -> Building:
     """工厂方法创建建筑"""
     building = None
@@ -360,6 +465,44 @@ def create_building(building_type: str, x: int, y: int, owner_id: int, level: in
     return building
 
 
+BUILDING_COLUMNS = ('type', 'x', 'y', 'owner_id', 'level')
+
+
+def buildings_to_columns(buildings: Iterable[Building]) -> dict:
+    """
+    按列序列化建筑：每个字段一个数组，建筑类型名只在types表中出现一次（type列为下标）
+    核设施、车站等的附加字段及built_this_turn只为需要的建筑记录在extra中 {行号: {字段: 值}}
+    """
+    types: Dict[str, int] = {}
+    codes, xs, ys, owners, levels = [], [], [], [], []
+    extra = {}
+    for i, building in enumerate(buildings):
+        code = types.get(building.building_type)
+        if code is None:
+            code = types[building.building_type] = len(types)
+        codes.append(code)
+        xs.append(building.x)
+        ys.append(building.y)
+        owners.append(building.owner_id)
+        levels.append(building.level)
+        if type(building).to_dict is not Building.to_dict:
+            data = building.to_dict()
+            extra[str(i)] = {key: value for key, value in data.items() if key not in BUILDING_COLUMNS}
+        elif building.built_this_turn:
+            extra[str(i)] = {'built_this_turn': True}
+    return {'types': list(types), 'type': codes, 'x': xs, 'y': ys, 'owner_id': owners, 'level': levels,
+            'extra': extra}
+
+
+def buildings_from_columns(columns: dict) -> List[Building]:
+    """按列数据还原建筑"""
+    types = columns['types']
+    extra = columns['extra']
+    return [create_building(types[code], x, y, owner_id, level, extra.get(str(i)))
+            for i, (code, x, y, owner_id, level) in enumerate(zip(
+                columns['type'], columns['x'], columns['y'], columns['owner_id'], columns['level']))]
+
+
 def get_build_cost(building_type: str, level: int = 1) -> int:
     """获取建造费用"""
     return BUILDINGS[building_type]['levels'][level]['cost']
@@ -7,6 +7,8 @@ import json
 from typing import Optional, Callable, List
 from game_state import GameState
 from config import DEFAULT_PORT
+from protocol import FrameReader, send_message, COMPRESSION_NAME
+from sync import apply_delta, state_checksum
 
 
 class GameClient:
@@ -18,6 +20,9 @@ class GameClient:
         self.player_name: str = ""
         self.connected = False
         self.game_state: Optional[GameState] = None
+        self.state_version = -1  # 本地状态对应的服务器版本号
+        self._resync_pending = False  # 已请求完整状态，等待中忽略增量
+        self._action_seq = 0  # 操作序号，服务器在action_result中带回
         self.player_list: List[str] = []
 
         # 回调函数
@@ -27,9 +32,14 @@ class GameClient:
         self.on_error: Optional[Callable[[str], None]] = None
         self.on_chat: Optional[Callable[[int, str], None]] = None
         self.on_disconnect: Optional[Callable[[], None]] = None
+        self.on_action_result: Optional[Callable[[int, bool, str], None]] = None  # (序号, 成功, 信息)
+        self.on_action_results: Optional[Callable[[int, List[dict]], None]] = None  # (序号, [{'success','message'}])
 
+        self._reader = FrameReader()  # 握手和接收循环共用，握手时多收到的消息不会丢失
         self._receive_thread: Optional[threading.Thread] = None
-        self._lock = threading.Lock()
+        self._lock = threading.Lock()  # 主线程发送操作与接收线程请求补发共用套接字，发送时持有，避免帧交错
+        # 接收线程替换或修改game_state时持有；主线程读取（渲染）game_state时也应持有
+        self.state_lock = threading.RLock()
 
     def connect(self, host: str, name: str, port: int = DEFAULT_PORT) -> tuple:
         """连接到服务器"""
@@ -40,16 +50,16 @@ class GameClient:
             self.player_name = name
 
             # 发送玩家名称
-            self.socket.send(json.dumps({'name': name}).encode())
+            self._reader = FrameReader()
+            with self._lock:
+                send_message(self.socket, {'name': name, 'compression': [COMPRESSION_NAME]})
 
             # 接收响应
-            data = self.socket.recv(4096).decode()
-            if not data:
+            msg = self._reader.read_message(self.socket)
+            if msg is None:
                 self.socket.close()
                 return False, "服务器无响应（可能是防火墙阻止或端口未转发）"
 
-            msg = json.loads(data)
-
             if msg.get('type') == 'error':
                 self.socket.close()
                 return False, msg.get('message', '连接失败')
@@ -81,24 +91,15 @@ class GameClient:
 
     def _receive_loop(self):
         """接收消息循环"""
-        buffer = ""
         while self.connected:
             try:
                 self.socket.settimeout(1.0)
-                data = self.socket.recv(4096).decode()
-                if not data:
+                messages = self._reader.recv(self.socket)
+                if messages is None:
                     break
 
-                buffer += data
-
-                # 处理可能的多条消息
-                while buffer:
-                    try:
-                        msg, idx = json.JSONDecoder().raw_decode(buffer)
-                        buffer = buffer[idx:].lstrip()
-                        self._process_message(msg)
-                    except json.JSONDecodeError:
-                        break
+                for msg in messages:
+                    self._process_message(msg)
 
             except socket.timeout:
                 continue
@@ -121,15 +122,25 @@ class GameClient:
                 self.on_player_list_update(self.player_list)
 
         elif msg_type == 'game_start':
-            self.game_state = GameState.from_dict(msg['state'])
+            with self.state_lock:
+                self.game_state = GameState.from_dict(msg['state'])
+                self.state_version = msg.get('version', 0)
             if self.on_game_start:
                 self.on_game_start(self.game_state)
 
         elif msg_type == 'sync':
-            self.game_state = GameState.from_dict(msg['state'])
+            # 沿用本地地图（地形只在开局收到一次）
+            with self.state_lock:
+                current_map = self.game_state.game_map if self.game_state else None
+                self.game_state = GameState.from_dict(msg['state'], current_map)
+                self.state_version = msg.get('version', self.state_version)
+                self._resync_pending = False
             if self.on_state_update:
                 self.on_state_update(self.game_state)
 
+        elif msg_type == 'delta':
+            self._apply_delta(msg)
+
         elif msg_type == 'error':
             if self.on_error:
                 self.on_error(msg.get('message', '未知错误'))
@@ -139,33 +150,62 @@ class GameClient:
                 self.on_chat(msg['player_id'], msg['message'])
 
         elif msg_type == 'action_result':
-            # 操作结果由主循环处理
-            pass
-
-    def send_action(self, action: dict):
-        """发送操作"""
+            if self.on_action_result:
+                self.on_action_result(msg.get('seq', -1), msg.get('success', False), msg.get('message', ''))
+
+        elif msg_type == 'action_results':
+            if self.on_action_results:
+                self.on_action_results(msg.get('seq', -1), msg.get('results', []))
+
+    def _apply_delta(self, msg: dict):
+        """应用增量；版本不连续或校验和不符时请求完整状态"""
+        if self._resync_pending:
+            return
+        if self.game_state is None or msg['base'] != self.state_version:
+            self._request_resync()
+            return
+        with self.state_lock:
+            apply_delta(self.game_state, msg['changes'])
+            self.state_version = msg['version']
+            mismatch = 'checksum' in msg and state_checksum(self.game_state) != msg['checksum']
+        if mismatch:
+            self._request_resync()
+            return
+        if self.on_state_update:
+            self.on_state_update(self.game_state)
+
+    def _request_resync(self):
+        self._resync_pending = True
+        self._send({'type': 'resync'})
+
+    def _send(self, msg: dict):
+        """发送一条消息（持有发送锁，整帧写完才释放）"""
         if self.connected and self.socket:
             try:
-                msg = {'type': 'action', **action}
-                self.socket.send(json.dumps(msg).encode())
+                with self._lock:
+                    send_message(self.socket, msg)
             except Exception as e:
                 print(f"发送错误: {e}")
 
+    def send_action(self, action: dict) -> int:
+        """发送操作，返回操作序号（用于匹配服务器的action_result）"""
+        self._action_seq += 1
+        self._send({'type': 'action', 'seq': self._action_seq, **action})
+        return self._action_seq
+
+    def send_actions(self, actions: List[dict]) -> int:
+        """批量发送操作：服务器按顺序执行后同步一次，并用一条action_results回复，返回批次序号"""
+        self._action_seq += 1
+        self._send({'type': 'batch', 'seq': self._action_seq, 'actions': actions})
+        return self._action_seq
+
     def send_end_turn(self):
         """发送回合结束"""
-        if self.connected and self.socket:
-            try:
-                self.socket.send(json.dumps({'type': 'end_turn'}).encode())
-            except Exception as e:
-                print(f"发送错误: {e}")
+        self._send({'type': 'end_turn'})
 
     def send_chat(self, message: str):
         """发送聊天消息"""
-        if self.connected and self.socket:
-            try:
-                self.socket.send(json.dumps({'type': 'chat', 'message': message}).encode())
-            except Exception as e:
-                print(f"发送错误: {e}")
+        self._send({'type': 'chat', 'message': message})
 
     def disconnect(self):
         """断开连接"""
@@ -278,29 +278,22 @@ def calculate_battle_preview(attacker: Unit, defender: Unit, defender_terrain: s
     }
 
 
-def merge_units_at_location(units: List[Unit], x: int, y: int, owner_id: int) -> List[Unit]:
+def merge_units_in_cell(cell_units: List[Unit], owner_id: int) -> List[Unit]:
     """
-    合并同一位置的同类型单位
+    原地合并同一格子中某玩家的同类型单位
+    只处理传入的格子单位列表，返回被吸收（已清零、需从索引移除）的单位
     """
-    type_groups = {}
-    other_units = []
-
-    for unit in units:
-        if unit.x == x and unit.y == y and unit.owner_id == owner_id:
-            if unit.unit_type not in type_groups:
-                type_groups[unit.unit_type] = []
-            type_groups[unit.unit_type].append(unit)
+    main_units = {}
+    absorbed = []
+
+    for unit in cell_units:
+        if unit.owner_id != owner_id:
+            continue
+        main_unit = main_units.get(unit.unit_type)
+        if main_unit is None:
+            main_units[unit.unit_type] = unit
         else:
-            other_units.append(unit)
+            main_unit.merge_with(unit)
+            absorbed.append(unit)
 
-    merged = []
-    for unit_type, group in type_groups.items():
-        if len(group) == 1:
-            merged.append(group[0])
-        else:
-            main_unit = group[0]
-            for other in group[1:]:
-                main_unit.merge_with(other)
-            merged.append(main_unit)
-
-    return other_units + merged
+    return absorbed
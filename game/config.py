@@ -29,6 +29,11 @@ MAP_SIZE_PRESETS = {
     'epic': (150, 75, '史诗'),
 }
 
+# 地图数组模式：安装了numpy时用数组存储地形和领土（向量化统计领土等批量操作）
+MAP_ARRAY_BACKEND = True
+# 调试：每回合结束时用全图扫描核对增量维护的领土计数
+DEBUG_CHECK_TERRITORY_COUNTS = False
+
 # 地形类型
 TERRAIN_PLAIN = '.'  # 平地
 TERRAIN_RIVER = '~'  # 河流
@@ -65,6 +70,20 @@ DEMOLISH_REFUND_RATE = 0.5  # 返还50%
 # 网络配置
 DEFAULT_PORT = 5555
 MAX_PLAYERS = 8
+SYNC_CHECKSUM_INTERVAL = 10  # 每隔多少个增量附带一次校验和
+FULL_SYNC_INTERVAL = 100     # 每隔多少个增量发送一次完整状态
+FOG_OF_WAR_SYNC = True       # 每个客户端只收到自己视野内的敌方单位和自己的私有数据
+SYNC_COALESCE_WINDOW = 0.05  # 操作后延迟多少秒同步，窗口内的多个操作合并为一次同步（0=每次操作后立即同步）
+# 服务器模式: True=asyncio单事件循环（不为每个连接开线程），False=每个客户端一个线程
+SERVER_ASYNC_MODE = False
+CLIENT_SEND_QUEUE_LIMIT = 256  # 单个客户端待发送消息上限，超过视为读取过慢并断开
+# 发往客户端的大消息用zlib压缩（客户端握手时声明支持才启用），上行带宽较小的房主可开启
+NETWORK_COMPRESSION = False
+COMPRESSION_THRESHOLD = 1024  # 负载超过多少字节才压缩
+COMPRESSION_LEVEL = 6
+# 地图序列化协议版本: 1=领土为嵌套列表, 2=领土为游程编码+base64
+MAP_PROTOCOL_VERSION = 2
+ENTITY_COLUMNS = True  # 完整状态中的单位/建筑按列序列化（字段数组 + 类型名表），否则为逐个对象的字典
 
 # 初始资源
 INITIAL_ECONOMY = 200
@@ -471,6 +490,10 @@ SYMBOL_CAPITAL = '*'   # 首都
 SYMBOL_ARMY = 'o'      # 军队
 SYMBOL_SELECTED = '@'  # 选中的单位
 
+# 渲染
+RENDER_FPS_CAP = 30  # 每秒最多渲染的帧数，两帧之间到达的按键和状态更新合并到下一帧（0=不限制）
+RENDER_DEBUG_OVERLAY = False  # 在画面底部显示帧耗时、丢弃帧数和每帧事件数
+
 
 def get_units_by_category(category: str) -> dict:
     """获取某类别的所有单位"""
@@ -2,30 +2,37 @@
 """游戏状态管理"""
 
 from typing import Dict, List, Optional, Tuple, Set
-from map_generator import GameMap
+from map_generator import GameMap, create_game_map
 from buildings import (
     Building, Factory, City, Barracks, ArmsFactory, Bridge, Fortification,
     NuclearSilo, MobileLauncher, NuclearInterceptor, TrainStation,
-    create_building, get_build_cost
+    BuildingIndex, create_building, get_build_cost, buildings_to_columns, buildings_from_columns
 )
-from units import Unit, ProductionQueue, get_production_cost, get_available_units, get_production_time
-from combat import resolve_combat, merge_units_at_location
+from units import (
+    Unit, UnitRegistry, ProductionQueue, get_production_cost, get_available_units, get_production_time,
+    units_to_columns, units_from_columns
+)
+from combat import resolve_combat, merge_units_in_cell
 from config import (
     INITIAL_ECONOMY, INITIAL_POPULATION, INITIAL_POP_CAP,
     BASE_POP_GROWTH_RATE, INITIAL_TERRITORY_RADIUS, BUILDINGS, UNITS,
     TERRAIN_RIVER, TERRAIN_BRIDGE, TERRAIN_PLAIN, get_production_building,
-    BASE_VISIBILITY_RANGE, UNIT_VISIBILITY_BONUS, SCOUT_VISIBILITY_BONUS,
     NUKE_MISSILE_COST, NUKE_DAMAGE, NUKE_RADIUS, NUKE_BUILDING_DESTROY, NUKE_CAPITAL_DESTROY,
     INTERCEPTOR_RANGE, RAILWAY_CONNECTABLE_BUILDINGS, RAILWAY_SPEED_MULTIPLIER,
     RAILWAY_USABLE_CATEGORIES, TERRITORY_POP_GROWTH_BONUS, TERRITORY_POP_CAP_BONUS,
-    TERRITORY_BONUS_THRESHOLD
+    TERRITORY_BONUS_THRESHOLD, DEBUG_CHECK_TERRITORY_COUNTS, ENTITY_COLUMNS
 )
 from focus import PlayerFocusTree, get_focus_effect_description
+from visibility import VisibilityEngine
+
+_UNSET = object()
 
 
 class Player:
     """玩家类"""
 
+    changed = False  # 自上次GameState.take_player_changes以来属性是否变化过（增量同步用）
+
     def __init__(self, player_id: int, name: str):
         self.id = player_id
         self.name = name
@@ -37,6 +44,12 @@ class Player:
         self.is_alive = True
         self.ready_for_next_turn = False
 
+    def __setattr__(self, name, value):
+        # 值改变时标记，增量同步只发送有变化的玩家
+        if getattr(self, name, _UNSET) != value:
+            object.__setattr__(self, 'changed', True)
+        object.__setattr__(self, name, value)
+
     def get_growth_rate(self, cities: List[City]) -> float:
         """计算总人口增长率"""
         rate = BASE_POP_GROWTH_RATE
@@ -93,8 +106,8 @@ class GameState:
     def __init__(self):
         self.game_map: Optional[GameMap] = None
         self.players: Dict[int, Player] = {}
-        self.buildings: List[Building] = []
-        self.units: List[Unit] = []
+        self.buildings = BuildingIndex()  # 建筑索引（按位置/类型/玩家）
+        self.units = UnitRegistry()  # 单位索引（按ID/格子/玩家）
         self.production_queue: List[ProductionQueue] = []  # 生产队列
         self.pending_territory: Dict[Tuple[int, int], int] = {}  # 待占领领土 {(x,y): player_id}
         self.focus_trees: Dict[int, PlayerFocusTree] = {}  # 玩家国策树
@@ -104,6 +117,7 @@ class GameState:
         self.game_started = False
         self.game_over = False
         self.winner_id = None
+        self.visibility = VisibilityEngine(self)  # 视野缓存
 
     def initialize_game(self, player_names: List[str], map_seed: int = None,
                          map_width: int = None, map_height: int = None):
@@ -119,7 +133,7 @@ class GameState:
                 map_width = map_width or MAP_WIDTH
                 map_height = map_height or MAP_HEIGHT
 
-        self.game_map = GameMap(map_width, map_height)
+        self.game_map = create_game_map(map_width, map_height)
         # 河流数量根据地图大小动态调整
         river_count = max(2, min(8, (map_width * map_height) // 1000))
         self.game_map.generate(river_count=river_count, seed=map_seed)
@@ -138,11 +152,11 @@ class GameState:
             self.game_map.claim_territory_radius(spawn_x, spawn_y, INITIAL_TERRITORY_RADIUS, i)
 
             # 创建初始建筑
-            self.buildings.append(City(spawn_x, spawn_y, i, level=1))
-            self.buildings.append(Barracks(spawn_x + 1, spawn_y, i, level=1))
+            self.buildings.add(City(spawn_x, spawn_y, i, level=1))
+            self.buildings.add(Barracks(spawn_x + 1, spawn_y, i, level=1))
 
             # 创建初始军队 - 使用新的单位类型
-            self.units.append(Unit('basic_infantry', spawn_x, spawn_y, i, count=5))
+            self.units.add(Unit('basic_infantry', spawn_x, spawn_y, i, count=5))
 
             self.players[i] = player
 
@@ -154,38 +168,64 @@ class GameState:
     def get_player(self, player_id: int) -> Optional[Player]:
         return self.players.get(player_id)
 
+    def take_player_changes(self) -> List[Player]:
+        """取走上次调用以来属性变化过的玩家（新建的玩家也算变化）"""
+        changed = [p for p in self.players.values() if p.changed]
+        for player in changed:
+            object.__setattr__(player, 'changed', False)
+        return changed
+
     def get_building_at(self, x: int, y: int) -> Optional[Building]:
-        for building in self.buildings:
-            if building.x == x and building.y == y:
-                return building
-        return None
+        return self.buildings.at(x, y)
 
     def get_units_at(self, x: int, y: int) -> List[Unit]:
-        return [u for u in self.units if u.x == x and u.y == y and u.is_alive()]
+        return [u for u in self.units.at(x, y) if u.is_alive()]
 
     def get_player_units(self, player_id: int) -> List[Unit]:
-        return [u for u in self.units if u.owner_id == player_id and u.is_alive()]
+        return [u for u in self.units.owned_by(player_id) if u.is_alive()]
 
     def get_selected_units(self, player_id: int) -> List[Unit]:
         """获取玩家选中的单位"""
-        return [u for u in self.units if u.owner_id == player_id and u.selected and u.is_alive()]
+        return [u for u in self.units.owned_by(player_id) if u.selected and u.is_alive()]
+
+    def get_player_unit(self, player_id: int, unit_id: int) -> Optional[Unit]:
+        """按ID获取玩家自己的单位"""
+        unit = self.units.get(unit_id)
+        if unit is None or unit.owner_id != player_id:
+            return None
+        return unit
+
+    def _remove_dead_units(self, units: List[Unit]):
+        """从索引中移除已死亡的单位"""
+        for u in units:
+            if not u.is_alive():
+                self.units.remove(u)
+
+    def _merge_units_at(self, x: int, y: int, owner_id: int):
+        """合并指定格子上同玩家的同类型单位（只处理该格子），保留的单位移到遍历顺序末尾"""
+        cell_units = self.units.at(x, y)
+        for u in merge_units_in_cell(cell_units, owner_id):
+            self.units.remove(u)
+        for u in cell_units:
+            if u.owner_id == owner_id and u.count > 0:
+                self.units.move_to_end(u)
 
     def get_player_buildings(self, player_id: int) -> List[Building]:
-        return [b for b in self.buildings if b.owner_id == player_id]
+        return self.buildings.owned_by(player_id)
 
     def get_player_barracks_level(self, player_id: int) -> int:
         """获取玩家最高兵营等级"""
         max_level = 0
-        for b in self.buildings:
-            if b.owner_id == player_id and b.building_type == 'barracks':
+        for b in self.buildings.of_type('barracks'):
+            if b.owner_id == player_id:
                 max_level = max(max_level, b.level)
         return max_level
 
     def get_player_arms_factory_level(self, player_id: int) -> int:
         """获取玩家最高兵工厂等级"""
         max_level = 0
-        for b in self.buildings:
-            if b.owner_id == player_id and b.building_type == 'arms_factory':
+        for b in self.buildings.of_type('arms_factory'):
+            if b.owner_id == player_id:
                 max_level = max(max_level, b.level)
         return max_level
 
@@ -219,9 +259,7 @@ class GameState:
     def get_player_launchers(self, player_id: int) -> List[Building]:
         """获取玩家所有可用的核发射设施"""
         launchers = []
-        for b in self.buildings:
-            if b.owner_id != player_id:
-                continue
+        for b in self.buildings.owned_by(player_id):
             if b.building_type in ('nuclear_silo', 'mobile_launcher'):
                 if hasattr(b, 'can_fire') and b.can_fire():
                     launchers.append(b)
@@ -230,11 +268,9 @@ class GameState:
     def get_enemy_interceptors(self, player_id: int, target_x: int, target_y: int) -> List[NuclearInterceptor]:
         """获取可以拦截目标位置的敌方拦截器"""
         interceptors = []
-        for b in self.buildings:
+        for b in self.buildings.of_type('nuclear_interceptor'):
             if b.owner_id == player_id:
                 continue  # 跳过自己的拦截器
-            if b.building_type != 'nuclear_interceptor':
-                continue
             if not isinstance(b, NuclearInterceptor):
                 continue
             if not b.can_intercept():
@@ -253,11 +289,9 @@ class GameState:
 
         # 查找发射器
         launcher = None
-        for b in self.buildings:
-            if b.x == launcher_id // 10000 and b.y == launcher_id % 10000 and b.owner_id == player_id:
-                if b.building_type in ('nuclear_silo', 'mobile_launcher'):
-                    launcher = b
-                    break
+        b = self.get_building_at(launcher_id // 10000, launcher_id % 10000)
+        if b and b.owner_id == player_id and b.building_type in ('nuclear_silo', 'mobile_launcher'):
+            launcher = b
 
         if not launcher:
             return False, "发射器不存在"
@@ -302,17 +336,18 @@ class GameState:
 
         for ax, ay in affected_cells:
             # 消灭该格所有单位
-            killed_units = [u for u in self.units if u.x == ax and u.y == ay and u.is_alive()]
+            killed_units = self.get_units_at(ax, ay)
             for u in killed_units:
                 u.take_damage(NUKE_DAMAGE)
             total_killed += len([u for u in killed_units if not u.is_alive()])
+            self._remove_dead_units(killed_units)
 
             # 摧毁建筑
             if NUKE_BUILDING_DESTROY:
                 building = self.get_building_at(ax, ay)
                 if building and building.owner_id != player_id:
                     buildings_destroyed.append(building.name)
-                    self.buildings = [b for b in self.buildings if not (b.x == ax and b.y == ay)]
+                    self.buildings.remove(building)
 
             # 检查是否命中首都
             if NUKE_CAPITAL_DESTROY:
@@ -326,9 +361,6 @@ class GameState:
             if current_owner is not None and current_owner != player_id:
                 self.game_map.set_territory(ax, ay, player_id)
 
-        # 清除死亡单位
-        self.units = [u for u in self.units if u.is_alive()]
-
         if total_killed > 0:
             results.append(f"消灭{total_killed}个单位")
         if buildings_destroyed:
@@ -352,11 +384,9 @@ class GameState:
         """移动移动发射平台"""
         # 查找发射器
         launcher = None
-        for b in self.buildings:
-            if b.x == launcher_x and b.y == launcher_y and b.owner_id == player_id:
-                if b.building_type == 'mobile_launcher':
-                    launcher = b
-                    break
+        b = self.get_building_at(launcher_x, launcher_y)
+        if b and b.owner_id == player_id and b.building_type == 'mobile_launcher':
+            launcher = b
 
         if not launcher:
             return False, "发射平台不存在"
@@ -383,22 +413,21 @@ class GameState:
         if self.get_building_at(target_x, target_y):
             return False, "目标位置已有建筑"
 
-        # 移动
+        # 移动（同步更新位置索引）
         launcher.move_to(target_x, target_y)
+        self.buildings.update_position(launcher, launcher_x, launcher_y)
         return True, f"移动发射平台到({target_x},{target_y})"
 
     def has_bridge_at(self, x: int, y: int) -> bool:
         """检查指定位置是否有桥梁"""
-        for b in self.buildings:
-            if b.x == x and b.y == y and b.building_type == 'bridge':
-                return True
-        return False
+        b = self.buildings.at(x, y)
+        return b is not None and b.building_type == 'bridge'
 
     def get_fortification_at(self, x: int, y: int) -> Optional[Fortification]:
         """获取指定位置的防线"""
-        for b in self.buildings:
-            if b.x == x and b.y == y and b.building_type == 'fortification':
-                return b
+        b = self.buildings.at(x, y)
+        if b is not None and b.building_type == 'fortification':
+            return b
         return None
 
     def get_fortification_defense_bonus(self, x: int, y: int) -> float:
@@ -473,7 +502,7 @@ class GameState:
         building = create_building(building_type, x, y, player_id, 1)
         # 标记为本回合建造（用于全额返还）
         building.built_this_turn = True
-        self.buildings.append(building)
+        self.buildings.add(building)
 
         # 建造火车站或可连接建筑时重建铁路
         if building_type == 'train_station' or building_type in RAILWAY_CONNECTABLE_BUILDINGS:
@@ -561,7 +590,7 @@ class GameState:
         player.economy += refund
 
         # 移除建筑
-        self.buildings = [b for b in self.buildings if not (b.x == x and b.y == y)]
+        self.buildings.remove(building)
 
         # 拆除火车站或可连接建筑时重建铁路
         if building_type == 'train_station' or building_type in RAILWAY_CONNECTABLE_BUILDINGS:
@@ -624,19 +653,14 @@ class GameState:
         else:
             # 即时生产
             unit = Unit(unit_type, x, y, player_id, count)
-            self.units.append(unit)
+            self.units.add(unit)
             # 合并同位置同类型单位
-            self.units = merge_units_at_location(self.units, x, y, player_id)
+            self._merge_units_at(x, y, player_id)
             return True, f"生产了{UNITS[unit_type]['name']} {count}k"
 
     def move_unit(self, player_id: int, unit_id: int, target_x: int, target_y: int) -> Tuple[bool, str]:
         """移动单位"""
-        unit = None
-        for u in self.units:
-            if u.id == unit_id and u.owner_id == player_id:
-                unit = u
-                break
-
+        unit = self.get_player_unit(player_id, unit_id)
         if not unit:
             return False, "单位不存在"
 
@@ -680,6 +704,7 @@ class GameState:
         else:
             # 正常移动
             unit.move_to(target_x, target_y, effective_terrain)
+        self.units.update_position(unit)
 
         # 领土扩张：无主之地加入待占领列表，下回合生效
         current_owner = self.game_map.get_territory_owner(target_x, target_y)
@@ -687,7 +712,7 @@ class GameState:
             self.pending_territory[(target_x, target_y)] = player_id
 
         # 合并单位
-        self.units = merge_units_at_location(self.units, target_x, target_y, player_id)
+        self._merge_units_at(target_x, target_y, player_id)
 
         return True, f"移动到({target_x}, {target_y}){move_msg}"
 
@@ -721,6 +746,7 @@ class GameState:
                     unit.x = target_x
                     unit.y = target_y
                     unit.remaining_moves -= distance
+                    self.units.update_position(unit)
                     # 领土扩张
                     current_owner = self.game_map.get_territory_owner(target_x, target_y)
                     if current_owner is None:
@@ -729,6 +755,7 @@ class GameState:
                     railway_moves += 1
             elif unit.can_move_to(target_x, target_y, effective_terrain):
                 unit.move_to(target_x, target_y, effective_terrain)
+                self.units.update_position(unit)
                 # 领土扩张
                 current_owner = self.game_map.get_territory_owner(target_x, target_y)
                 if current_owner is None:
@@ -736,7 +763,7 @@ class GameState:
                 moved_count += 1
 
         # 合并单位
-        self.units = merge_units_at_location(self.units, target_x, target_y, player_id)
+        self._merge_units_at(target_x, target_y, player_id)
 
         if moved_count > 0:
             railway_msg = f" ({railway_moves}个使用铁路)" if railway_moves > 0 else ""
@@ -780,12 +807,7 @@ class GameState:
 
     def split_unit(self, player_id: int, unit_id: int, amount: int) -> Tuple[bool, str]:
         """缩编单位（分割）"""
-        unit = None
-        for u in self.units:
-            if u.id == unit_id and u.owner_id == player_id:
-                unit = u
-                break
-
+        unit = self.get_player_unit(player_id, unit_id)
         if not unit:
             return False, "单位不存在"
 
@@ -793,7 +815,7 @@ class GameState:
         if new_unit is None:
             return False, "无法分割（数量无效）"
 
-        self.units.append(new_unit)
+        self.units.add(new_unit)
         return True, f"分割出{amount}k单位"
 
     def _get_direction_name(self, dx: int, dy: int) -> str:
@@ -821,79 +843,22 @@ class GameState:
     def get_player_max_detection(self, player_id: int) -> int:
         """获取玩家所有单位中最高的侦察能力"""
         max_detection = 0
-        for unit in self.units:
-            if unit.owner_id == player_id and unit.is_alive():
+        for unit in self.units.owned_by(player_id):
+            if unit.is_alive():
                 max_detection = max(max_detection, unit.detection)
         return max_detection
 
     def get_player_visible_cells(self, player_id: int) -> Set[Tuple[int, int]]:
         """获取玩家所有可见格子（不考虑敌方隐蔽性，仅地形视野）"""
-        visible = set()
-
-        # 领土内的格子全部可见
-        for y in range(self.game_map.height):
-            for x in range(self.game_map.width):
-                if self.game_map.get_territory_owner(x, y) == player_id:
-                    visible.add((x, y))
-
-        # 每个单位提供额外视野（侦察兵有额外视野加成）
-        for unit in self.units:
-            if unit.owner_id == player_id and unit.is_alive():
-                # 侦察类单位有额外视野加成
-                if unit.category == 'scout':
-                    vis_range = BASE_VISIBILITY_RANGE + SCOUT_VISIBILITY_BONUS
-                else:
-                    vis_range = BASE_VISIBILITY_RANGE + UNIT_VISIBILITY_BONUS
-                for dy in range(-vis_range, vis_range + 1):
-                    for dx in range(-vis_range, vis_range + 1):
-                        if abs(dx) + abs(dy) <= vis_range:
-                            nx, ny = unit.x + dx, unit.y + dy
-                            if 0 <= nx < self.game_map.width and 0 <= ny < self.game_map.height:
-                                visible.add((nx, ny))
-
-        return visible
+        return self.visibility.visible_cells(player_id)
 
     def is_visible_to(self, player_id: int, x: int, y: int) -> bool:
         """检查某个坐标对某玩家是否可见（不考虑单位隐蔽性）"""
-        # 领土内可见
-        if self.game_map.get_territory_owner(x, y) == player_id:
-            return True
-
-        # 检查该玩家的单位视野
-        for unit in self.units:
-            if unit.owner_id == player_id and unit.is_alive():
-                if unit.category == 'scout':
-                    vis_range = BASE_VISIBILITY_RANGE + SCOUT_VISIBILITY_BONUS
-                else:
-                    vis_range = BASE_VISIBILITY_RANGE + UNIT_VISIBILITY_BONUS
-                dist = abs(unit.x - x) + abs(unit.y - y)
-                if dist <= vis_range:
-                    return True
-        return False
+        return self.visibility.is_visible(player_id, x, y)
 
     def can_see_unit(self, observer_id: int, target_unit: Unit) -> bool:
         """检查一个玩家能否看到某个单位（考虑隐蔽性和侦察能力）"""
-        target_x, target_y = target_unit.x, target_unit.y
-        target_stealth = target_unit.stealth
-
-        # 领土内始终可见
-        if self.game_map.get_territory_owner(target_x, target_y) == observer_id:
-            return True
-
-        # 检查观察方的单位视野和侦察能力
-        for unit in self.units:
-            if unit.owner_id == observer_id and unit.is_alive():
-                if unit.category == 'scout':
-                    vis_range = BASE_VISIBILITY_RANGE + SCOUT_VISIBILITY_BONUS
-                else:
-                    vis_range = BASE_VISIBILITY_RANGE + UNIT_VISIBILITY_BONUS
-
-                # 侦察能力抵消隐蔽性
-                effective_range = vis_range + unit.detection - target_stealth
-                dist = abs(unit.x - target_x) + abs(unit.y - target_y)
-                if dist <= effective_range:
-                    return True
-        return False
+        return self.visibility.can_see_unit(observer_id, target_unit)
 
     def get_battle_visibility(self, attacker: Unit, defender: Unit) -> str:
         """
@@ -917,12 +882,7 @@ class GameState:
 
     def attack(self, player_id: int, unit_id: int, target_x: int, target_y: int) -> Tuple[bool, str]:
         """攻击"""
-        attacker = None
-        for u in self.units:
-            if u.id == unit_id and u.owner_id == player_id:
-                attacker = u
-                break
-
+        attacker = self.get_player_unit(player_id, unit_id)
         if not attacker:
             return False, "单位不存在"
 
@@ -966,13 +926,14 @@ class GameState:
         result = resolve_combat(attacker, defender, terrain, crossing_river, battle_type,
                                 fortification_bonus, attacker_allies, defender_allies)
 
-        # 移除死亡单位
-        self.units = [u for u in self.units if u.is_alive()]
+        # 移除死亡单位（含被合并的敌方单位）
+        self._remove_dead_units([attacker] + enemy_units)
 
         # 如果攻击方胜利且存活，移动到目标位置
         if result['attacker_survived'] and not result['defender_survived']:
             attacker.x = target_x
             attacker.y = target_y
+            self.units.update_position(attacker)
             # 占领敌方领土（立即生效）
             self.game_map.set_territory(target_x, target_y, player_id)
 
@@ -1003,15 +964,11 @@ class GameState:
         eliminated.is_alive = False
 
         # 转移所有领土
-        for y in range(self.game_map.height):
-            for x in range(self.game_map.width):
-                if self.game_map.territory[y][x] == eliminated_id:
-                    self.game_map.territory[y][x] = conqueror_id
+        self.game_map.reassign_territory(eliminated_id, conqueror_id)
 
         # 转移所有建筑
-        for building in self.buildings:
-            if building.owner_id == eliminated_id:
-                building.owner_id = conqueror_id
+        for building in self.buildings.owned_by(eliminated_id):
+            self.buildings.set_owner(building, conqueror_id)
 
         # 检查游戏是否结束
         alive_players = [p for p in self.players.values() if p.is_alive]
@@ -1026,9 +983,8 @@ class GameState:
         self.railway_cells = {}
         for player_id in self.players:
             self.railway_cells[player_id] = set()
-        for b in self.buildings:
-            if isinstance(b, TrainStation):
-                self._rebuild_station_railways(b)
+        for b in self.buildings.of_type('train_station'):
+            self._rebuild_station_railways(b)
 
     def _rebuild_station_railways(self, station: TrainStation):
         """重建单个火车站的铁路连接"""
@@ -1037,11 +993,9 @@ class GameState:
         radius = station.get_connect_radius()
 
         # 查找范围内可连接的建筑
-        for b in self.buildings:
+        for b in self.buildings.owned_by(station.owner_id):
             if b is station:
                 continue
-            if b.owner_id != station.owner_id:
-                continue
             if b.building_type not in RAILWAY_CONNECTABLE_BUILDINGS:
                 continue
             dist = abs(b.x - station.x) + abs(b.y - station.y)
@@ -1095,9 +1049,7 @@ class GameState:
 
     def _process_train_stations(self):
         """处理火车站：推进计时器、发车、收取经济"""
-        for b in self.buildings:
-            if not isinstance(b, TrainStation):
-                continue
+        for b in self.buildings.of_type('train_station'):
             player = self.get_player(b.owner_id)
             if not player or not player.is_alive:
                 continue
@@ -1130,18 +1082,13 @@ class GameState:
 
     def get_player_train_stations(self, player_id: int) -> List[TrainStation]:
         """获取玩家所有火车站"""
-        return [b for b in self.buildings if isinstance(b, TrainStation) and b.owner_id == player_id]
+        return [b for b in self.buildings.of_type('train_station') if b.owner_id == player_id]
 
     # ==================== 领土系统 ====================
 
     def get_player_territory_count(self, player_id: int) -> int:
         """计算玩家的领土格数"""
-        count = 0
-        for y in range(self.game_map.height):
-            for x in range(self.game_map.width):
-                if self.game_map.territory[y][x] == player_id:
-                    count += 1
-        return count
+        return self.game_map.count_territory(player_id)
 
     def get_territory_pop_bonus(self, player_id: int) -> Tuple[float, int]:
         """计算领土带来的人口加成 -> (增长率加成, 人口上限加成)"""
@@ -1153,6 +1100,10 @@ class GameState:
 
     def process_turn(self):
         """处理回合结束"""
+        if DEBUG_CHECK_TERRITORY_COUNTS:
+            ok, msg = self.game_map.verify_territory_counts()
+            if not ok:
+                raise RuntimeError(msg)
         for player in self.players.values():
             if not player.is_alive:
                 continue
@@ -1164,13 +1115,13 @@ class GameState:
             pop_cap_bonus = tree.get_effect('pop_cap_bonus', 0) if tree else 0
 
             # 计算收入（含国策加成）
-            factories = [b for b in self.buildings if isinstance(b, Factory)]
+            factories = self.buildings.of_type('factory')
             income = player.calculate_income(factories)
             income = int(income * (1 + economy_bonus))
             player.economy += income
 
             # 计算人口增长（含国策加成和领土加成）
-            cities = [b for b in self.buildings if isinstance(b, City)]
+            cities = self.buildings.of_type('city')
             territory_growth_bonus, territory_cap_bonus = self.get_territory_pop_bonus(player.id)
             growth_rate = player.get_growth_rate(cities) + pop_growth_bonus + territory_growth_bonus
             player.pop_cap = player.calculate_pop_cap(cities) + int(pop_cap_bonus) + territory_cap_bonus
@@ -1204,10 +1155,12 @@ class GameState:
         for b in self.buildings:
             b.built_this_turn = False
 
-        # 重置单位移动力和选中状态
+        # 重置单位移动力和选中状态（只给有变化的单位赋值，省去逐个经过__setattr__的开销）
         for unit in self.units:
-            unit.reset_moves()
-            unit.selected = False
+            if unit.remaining_moves != unit.speed:
+                unit.reset_moves()
+            if unit.selected:
+                unit.selected = False
 
         self.current_turn += 1
 
@@ -1235,9 +1188,9 @@ class GameState:
             if pq.advance_turn():
                 # 生产完成，创建单位
                 unit = Unit(pq.unit_type, pq.x, pq.y, pq.owner_id, pq.count)
-                self.units.append(unit)
+                self.units.add(unit)
                 # 合并单位
-                self.units = merge_units_at_location(self.units, pq.x, pq.y, pq.owner_id)
+                self._merge_units_at(pq.x, pq.y, pq.owner_id)
                 completed.append(pq)
 
         # 移除完成的生产项
@@ -1262,28 +1215,24 @@ class GameState:
         """选择单位"""
         if not add_to_selection:
             # 清除之前的选择
-            for u in self.units:
-                if u.owner_id == player_id:
-                    u.selected = False
+            self.deselect_all(player_id)
 
         # 选择新单位
-        for u in self.units:
-            if u.id == unit_id and u.owner_id == player_id:
-                u.selected = True
-                return True, f"选中{u.name}"
+        u = self.get_player_unit(player_id, unit_id)
+        if u:
+            u.selected = True
+            return True, f"选中{u.name}"
 
         return False, "单位不存在"
 
     def select_units_at(self, player_id: int, x: int, y: int, add_to_selection: bool = False) -> Tuple[bool, str]:
         """选择指定位置的所有单位"""
         if not add_to_selection:
-            for u in self.units:
-                if u.owner_id == player_id:
-                    u.selected = False
+            self.deselect_all(player_id)
 
         count = 0
-        for u in self.units:
-            if u.x == x and u.y == y and u.owner_id == player_id and u.is_alive():
+        for u in self.get_units_at(x, y):
+            if u.owner_id == player_id:
                 u.selected = True
                 count += 1
 
@@ -1293,21 +1242,37 @@ class GameState:
 
     def deselect_all(self, player_id: int):
         """取消所有选择"""
-        for u in self.units:
-            if u.owner_id == player_id:
-                u.selected = False
+        for u in self.units.owned_by(player_id):
+            u.selected = False
 
-    def to_dict(self) -> dict:
+    def to_dict(self, include_map: bool = True, include_terrain: bool = True, columnar: bool = None) -> dict:
+        """
+        序列化；include_map=False 时不含地图（增量同步单独处理领土）
+        include_terrain=False 时地图只含领土（地形只在开局发送一次）
+        columnar 为True时单位/建筑按列输出到 unit_columns/building_columns，默认由ENTITY_COLUMNS决定
+        """
+        if columnar is None:
+            columnar = ENTITY_COLUMNS
+        if columnar:
+            entities = {'building_columns': buildings_to_columns(self.buildings),
+                        'unit_columns': units_to_columns(self.units)}
+        else:
+            entities = {'buildings': [b.to_dict() for b in self.buildings],
+                        'units': [u.to_dict() for u in self.units]}
+        return {
+            'map': self.game_map.to_dict(include_terrain) if self.game_map and include_map else None,
+            'players': {pid: p.to_dict() for pid, p in self.players.items()},
+            **entities,
+            **self.sections_to_dict()
+        }
+
+    def sections_to_dict(self) -> dict:
+        """序列化除地图、玩家、建筑、单位以外的各部分（与load_sections对应）"""
         # 将railway_cells转换为可序列化格式
         railway_data = {}
         for pid, cells in self.railway_cells.items():
-            railway_data[str(pid)] = [f"{x},{y}" for x, y in cells]
-
+            railway_data[str(pid)] = [f"{x},{y}" for x, y in sorted(cells)]
         return {
-            'map': self.game_map.to_dict() if self.game_map else None,
-            'players': {pid: p.to_dict() for pid, p in self.players.items()},
-            'buildings': [b.to_dict() for b in self.buildings],
-            'units': [u.to_dict() for u in self.units],
             'production_queue': [pq.to_dict() for pq in self.production_queue],
             'pending_territory': {f"{x},{y}": pid for (x, y), pid in self.pending_territory.items()},
             'focus_trees': {pid: ft.to_dict() for pid, ft in self.focus_trees.items()},
@@ -1320,37 +1285,54 @@ class GameState:
         }
 
     @staticmethod
-    def from_dict(data: dict) -> 'GameState':
+    def from_dict(data: dict, game_map: Optional[GameMap] = None) -> 'GameState':
+        """反序列化；地图数据不含地形时，领土载入到传入的已有地图上并沿用该地图"""
         state = GameState()
-        state.game_map = GameMap.from_dict(data['map']) if data['map'] else None
+        map_data = data['map']
+        if map_data and 'terrain' not in map_data and game_map is not None:
+            game_map.load_territory_dict(map_data)
+            state.game_map = game_map
+        else:
+            state.game_map = GameMap.from_dict(map_data) if map_data else None
         state.players = {int(k): Player.from_dict(v) for k, v in data['players'].items()}
         # 创建建筑，传递额外数据给核设施
-        state.buildings = [create_building(b['type'], b['x'], b['y'], b['owner_id'], b['level'], b)
-                          for b in data['buildings']]
-        state.units = [Unit.from_dict(u) for u in data['units']]
-        state.production_queue = [ProductionQueue.from_dict(pq) for pq in data.get('production_queue', [])]
+        if 'building_columns' in data:
+            state.buildings = BuildingIndex(buildings_from_columns(data['building_columns']))
+        else:
+            state.buildings = BuildingIndex(create_building(b['type'], b['x'], b['y'], b['owner_id'], b['level'], b)
+                                            for b in data['buildings'])
+        if 'unit_columns' in data:
+            state.units = UnitRegistry(units_from_columns(data['unit_columns']))
+        else:
+            state.units = UnitRegistry(Unit.from_dict(u) for u in data['units'])
+        state.load_sections(data)
+        return state
+
+    def load_sections(self, data: dict):
+        """载入除地图、玩家、建筑、单位以外的各部分（只处理data中存在的键，增量同步也使用）"""
+        if 'production_queue' in data:
+            self.production_queue = [ProductionQueue.from_dict(pq) for pq in data['production_queue']]
         # 解析 pending_territory
-        pending = data.get('pending_territory', {})
-        state.pending_territory = {}
-        for key, pid in pending.items():
-            x, y = map(int, key.split(','))
-            state.pending_territory[(x, y)] = pid
+        if 'pending_territory' in data:
+            self.pending_territory = {}
+            for key, pid in data['pending_territory'].items():
+                x, y = map(int, key.split(','))
+                self.pending_territory[(x, y)] = pid
         # 解析 focus_trees
-        focus_data = data.get('focus_trees', {})
-        state.focus_trees = {int(k): PlayerFocusTree.from_dict(v) for k, v in focus_data.items()}
+        if 'focus_trees' in data:
+            self.focus_trees = {int(k): PlayerFocusTree.from_dict(v) for k, v in data['focus_trees'].items()}
         # 解析 railway_cells
-        railway_data = data.get('railway_cells', {})
-        state.railway_cells = {}
-        for pid_str, cells in railway_data.items():
-            pid = int(pid_str)
-            state.railway_cells[pid] = set()
-            for cell_str in cells:
-                x, y = map(int, cell_str.split(','))
-                state.railway_cells[pid].add((x, y))
+        if 'railway_cells' in data:
+            self.railway_cells = {}
+            for pid_str, cells in data['railway_cells'].items():
+                pid = int(pid_str)
+                self.railway_cells[pid] = set()
+                for cell_str in cells:
+                    x, y = map(int, cell_str.split(','))
+                    self.railway_cells[pid].add((x, y))
         # 解析 active_trains
-        state.active_trains = data.get('active_trains', [])
-        state.current_turn = data['current_turn']
-        state.game_started = data['game_started']
-        state.game_over = data['game_over']
-        state.winner_id = data['winner_id']
-        return state
+        if 'active_trains' in data:
+            self.active_trains = data['active_trains']
+        for key in ('current_turn', 'game_started', 'game_over', 'winner_id'):
+            if key in data:
+                setattr(self, key, data[key])
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""键盘输入 - 按键和其他线程的唤醒（如网络状态更新）合并到同一个阻塞等待中"""
+
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import selectors
+    import termios
+    import tty
+
+# Windows控制台句柄不能和唤醒事件一起select，等待时按此间隔检查按键
+WINDOWS_POLL_INTERVAL = 0.01
+ESC = '\x1b'
+ARROW_KEYS = {'A': 'W', 'B': 'S', 'C': 'D', 'D': 'A'}  # ANSI方向键序列的结尾字符 -> WASD
+WINDOWS_ARROW_KEYS = {b'H': 'W', b'P': 'S', b'K': 'A', b'M': 'D'}
+
+
+def decode_keys(text: str) -> List[str]:
+    """把终端读到的字符解码为按键：方向键映射到WASD，单独的ESC为'ESC'，其余字符转大写"""
+    keys = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch == ESC and i + 2 < len(text) and text[i + 1] in '[O':
+            # 转义序列：读到结尾字符（@ 到 ~）为止，只保留方向键
+            j = i + 2
+            while j < len(text) - 1 and not '@' <= text[j] <= '~':
+                j += 1
+            key = ARROW_KEYS.get(text[j])
+            if key:
+                keys.append(key)
+            i = j + 1
+            continue
+        keys.append('ESC' if ch == ESC else ch.upper())
+        i += 1
+    return keys
+
+
+def _read_windows_key() -> str:
+    """读取一个Windows按键（调用前已确认有按键）"""
+    ch = msvcrt.getch()
+    if ch in (b'\x00', b'\xe0'):
+        return WINDOWS_ARROW_KEYS.get(msvcrt.getch(), '')
+    if ch == b'\x1b':
+        return 'ESC'
+    return ch.decode('utf-8', errors='ignore').upper()
+
+
+class KeyboardInput:
+    """
+    键盘输入与唤醒的多路等待
+    POSIX：进入cbreak模式（关闭行缓冲和回显，保留Ctrl+C），用selectors同时等待标准输入和唤醒管道
+    Windows：msvcrt读取按键，唤醒用threading.Event
+    wake() 可在任意线程调用，使正在进行的 wait() 立即返回；在等待之前调用则下一次 wait() 立即返回
+    """
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin
+        self._pending: List[str] = []  # read_key多读到的按键
+        self._raw_depth = 0
+        self._saved_mode = None
+        if os.name == 'nt':
+            self._wake_event = threading.Event()
+            return
+        self._fd = self.stream.fileno()
+        self._is_tty = os.isatty(self._fd)
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._wake_r, selectors.EVENT_READ, 'wake')
+        try:
+            self._selector.register(self._fd, selectors.EVENT_READ, 'key')
+        except (OSError, ValueError):
+            pass  # 标准输入不可等待（如普通文件），只等待唤醒
+
+    def __enter__(self) -> 'KeyboardInput':
+        """进入逐键读取模式（可嵌套）"""
+        if self._raw_depth == 0 and os.name != 'nt' and self._is_tty:
+            self._saved_mode = termios.tcgetattr(self._fd)
+            tty.setcbreak(self._fd)
+        self._raw_depth += 1
+        return self
+
+    def __exit__(self, *exc):
+        self._raw_depth -= 1
+        if self._raw_depth == 0 and self._saved_mode is not None:
+            termios.tcsetattr(self._fd, termios.TCSADRAIN, self._saved_mode)
+            self._saved_mode = None
+
+    @contextmanager
+    def line_mode(self):
+        """临时恢复行输入模式（回显、行编辑），用于在逐键模式中输入一行文字"""
+        saved = self._saved_mode
+        if saved is None:
+            yield
+            return
+        raw = termios.tcgetattr(self._fd)
+        termios.tcsetattr(self._fd, termios.TCSADRAIN, saved)
+        try:
+            yield
+        finally:
+            termios.tcsetattr(self._fd, termios.TCSADRAIN, raw)
+
+    def read_line(self, prompt: str = "") -> str:
+        """读取一行输入（逐键模式下也可正常回显和编辑）"""
+        self._pending.clear()
+        with self.line_mode():
+            return input(prompt)
+
+    def wake(self):
+        """从其他线程唤醒正在等待的 wait()"""
+        if os.name == 'nt':
+            self._wake_event.set()
+            return
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass  # 管道已满，说明已有未处理的唤醒
+
+    def wait(self, timeout: Optional[float] = None) -> List[str]:
+        """阻塞直到有按键、被唤醒或超时，返回期间的所有按键（被唤醒或超时时可能为空）"""
+        if self._pending:
+            keys, self._pending = self._pending, []
+            return keys
+        if os.name == 'nt':
+            return self._wait_windows(timeout)
+        keys = []
+        for key, _ in self._selector.select(timeout):
+            if key.data == 'wake':
+                self._drain_wake()
+            else:
+                keys.extend(self._read_keys())
+        return keys
+
+    def read_key(self) -> str:
+        """阻塞读取一个按键（忽略唤醒）"""
+        with self:
+            while not self._pending:
+                self._pending = self.wait()
+            return self._pending.pop(0)
+
+    def close(self):
+        if os.name != 'nt':
+            self._selector.close()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+
+    def _drain_wake(self):
+        try:
+            while os.read(self._wake_r, 1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _read_keys(self) -> List[str]:
+        data = os.read(self._fd, 1024)
+        if not data:
+            # 标准输入已关闭，不再等待它
+            self._selector.unregister(self._fd)
+            return []
+        keys = decode_keys(data.decode('utf-8', errors='ignore'))
+        if not self._is_tty:
+            # 非终端输入（如管道）按行到达，去掉换行
+            keys = [key for key in keys if key not in ('\n', '\r')]
+        return keys
+
+    def _wait_windows(self, timeout: Optional[float]) -> List[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not msvcrt.kbhit():
+            interval = WINDOWS_POLL_INTERVAL
+            if deadline is not None:
+                interval = min(interval, deadline - time.monotonic())
+                if interval <= 0:
+                    return []
+            if self._wake_event.wait(interval):
+                break
+        self._wake_event.clear()
+        keys = []
+        while msvcrt.kbhit():
+            key = _read_windows_key()
+            if key:
+                keys.append(key)
+        return keys
@@ -6,52 +6,21 @@ import os
 import time
 import random
 import threading
+from contextlib import nullcontext
 
 # 添加当前目录到路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from game_state import GameState
-from server import GameServer
+from server import GameServer, create_server
 from client import GameClient
 from renderer import Renderer
-from config import BUILDINGS, UNITS, DEFAULT_PORT, RECOMMENDED_MAP_SIZES, MAP_SIZE_PRESETS
-
-# Windows 实时按键
-if os.name == 'nt':
-    import msvcrt
-
-
-def get_key():
-    """获取按键（非阻塞，Windows）"""
-    if os.name == 'nt':
-        if msvcrt.kbhit():
-            ch = msvcrt.getch()
-            # 处理方向键等特殊键
-            if ch in (b'\x00', b'\xe0'):
-                ch2 = msvcrt.getch()
-                # 方向键映射到 WASD
-                arrow_map = {b'H': 'W', b'P': 'S', b'K': 'A', b'M': 'D'}
-                return arrow_map.get(ch2, '')
-            # ESC键
-            if ch == b'\x1b':
-                return 'ESC'
-            return ch.decode('utf-8', errors='ignore').upper()
-    return None
-
-
-def get_key_blocking():
-    """获取按键（阻塞，等待用户输入）"""
-    if os.name == 'nt':
-        ch = msvcrt.getch()
-        if ch in (b'\x00', b'\xe0'):
-            ch2 = msvcrt.getch()
-            arrow_map = {b'H': 'W', b'P': 'S', b'K': 'A', b'M': 'D'}
-            return arrow_map.get(ch2, '')
-        if ch == b'\x1b':
-            return 'ESC'
-        return ch.decode('utf-8', errors='ignore').upper()
-    return input().strip().upper()
-
+from keyboard import KeyboardInput
+from screen import FrameLimiter
+from config import (
+    BUILDINGS, UNITS, DEFAULT_PORT, RECOMMENDED_MAP_SIZES, MAP_SIZE_PRESETS,
+    RENDER_FPS_CAP, RENDER_DEBUG_OVERLAY
+)
 
 def check_ctrl_pressed():
     """检查CTRL键是否按下（Windows）"""
@@ -66,6 +35,9 @@ class Game:
 
     def __init__(self):
         self.renderer = Renderer()
+        self.keyboard = KeyboardInput()  # 按键和网络状态更新在同一处等待
+        self.renderer.keyboard = self.keyboard
+        self.frame_limiter = FrameLimiter(RENDER_FPS_CAP)
         self.server: GameServer = None
         self.client: GameClient = None
         self.game_state: GameState = None
@@ -84,7 +56,7 @@ class Game:
         """运行游戏"""
         while self.running:
             self.renderer.render_main_menu()
-            choice = input("请选择: ").strip()
+            choice = self.keyboard.read_line("请选择: ").strip()
 
             if choice == '1':
                 self.create_room()
@@ -104,14 +76,14 @@ class Game:
     def show_help(self):
         """显示帮助"""
         self.renderer.render_help()
-        get_key_blocking()
+        self.keyboard.read_key()
 
     def create_room(self):
         """创建房间"""
         self.renderer.clear_screen()
-        name = input("请输入你的名字: ").strip() or "房主"
+        name = self.keyboard.read_line("请输入你的名字: ").strip() or "房主"
 
-        self.server = GameServer()
+        self.server = create_server()
         local_ip = self.server.start(name)
         self.is_host = True
         self.player_id = 0
@@ -151,7 +123,7 @@ class Game:
                 internet_ip=internet_info
             )
 
-            cmd = input("输入命令: ").strip().upper()
+            cmd = self.keyboard.read_line("输入命令: ").strip().upper()
 
             if cmd == 'S':
                 if num_players >= 1:
@@ -215,7 +187,7 @@ class Game:
         print()
         print("=" * 60)
 
-        choice = input("选择: ").strip()
+        choice = self.keyboard.read_line("选择: ").strip()
 
         if choice == '0':
             self.map_width = None
@@ -229,7 +201,7 @@ class Game:
                 print(f"已选择: {name} ({self.map_width}x{self.map_height})")
             elif choice_num == len(preset_keys) + 1:
                 # 自定义大小
-                custom = input("输入自定义大小 (宽x高, 如 120x60): ").strip()
+                custom = self.keyboard.read_line("输入自定义大小 (宽x高, 如 120x60): ").strip()
                 try:
                     w, h = map(int, custom.lower().split('x'))
                     if 40 <= w <= 300 and 20 <= h <= 150:
@@ -245,8 +217,8 @@ class Game:
     def join_room(self):
         """加入房间"""
         self.renderer.clear_screen()
-        name = input("请输入你的名字: ").strip() or "玩家"
-        host_input = input("请输入房主IP (可包含端口如 192.168.1.1:5555): ").strip() or "127.0.0.1"
+        name = self.keyboard.read_line("请输入你的名字: ").strip() or "玩家"
+        host_input = self.keyboard.read_line("请输入房主IP (可包含端口如 192.168.1.1:5555): ").strip() or "127.0.0.1"
 
         # 解析 IP:端口 格式
         if ':' in host_input:
@@ -267,7 +239,7 @@ class Game:
 
         if not success:
             print(f"连接失败: {msg}")
-            input("按回车返回...")
+            self.keyboard.read_line("按回车返回...")
             return
 
         print(f"连接成功! 你是玩家 #{self.client.get_player_id() + 1}")
@@ -276,48 +248,52 @@ class Game:
 
         self.client.on_game_start = self._on_game_start
         self.client.on_state_update = self._on_state_update
-        self.client.on_player_list_update = lambda pl: None
+        self.client.on_player_list_update = lambda pl: self.keyboard.wake()
+        self.client.on_disconnect = self.keyboard.wake
 
         self._client_lobby()
 
     def _client_lobby(self):
-        """客户端等待大厅"""
-        while self.client.is_connected():
-            self.renderer.render_lobby(
-                self.client.get_player_list(),
-                is_host=False
-            )
+        """客户端等待大厅（玩家列表变化、游戏开始或断开时唤醒）"""
+        with self.keyboard:
+            while self.client.is_connected():
+                self.renderer.render_lobby(
+                    self.client.get_player_list(),
+                    is_host=False
+                )
 
-            if self.client.game_state:
-                self.game_state = self.client.game_state
-                self._game_loop_client()
-                break
+                if self.client.game_state:
+                    self.game_state = self.client.game_state
+                    self._game_loop_client()
+                    break
 
-            print("等待房主开始游戏... (Q退出)")
+                print("等待房主开始游戏... (Q退出)")
 
-            if os.name == 'nt':
-                if msvcrt.kbhit():
-                    key = msvcrt.getch().decode('utf-8', errors='ignore').upper()
-                    if key == 'Q':
-                        self.client.disconnect()
-                        break
-            time.sleep(0.5)
+                if 'Q' in self.keyboard.wait():
+                    self.client.disconnect()
+                    break
+
+    def _request_refresh(self):
+        """其他线程改变了要显示的状态：标记重绘并唤醒主循环"""
+        self.need_refresh = True
+        self.frame_limiter.add_events()
+        self.keyboard.wake()
 
     def _on_game_start(self, state: GameState):
         """游戏开始回调"""
         self.game_state = state
-        self.need_refresh = True
+        self._request_refresh()
 
     def _on_state_update(self, state: GameState):
         """状态更新回调"""
         self.game_state = state
-        self.need_refresh = True
         self.waiting_for_sync = False
+        self._request_refresh()
 
     def single_player_test(self):
         """单机测试模式"""
         self.renderer.clear_screen()
-        name = input("请输入你的名字: ").strip() or "测试玩家"
+        name = self.keyboard.read_line("请输入你的名字: ").strip() or "测试玩家"
 
         self.game_state = GameState()
         self.game_state.initialize_game([name, "AI对手"], random.randint(1, 99999))
@@ -335,28 +311,20 @@ class Game:
 
         self.need_refresh = True
 
-        while True:
-            if self.game_state.game_over:
-                winner = self.game_state.get_player(self.game_state.winner_id)
-                self.renderer.render_game_over(winner)
-                get_key_blocking()
-                break
-
-            if self.need_refresh:
-                self.renderer.render_game(self.game_state, self.player_id, self.message)
-                self.need_refresh = False
-
-            # 实时按键检测
-            key = get_key()
-            if key is None:
-                time.sleep(0.03)  # 30ms 刷新率
-                continue
+        with self.keyboard:
+            while True:
+                if self.game_state.game_over:
+                    winner = self.game_state.get_player(self.game_state.winner_id)
+                    self.renderer.render_game_over(winner)
+                    self.keyboard.read_key()
+                    break
 
-            self._process_key(key)
+                self._pump_events(self._process_key)
 
     def _game_loop_host(self):
         """房主游戏循环 - 实时按键"""
         self.server.on_action = self._handle_client_action
+        self.server.on_all_ready = self._request_refresh
 
         player = self.game_state.get_player(self.player_id)
         self.renderer.selected_x = player.capital_x
@@ -365,23 +333,15 @@ class Game:
 
         self.need_refresh = True
 
-        while True:
-            if self.game_state.game_over:
-                winner = self.game_state.get_player(self.game_state.winner_id)
-                self.renderer.render_game_over(winner)
-                get_key_blocking()
-                break
-
-            if self.need_refresh:
-                self.renderer.render_game(self.game_state, self.player_id, self.message)
-                self.need_refresh = False
-
-            key = get_key()
-            if key is None:
-                time.sleep(0.03)
-                continue
+        with self.keyboard:
+            while True:
+                if self.game_state.game_over:
+                    winner = self.game_state.get_player(self.game_state.winner_id)
+                    self.renderer.render_game_over(winner)
+                    self.keyboard.read_key()
+                    break
 
-            self._process_key_host(key)
+                self._pump_events(self._process_key_host)
 
     def _game_loop_client(self):
         """客户端游戏循环 - 实时按键"""
@@ -392,23 +352,50 @@ class Game:
 
         self.need_refresh = True
 
-        while self.client.is_connected():
-            if self.game_state.game_over:
-                winner = self.game_state.get_player(self.game_state.winner_id)
-                self.renderer.render_game_over(winner)
-                get_key_blocking()
-                break
+        with self.keyboard:
+            while self.client.is_connected():
+                if self.game_state.game_over:
+                    winner = self.game_state.get_player(self.game_state.winner_id)
+                    self.renderer.render_game_over(winner)
+                    self.keyboard.read_key()
+                    break
 
-            if self.need_refresh:
-                self.renderer.render_game(self.game_state, self.player_id, self.message)
+                self._pump_events(self._process_key_client)
+
+    def _pump_events(self, process_key):
+        """
+        需要时渲染一帧（受帧率上限限制），然后阻塞等待按键或状态更新唤醒，处理期间到达的所有按键
+        距上一帧不足帧间隔时只等待到允许渲染为止，这段时间内的事件合并到同一帧
+        """
+        timeout = None
+        if self.need_refresh:
+            timeout = self.frame_limiter.time_until_next_frame()
+            if timeout <= 0:
                 self.need_refresh = False
-
-            key = get_key()
-            if key is None:
-                time.sleep(0.03)
-                continue
-
-            self._process_key_client(key)
+                self._render_frame()
+                timeout = None
+
+        keys = self.keyboard.wait(timeout)
+        self.frame_limiter.add_events(len(keys))
+        for key in keys:
+            process_key(key)
+
+    def _state_lock(self):
+        """
+        读取（渲染）self.game_state时需持有的锁，单机不需要
+        房主为模拟线程执行任务时持有的锁，客户端为接收线程修改状态用的锁
+        """
+        if self._hosting():
+            return self.server.simulation.lock
+        if not self.is_host and self.client:
+            return self.client.state_lock
+        return nullcontext()
+
+    def _render_frame(self):
+        """渲染游戏画面（总是当前最新的状态），可附带调试信息"""
+        with self.frame_limiter.frame(), self._state_lock():
+            overlay = self.frame_limiter.overlay_text() if RENDER_DEBUG_OVERLAY else ""
+            self.renderer.render_game(self.game_state, self.player_id, self.message, overlay)
 
     def _process_key(self, key: str):
         """处理按键（单机模式）"""
@@ -446,7 +433,7 @@ class Game:
         elif key == 'K':
             self._handle_nuke()
         elif key == 'ESC':
-            self.game_state.deselect_all(self.player_id)
+            self._apply(self.game_state.deselect_all, self.player_id)
             self.message = "取消所有选择"
         elif key == 'C':
             player = self.game_state.get_player(self.player_id)
@@ -455,7 +442,7 @@ class Game:
             self.renderer.center_camera_on(player.capital_x, player.capital_y, self.game_state)
         elif key == 'H':
             self.renderer.render_help()
-            get_key_blocking()
+            self.keyboard.read_key()
         elif key == 'E':
             self._end_turn_single()
 
@@ -508,7 +495,7 @@ class Game:
             self._handle_nuke()
             self.server.sync_game_state()
         elif key == 'ESC':
-            self.game_state.deselect_all(self.player_id)
+            self._apply(self.game_state.deselect_all, self.player_id)
             self.message = "取消所有选择"
         elif key == 'C':
             player = self.game_state.get_player(self.player_id)
@@ -517,7 +504,7 @@ class Game:
             self.renderer.center_camera_on(player.capital_x, player.capital_y, self.game_state)
         elif key == 'H':
             self.renderer.render_help()
-            get_key_blocking()
+            self.keyboard.read_key()
         elif key == 'E':
             self._end_turn_host()
 
@@ -557,7 +544,7 @@ class Game:
         elif key == 'K':
             self._handle_nuke_client()
         elif key == 'ESC':
-            self.game_state.deselect_all(self.player_id)
+            self._apply(self.game_state.deselect_all, self.player_id)
             self.message = "取消所有选择"
         elif key == 'C':
             player = self.game_state.get_player(self.player_id)
@@ -566,7 +553,7 @@ class Game:
             self.renderer.center_camera_on(player.capital_x, player.capital_y, self.game_state)
         elif key == 'H':
             self.renderer.render_help()
-            get_key_blocking()
+            self.keyboard.read_key()
         elif key == 'E':
             self._end_turn_client()
 
@@ -586,7 +573,7 @@ class Game:
     def _handle_select_unit(self, add_to_selection: bool = False):
         """处理选择单位"""
         x, y = self.renderer.selected_x, self.renderer.selected_y
-        success, msg = self.game_state.select_units_at(self.player_id, x, y, add_to_selection)
+        success, msg = self._apply(self.game_state.select_units_at, self.player_id, x, y, add_to_selection)
         self.message = msg
 
     def _handle_dispatch(self):
@@ -596,10 +583,10 @@ class Game:
             self.message = "没有选中的单位"
             return
 
-        target = input("派遣目标位置 (x,y): ").strip()
+        target = self.keyboard.read_line("派遣目标位置 (x,y): ").strip()
         try:
             tx, ty = map(int, target.split(','))
-            success, msg = self.game_state.move_selected_units(self.player_id, tx, ty)
+            success, msg = self._apply(self.game_state.move_selected_units, self.player_id, tx, ty)
             self.message = msg
             if success:
                 self.renderer.selected_x = tx
@@ -614,17 +601,16 @@ class Game:
             self.message = "没有选中的单位"
             return
 
-        target = input("派遣目标位置 (x,y): ").strip()
+        target = self.keyboard.read_line("派遣目标位置 (x,y): ").strip()
         try:
             tx, ty = map(int, target.split(','))
-            # 客户端需要发送每个选中单位的移动请求
-            for unit in selected:
-                self.client.send_action({
-                    'action': 'move',
-                    'unit_id': unit.id,
-                    'to_x': tx,
-                    'to_y': ty
-                })
+            # 所有选中单位的移动请求合为一批发送，服务器执行完后只同步一次
+            self.client.send_actions([{
+                'action': 'move',
+                'unit_id': unit.id,
+                'to_x': tx,
+                'to_y': ty
+            } for unit in selected])
             self.message = f"已发送{len(selected)}个单位的派遣请求"
         except (ValueError, TypeError):
             self.message = "无效输入"
@@ -641,7 +627,7 @@ class Game:
         print("  4(西)   5(无) 6(东)")
         print("  1(西南) 2(南) 3(东南)")
         print("选择: ", end='', flush=True)
-        choice = get_key_blocking()
+        choice = self.keyboard.read_key()
         print(choice)
 
         direction_map = {
@@ -652,7 +638,7 @@ class Game:
 
         if choice in direction_map:
             dx, dy = direction_map[choice]
-            success, msg = self.game_state.set_units_attack_direction(self.player_id, dx, dy)
+            success, msg = self._apply(self.game_state.set_units_attack_direction, self.player_id, dx, dy)
             self.message = msg
         else:
             self.message = "无效选择"
@@ -669,7 +655,7 @@ class Game:
         print("  4(西)   5(无) 6(东)")
         print("  1(西南) 2(南) 3(东南)")
         print("选择: ", end='', flush=True)
-        choice = get_key_blocking()
+        choice = self.keyboard.read_key()
         print(choice)
 
         direction_map = {
@@ -702,7 +688,7 @@ class Game:
         print("  4(西)   5(无) 6(东)")
         print("  1(西南) 2(南) 3(东南)")
         print("选择: ", end='', flush=True)
-        choice = get_key_blocking()
+        choice = self.keyboard.read_key()
         print(choice)
 
         direction_map = {
@@ -713,7 +699,7 @@ class Game:
 
         if choice in direction_map:
             dx, dy = direction_map[choice]
-            success, msg = self.game_state.set_units_defense_direction(self.player_id, dx, dy)
+            success, msg = self._apply(self.game_state.set_units_defense_direction, self.player_id, dx, dy)
             self.message = msg
         else:
             self.message = "无效选择"
@@ -730,7 +716,7 @@ class Game:
         print("  4(西)   5(无) 6(东)")
         print("  1(西南) 2(南) 3(东南)")
         print("选择: ", end='', flush=True)
-        choice = get_key_blocking()
+        choice = self.keyboard.read_key()
         print(choice)
 
         direction_map = {
@@ -765,7 +751,7 @@ class Game:
         else:
             self.renderer.render_unit_select_menu(units)
             print("选择单位: ", end='', flush=True)
-            choice = get_key_blocking()
+            choice = self.keyboard.read_key()
             print(choice)
 
             if choice == '0':
@@ -780,10 +766,10 @@ class Game:
                 self.message = "无效输入"
                 return
 
-        amount_str = input(f"分割数量 (当前{unit.count}k): ").strip()
+        amount_str = self.keyboard.read_line(f"分割数量 (当前{unit.count}k): ").strip()
         try:
             amount = int(amount_str)
-            success, msg = self.game_state.split_unit(self.player_id, unit.id, amount)
+            success, msg = self._apply(self.game_state.split_unit, self.player_id, unit.id, amount)
             self.message = msg
         except (ValueError, TypeError):
             self.message = "无效输入"
@@ -802,7 +788,7 @@ class Game:
         else:
             self.renderer.render_unit_select_menu(units)
             print("选择单位: ", end='', flush=True)
-            choice = get_key_blocking()
+            choice = self.keyboard.read_key()
             print(choice)
 
             if choice == '0':
@@ -817,7 +803,7 @@ class Game:
                 self.message = "无效输入"
                 return
 
-        amount_str = input(f"分割数量 (当前{unit.count}k): ").strip()
+        amount_str = self.keyboard.read_line(f"分割数量 (当前{unit.count}k): ").strip()
         try:
             amount = int(amount_str)
             self.client.send_action({
@@ -835,7 +821,7 @@ class Game:
         self.renderer.render_build_menu(player, self.game_state)
 
         print("选择建筑 (输入编号, 0取消): ", end='', flush=True)
-        choice = get_key_blocking()
+        choice = self.keyboard.read_key()
         print(choice)
 
         if choice == '0':
@@ -846,7 +832,8 @@ class Game:
             idx = int(choice) - 1
             if 0 <= idx < len(building_types):
                 building_type = building_types[idx]
-                success, msg = self.game_state.build(
+                success, msg = self._apply(
+                    self.game_state.build,
                     self.player_id,
                     building_type,
                     self.renderer.selected_x,
@@ -862,7 +849,7 @@ class Game:
         self.renderer.render_build_menu(player, self.game_state)
 
         print("选择建筑 (输入编号, 0取消): ", end='', flush=True)
-        choice = get_key_blocking()
+        choice = self.keyboard.read_key()
         print(choice)
 
         if choice == '0':
@@ -886,7 +873,7 @@ class Game:
     def _handle_upgrade(self):
         """处理升级（单机）"""
         x, y = self.renderer.selected_x, self.renderer.selected_y
-        success, msg = self.game_state.upgrade_building(self.player_id, x, y)
+        success, msg = self._apply(self.game_state.upgrade_building, self.player_id, x, y)
         self.message = msg
 
     def _handle_upgrade_client(self):
@@ -911,10 +898,10 @@ class Game:
                 refund = building.get_demolish_refund()
                 refund_msg = f"返还{refund}经济"
             print(f"\n确认拆除 {building.name}? {refund_msg} (Y确认, 其他取消): ", end='', flush=True)
-            confirm = get_key_blocking()
+            confirm = self.keyboard.read_key()
             print(confirm)
             if confirm == 'Y':
-                success, msg = self.game_state.demolish_building(self.player_id, x, y)
+                success, msg = self._apply(self.game_state.demolish_building, self.player_id, x, y)
                 self.message = msg
             else:
                 self.message = "取消拆除"
@@ -934,7 +921,7 @@ class Game:
                 refund = building.get_demolish_refund()
                 refund_msg = f"返还{refund}经济"
             print(f"\n确认拆除 {building.name}? {refund_msg} (Y确认, 其他取消): ", end='', flush=True)
-            confirm = get_key_blocking()
+            confirm = self.keyboard.read_key()
             print(confirm)
             if confirm == 'Y':
                 self.client.send_action({
@@ -961,7 +948,7 @@ class Game:
         unit_list = self.renderer.render_produce_menu(player, barracks_level, arms_factory_level)
 
         print("选择兵种 (输入编号, 0取消): ", end='', flush=True)
-        choice_str = input().strip()
+        choice_str = self.keyboard.read_line().strip()
 
         if choice_str == '0':
             return
@@ -970,10 +957,11 @@ class Game:
             idx = int(choice_str) - 1
             if 0 <= idx < len(unit_list):
                 unit_type = unit_list[idx]
-                count_str = input("生产数量 (k): ").strip() or "1"
+                count_str = self.keyboard.read_line("生产数量 (k): ").strip() or "1"
                 count = int(count_str)
 
-                success, msg = self.game_state.produce_unit(
+                success, msg = self._apply(
+                    self.game_state.produce_unit,
                     self.player_id,
                     unit_type,
                     count,
@@ -997,7 +985,7 @@ class Game:
         unit_list = self.renderer.render_produce_menu(player, barracks_level, arms_factory_level)
 
         print("选择兵种 (输入编号, 0取消): ", end='', flush=True)
-        choice_str = input().strip()
+        choice_str = self.keyboard.read_line().strip()
 
         if choice_str == '0':
             return
@@ -1006,7 +994,7 @@ class Game:
             idx = int(choice_str) - 1
             if 0 <= idx < len(unit_list):
                 unit_type = unit_list[idx]
-                count_str = input("生产数量 (k): ").strip() or "1"
+                count_str = self.keyboard.read_line("生产数量 (k): ").strip() or "1"
                 count = int(count_str)
 
                 self.client.send_action({
@@ -1035,7 +1023,7 @@ class Game:
         else:
             self.renderer.render_unit_select_menu(units)
             print("选择单位: ", end='', flush=True)
-            choice = get_key_blocking()
+            choice = self.keyboard.read_key()
             print(choice)
 
             if choice == '0':
@@ -1050,10 +1038,10 @@ class Game:
                 self.message = "无效输入"
                 return
 
-        target = input("目标位置 (x,y): ").strip()
+        target = self.keyboard.read_line("目标位置 (x,y): ").strip()
         try:
             tx, ty = map(int, target.split(','))
-            success, msg = self.game_state.move_unit(self.player_id, unit.id, tx, ty)
+            success, msg = self._apply(self.game_state.move_unit, self.player_id, unit.id, tx, ty)
             self.message = msg
             if success:
                 self.renderer.selected_x = tx
@@ -1076,7 +1064,7 @@ class Game:
         else:
             self.renderer.render_unit_select_menu(units)
             print("选择单位: ", end='', flush=True)
-            choice = get_key_blocking()
+            choice = self.keyboard.read_key()
             print(choice)
 
             if choice == '0':
@@ -1091,7 +1079,7 @@ class Game:
                 self.message = "无效输入"
                 return
 
-        target = input("目标位置 (x,y): ").strip()
+        target = self.keyboard.read_line("目标位置 (x,y): ").strip()
         try:
             tx, ty = map(int, target.split(','))
             self.client.send_action({
@@ -1119,7 +1107,7 @@ class Game:
         else:
             self.renderer.render_unit_select_menu(units)
             print("选择单位: ", end='', flush=True)
-            choice = get_key_blocking()
+            choice = self.keyboard.read_key()
             print(choice)
 
             if choice == '0':
@@ -1134,10 +1122,10 @@ class Game:
                 self.message = "无效输入"
                 return
 
-        target = input("攻击目标位置 (x,y): ").strip()
+        target = self.keyboard.read_line("攻击目标位置 (x,y): ").strip()
         try:
             tx, ty = map(int, target.split(','))
-            success, msg = self.game_state.attack(self.player_id, unit.id, tx, ty)
+            success, msg = self._apply(self.game_state.attack, self.player_id, unit.id, tx, ty)
             self.message = msg
         except (ValueError, TypeError):
             self.message = "无效输入"
@@ -1157,7 +1145,7 @@ class Game:
         else:
             self.renderer.render_unit_select_menu(units)
             print("选择单位: ", end='', flush=True)
-            choice = get_key_blocking()
+            choice = self.keyboard.read_key()
             print(choice)
 
             if choice == '0':
@@ -1172,7 +1160,7 @@ class Game:
                 self.message = "无效输入"
                 return
 
-        target = input("攻击目标位置 (x,y): ").strip()
+        target = self.keyboard.read_line("攻击目标位置 (x,y): ").strip()
         try:
             tx, ty = map(int, target.split(','))
             self.client.send_action({
@@ -1185,14 +1173,22 @@ class Game:
         except (ValueError, TypeError):
             self.message = "无效输入"
 
+    def _apply(self, func, *args):
+        """执行修改游戏状态的操作；联机房主模式下交给服务器的模拟线程执行，不与客户端操作并发"""
+        if self._hosting():
+            return self.server.simulation.call(func, *args)
+        with self._state_lock():
+            return func(*args)
+
+    def _hosting(self) -> bool:
+        """联机房主模式（游戏状态由服务器的模拟线程修改）"""
+        return self.is_host and self.server is not None and self.server.game_state is self.game_state
+
     def _handle_client_action(self, player_id: int, action: dict):
         """处理客户端操作（服务器端）"""
         success, msg = self.server.process_action(player_id, action)
-        self.server.send_to_player(player_id, {
-            'type': 'action_result',
-            'success': success,
-            'message': msg
-        })
+        self.server.send_action_result(player_id, action, success, msg)
+        self._request_refresh()
 
     def _handle_focus(self):
         """处理国策（单机/房主）"""
@@ -1210,11 +1206,11 @@ class Game:
                 print("  当前正在研究中，无法开始新国策")
             else:
                 print("  没有可研究的国策")
-            get_key_blocking()
+            self.keyboard.read_key()
             return
 
         print("选择国策 (输入编号, 0取消): ", end='', flush=True)
-        choice_str = input().strip()
+        choice_str = self.keyboard.read_line().strip()
 
         if choice_str == '0':
             return
@@ -1223,7 +1219,7 @@ class Game:
             idx = int(choice_str) - 1
             if 0 <= idx < len(focus_list):
                 focus_id = focus_list[idx]
-                success, msg = self.game_state.start_focus(self.player_id, focus_id)
+                success, msg = self._apply(self.game_state.start_focus, self.player_id, focus_id)
                 self.message = msg
             else:
                 self.message = "无效选择"
@@ -1246,11 +1242,11 @@ class Game:
                 print("  当前正在研究中，无法开始新国策")
             else:
                 print("  没有可研究的国策")
-            get_key_blocking()
+            self.keyboard.read_key()
             return
 
         print("选择国策 (输入编号, 0取消): ", end='', flush=True)
-        choice_str = input().strip()
+        choice_str = self.keyboard.read_line().strip()
 
         if choice_str == '0':
             return
@@ -1280,7 +1276,7 @@ class Game:
 
         can_launch, launcher_list = self.renderer.render_nuke_menu(player, has_nuke, launchers)
         if not can_launch:
-            get_key_blocking()
+            self.keyboard.read_key()
             return
 
         # 选择发射设施
@@ -1289,7 +1285,7 @@ class Game:
             print(f"  使用发射设施: ({selected_launcher.x},{selected_launcher.y})")
         else:
             print("选择发射设施编号: ", end='', flush=True)
-            choice = get_key_blocking()
+            choice = self.keyboard.read_key()
             print(choice)
             if choice == '0':
                 return
@@ -1304,7 +1300,7 @@ class Game:
                 self.message = "无效输入"
                 return
 
-        target = input("目标坐标 (x,y) 或 0取消: ").strip()
+        target = self.keyboard.read_line("目标坐标 (x,y) 或 0取消: ").strip()
         if target == '0':
             return
 
@@ -1316,14 +1312,14 @@ class Game:
             print(f"    ({tx-1},{ty})   ({tx},{ty})   ({tx+1},{ty})")
             print(f"    ({tx-1},{ty+1}) ({tx},{ty+1}) ({tx+1},{ty+1})")
             print("  确认发射? (Y确认, 其他取消): ", end='', flush=True)
-            confirm = get_key_blocking()
+            confirm = self.keyboard.read_key()
             print(confirm)
             if confirm != 'Y':
                 self.message = "取消发射"
                 return
 
             launcher_id = selected_launcher.x * 10000 + selected_launcher.y
-            success, msg = self.game_state.launch_nuke(self.player_id, launcher_id, tx, ty)
+            success, msg = self._apply(self.game_state.launch_nuke, self.player_id, launcher_id, tx, ty)
             self.message = msg
         except (ValueError, TypeError):
             self.message = "无效输入"
@@ -1339,7 +1335,7 @@ class Game:
 
         can_launch, launcher_list = self.renderer.render_nuke_menu(player, has_nuke, launchers)
         if not can_launch:
-            get_key_blocking()
+            self.keyboard.read_key()
             return
 
         # 选择发射设施
@@ -1348,7 +1344,7 @@ class Game:
             print(f"  使用发射设施: ({selected_launcher.x},{selected_launcher.y})")
         else:
             print("选择发射设施编号: ", end='', flush=True)
-            choice = get_key_blocking()
+            choice = self.keyboard.read_key()
             print(choice)
             if choice == '0':
                 return
@@ -1363,7 +1359,7 @@ class Game:
                 self.message = "无效输入"
                 return
 
-        target = input("目标坐标 (x,y) 或 0取消: ").strip()
+        target = self.keyboard.read_line("目标坐标 (x,y) 或 0取消: ").strip()
         if target == '0':
             return
 
@@ -1375,7 +1371,7 @@ class Game:
             print(f"    ({tx-1},{ty})   ({tx},{ty})   ({tx+1},{ty})")
             print(f"    ({tx-1},{ty+1}) ({tx},{ty+1}) ({tx+1},{ty+1})")
             print("  确认发射? (Y确认, 其他取消): ", end='', flush=True)
-            confirm = get_key_blocking()
+            confirm = self.keyboard.read_key()
             print(confirm)
             if confirm != 'Y':
                 self.message = "取消发射"
@@ -1399,10 +1395,8 @@ class Game:
 
     def _end_turn_host(self):
         """结束回合（房主）"""
-        player = self.game_state.get_player(self.player_id)
-        player.ready_for_next_turn = True
         self.message = "等待其他玩家结束回合..."
-        self.server._check_all_ready()
+        self.server.mark_ready(self.player_id)
 
     def _end_turn_client(self):
         """结束回合（客户端）"""
@@ -1,9 +1,27 @@
 # -*- coding: utf-8 -*-
 """地图生成器"""
 
+import base64
 import random
-from typing import List, Tuple, Set
-from config import MAP_WIDTH, MAP_HEIGHT, TERRAIN_PLAIN, TERRAIN_RIVER
+import threading
+from itertools import groupby
+from typing import Dict, List, Optional, Tuple, Set
+from config import (
+    MAP_WIDTH, MAP_HEIGHT, TERRAIN_PLAIN, TERRAIN_RIVER, TERRAIN_BRIDGE, MAP_ARRAY_BACKEND,
+    MAP_PROTOCOL_VERSION
+)
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖，缺失时使用纯Python列表地图
+    np = None
+
+# 数组模式下的地形编码和无主哨兵值
+TERRAIN_CODES = {TERRAIN_PLAIN: 0, TERRAIN_RIVER: 1, TERRAIN_BRIDGE: 2}
+TERRAIN_SYMBOLS = {code: symbol for symbol, code in TERRAIN_CODES.items()}
+NO_OWNER = -1
+MAX_RUN_LENGTH = 255  # 领土游程编码中单个游程的最大长度（1字节）
+_OWNER_CODES = {None: 0, **{owner: owner + 1 for owner in range(255)}}  # 归属 -> 编码字节
 
 
 class GameMap:
@@ -12,8 +30,36 @@ class GameMap:
     def __init__(self, width: int = MAP_WIDTH, height: int = MAP_HEIGHT):
         self.width = width
         self.height = height
-        self.terrain = [[TERRAIN_PLAIN for _ in range(width)] for _ in range(height)]
-        self.territory = [[None for _ in range(width)] for _ in range(height)]  # 领土归属
+        self._owner_counts = {}  # 各玩家领土格数，随领土变化增量维护
+        self._territory_versions = {}  # 各玩家领土最近一次变化的序号
+        self._version_seq = 0
+        self._load_version = 0
+        self._dirty_cells: Set[Tuple[int, int]] = set()  # 上次取走后领土变化过的格子（增量同步用）
+        # 其他关注领土变化的格子集合（如渲染缓存），{编号: 集合}；写入和取走都持有_watch_lock
+        self._watchers: Dict[int, Set[Tuple[int, int]]] = {}
+        self._watch_lock = threading.Lock()
+        self._next_watcher = 0
+        self._allocate()
+
+    def _allocate(self):
+        """分配地形和领土网格"""
+        self.terrain = [[TERRAIN_PLAIN for _ in range(self.width)] for _ in range(self.height)]
+        self.territory = [[None for _ in range(self.width)] for _ in range(self.height)]  # 领土归属
+
+    def _adjust_count(self, owner_id: Optional[int], delta: int):
+        """增量更新某玩家的领土计数"""
+        if owner_id is None or delta == 0:
+            return
+        self._version_seq += 1
+        self._territory_versions[owner_id] = self._version_seq
+        count = self._owner_counts.get(owner_id, 0) + delta
+        if count:
+            self._owner_counts[owner_id] = count
+        else:
+            self._owner_counts.pop(owner_id, None)
+
+    def _set_terrain(self, x: int, y: int, terrain: str):
+        self.terrain[y][x] = terrain
 
     def generate(self, river_count: int = 5, seed: int = None):
         """生成地图，包含河流"""
@@ -46,14 +92,14 @@ class GameMap:
 
         for _ in range(length):
             if 0 <= x < self.width and 0 <= y < self.height:
-                self.terrain[y][x] = TERRAIN_RIVER
+                self._set_terrain(x, y, TERRAIN_RIVER)
                 # 两格宽：在垂直于流向的方向添加一格
                 if direction[0] == 0:  # 垂直流动，水平扩展
                     if x + 1 < self.width:
-                        self.terrain[y][x + 1] = TERRAIN_RIVER
+                        self._set_terrain(x + 1, y, TERRAIN_RIVER)
                 else:  # 水平流动，垂直扩展
                     if y + 1 < self.height:
-                        self.terrain[y + 1][x] = TERRAIN_RIVER
+                        self._set_terrain(x, y + 1, TERRAIN_RIVER)
 
             # 随机改变方向（蜿蜒效果）
             if random.random() < 0.3:
@@ -86,7 +132,12 @@ class GameMap:
         """设置领土归属（河流不可占领）"""
         if 0 <= x < self.width and 0 <= y < self.height:
             if self.terrain[y][x] != TERRAIN_RIVER:
-                self.territory[y][x] = owner_id
+                old_owner = self.territory[y][x]
+                if old_owner != owner_id:
+                    self.territory[y][x] = owner_id
+                    self._mark_dirty(x, y)
+                    self._adjust_count(old_owner, -1)
+                    self._adjust_count(owner_id, 1)
 
     def claim_territory_radius(self, center_x: int, center_y: int, radius: int, owner_id: int):
         """占领以某点为中心的圆形区域（河流不可占领）"""
@@ -96,7 +147,161 @@ class GameMap:
                     x, y = center_x + dx, center_y + dy
                     if 0 <= x < self.width and 0 <= y < self.height:
                         if self.terrain[y][x] != TERRAIN_RIVER:
-                            self.territory[y][x] = owner_id
+                            self.set_territory(x, y, owner_id)
+
+    def count_territory(self, owner_id: int) -> int:
+        """某玩家的领土格数（增量维护的计数，O(1)）"""
+        return self._owner_counts.get(owner_id, 0)
+
+    def count_territory_by_owner(self) -> Dict[int, int]:
+        """所有玩家的领土格数 {owner_id: count}"""
+        return dict(self._owner_counts)
+
+    def recount_territory(self) -> Dict[int, int]:
+        """全图扫描重新统计各玩家领土格数"""
+        counts = {}
+        for row in self.territory:
+            for owner in row:
+                if owner is not None:
+                    counts[owner] = counts.get(owner, 0) + 1
+        return counts
+
+    def reassign_territory(self, old_owner: int, new_owner: Optional[int]) -> int:
+        """将某玩家的全部领土转给另一玩家，返回转移格数"""
+        changed = 0
+        for y, row in enumerate(self.territory):
+            for x, owner in enumerate(row):
+                if owner == old_owner:
+                    row[x] = new_owner
+                    self._mark_dirty(x, y)
+                    changed += 1
+        self._adjust_count(old_owner, -changed)
+        self._adjust_count(new_owner, changed)
+        return changed
+
+    def _mark_dirty(self, x: int, y: int):
+        self._dirty_cells.add((x, y))
+        if self._watchers:
+            with self._watch_lock:
+                for watcher in self._watchers.values():
+                    watcher.add((x, y))
+
+    def _mark_dirty_cells(self, cells: List[Tuple[int, int]]):
+        self._dirty_cells.update(cells)
+        if self._watchers:
+            with self._watch_lock:
+                for watcher in self._watchers.values():
+                    watcher.update(cells)
+
+    def watch_territory(self) -> int:
+        """
+        注册一个领土变化记录，返回编号：之后领土变化的格子都会记入，由take_watched_territory取走
+        与增量同步的脏格子互不影响；整体载入领土时记入全部格子
+        """
+        with self._watch_lock:
+            watcher = self._next_watcher
+            self._next_watcher += 1
+            self._watchers[watcher] = set()
+        return watcher
+
+    def take_watched_territory(self, watcher: int) -> Set[Tuple[int, int]]:
+        """取走某记录中上次调用以来变化的格子（换成新的空集合，可与修改领土的线程并发调用）"""
+        with self._watch_lock:
+            changes = self._watchers.get(watcher, set())
+            if watcher in self._watchers:
+                self._watchers[watcher] = set()
+        return changes
+
+    def unwatch_territory(self, watcher: int):
+        """注销watch_territory返回的记录"""
+        with self._watch_lock:
+            self._watchers.pop(watcher, None)
+
+    def take_territory_changes(self) -> List[Tuple[int, int, Optional[int]]]:
+        """取走上次调用以来领土变化过的格子 [(x, y, 当前归属), ...]"""
+        changes = [(x, y, self.get_territory_owner(x, y)) for x, y in sorted(self._dirty_cells)]
+        self._dirty_cells.clear()
+        return changes
+
+    def territory_version(self, owner_id: int) -> int:
+        """某玩家领土的版本号（领土变化后变化），供视野等缓存判断是否失效"""
+        return self._territory_versions.get(owner_id, self._load_version)
+
+    def _reset_counts(self):
+        """整体载入领土后重建计数，并让所有玩家的领土版本失效"""
+        self._owner_counts = self.recount_territory()
+        self._territory_versions = {}
+        self._version_seq += 1
+        self._load_version = self._version_seq
+        self._dirty_cells.clear()
+        if self._watchers:
+            self._mark_dirty_cells([(x, y) for y in range(self.height) for x in range(self.width)])
+            self._dirty_cells.clear()
+
+    def verify_territory_counts(self) -> Tuple[bool, str]:
+        """调试用：核对增量计数与全图重新统计是否一致"""
+        actual = self.recount_territory()
+        if actual != self._owner_counts:
+            return False, f"领土计数不一致: 计数={self._owner_counts} 实际={actual}"
+        return True, "领土计数一致"
+
+    def get_owner_cells(self, owner_id: int) -> List[Tuple[int, int]]:
+        """获取某玩家拥有的所有格子"""
+        cells = []
+        for y, row in enumerate(self.territory):
+            for x, owner in enumerate(row):
+                if owner == owner_id:
+                    cells.append((x, y))
+        return cells
+
+    def get_terrain_rows(self) -> List[List[str]]:
+        """地形网格（可序列化的行列表）"""
+        return self.terrain
+
+    def get_territory_rows(self) -> List[List[Optional[int]]]:
+        """领土网格（可序列化的行列表，无主为None）"""
+        return self.territory
+
+    def load_terrain(self, terrain: List[List[str]]):
+        """从行列表载入地形"""
+        self.terrain = terrain
+
+    def load_territory(self, territory: List[List[Optional[int]]]):
+        """原地载入领土（动态层），地形和网格对象保持不变"""
+        for row, new_row in zip(self.territory, territory):
+            row[:] = new_row
+        self._reset_counts()
+
+    def encode_territory(self) -> str:
+        """
+        领土紧凑编码：逐行游程编码（游程不跨行），每个游程2字节(归属+1, 长度)，再base64
+        归属编码0表示无主，游程长度不超过MAX_RUN_LENGTH
+        """
+        packed = []
+        for row in self.territory:
+            for owner, run in groupby(row):
+                code, length = _OWNER_CODES[owner], len(list(run))
+                while length > MAX_RUN_LENGTH:
+                    packed += (code, MAX_RUN_LENGTH)
+                    length -= MAX_RUN_LENGTH
+                packed += (code, length)
+        return base64.b64encode(bytes(packed)).decode('ascii')
+
+    def load_encoded_territory(self, text: str):
+        """载入encode_territory编码的领土"""
+        packed = base64.b64decode(text)
+        flat = []
+        for i in range(0, len(packed), 2):
+            code = packed[i]
+            flat.extend([None if code == 0 else code - 1] * packed[i + 1])
+        self.load_territory([flat[y * self.width:(y + 1) * self.width] for y in range(self.height)])
+
+    def load_territory_dict(self, data: dict):
+        """从to_dict的地图数据载入领土（兼容行列表和紧凑编码两种格式）"""
+        if 'territory_rle' in data:
+            self.load_encoded_territory(data['territory_rle'])
+        else:
+            self.load_territory(data['territory'])
 
     def get_spawn_positions(self, num_players: int) -> List[Tuple[int, int]]:
         """为玩家生成分散的出生点"""
@@ -136,14 +341,14 @@ class GameMap:
         final_positions = []
         for x, y in positions[:num_players]:
             # 如果在河流上，寻找附近的平地
-            if self.terrain[y][x] == TERRAIN_RIVER:
+            if self.get_terrain(x, y) == TERRAIN_RIVER:
                 found = False
                 for r in range(1, 10):
                     for dy in range(-r, r + 1):
                         for dx in range(-r, r + 1):
                             nx, ny = x + dx, y + dy
                             if 0 <= nx < self.width and 0 <= ny < self.height:
-                                if self.terrain[ny][nx] == TERRAIN_PLAIN:
+                                if self.get_terrain(nx, ny) == TERRAIN_PLAIN:
                                     x, y = nx, ny
                                     found = True
                                     break
@@ -164,17 +369,143 @@ class GameMap:
                 adjacent.append((nx, ny))
         return adjacent
 
-    def to_dict(self) -> dict:
-        return {
+    def to_dict(self, include_terrain: bool = True) -> dict:
+        """序列化；地形生成后不再变化（桥梁属于建筑），include_terrain=False 时只含领土"""
+        data = {
             'width': self.width,
-            'height': self.height,
-            'terrain': self.terrain,
-            'territory': self.territory
+            'height': self.height
         }
+        # 协议版本2起领土使用紧凑编码
+        if MAP_PROTOCOL_VERSION >= 2:
+            data['territory_rle'] = self.encode_territory()
+        else:
+            data['territory'] = self.get_territory_rows()
+        if include_terrain:
+            data['terrain'] = self.get_terrain_rows()
+        return data
 
     @staticmethod
     def from_dict(data: dict) -> 'GameMap':
-        game_map = GameMap(data['width'], data['height'])
-        game_map.terrain = data['terrain']
-        game_map.territory = data['territory']
+        game_map = create_game_map(data['width'], data['height'])
+        game_map.load_terrain(data['terrain'])
+        game_map.load_territory_dict(data)
         return game_map
+
+
+class ArrayGameMap(GameMap):
+    """数组地图 - 地形为uint8编码网格，领土为int16网格（NO_OWNER表示无主），支持向量化批量操作"""
+
+    def _allocate(self):
+        self._terrain = np.zeros((self.height, self.width), dtype=np.uint8)
+        self._owner = np.full((self.height, self.width), NO_OWNER, dtype=np.int16)
+
+    def _set_terrain(self, x: int, y: int, terrain: str):
+        self._terrain[y, x] = TERRAIN_CODES[terrain]
+
+    def get_terrain(self, x: int, y: int) -> str:
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return TERRAIN_SYMBOLS[int(self._terrain[y, x])]
+        return None
+
+    def get_territory_owner(self, x: int, y: int) -> int:
+        if 0 <= x < self.width and 0 <= y < self.height:
+            owner = int(self._owner[y, x])
+            return None if owner == NO_OWNER else owner
+        return None
+
+    def set_territory(self, x: int, y: int, owner_id: int):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            if self._terrain[y, x] != TERRAIN_CODES[TERRAIN_RIVER]:
+                old_owner = int(self._owner[y, x])
+                new_owner = NO_OWNER if owner_id is None else owner_id
+                if old_owner != new_owner:
+                    self._owner[y, x] = new_owner
+                    self._mark_dirty(x, y)
+                    self._adjust_count(None if old_owner == NO_OWNER else old_owner, -1)
+                    self._adjust_count(owner_id, 1)
+
+    def claim_territory_radius(self, center_x: int, center_y: int, radius: int, owner_id: int):
+        x0, x1 = max(0, center_x - radius), min(self.width, center_x + radius + 1)
+        y0, y1 = max(0, center_y - radius), min(self.height, center_y + radius + 1)
+        if x0 >= x1 or y0 >= y1:
+            return
+        dy, dx = np.ogrid[y0 - center_y:y1 - center_y, x0 - center_x:x1 - center_x]
+        mask = (dx * dx + dy * dy <= radius * radius)
+        region = self._owner[y0:y1, x0:x1]
+        mask &= self._terrain[y0:y1, x0:x1] != TERRAIN_CODES[TERRAIN_RIVER]
+        mask &= region != owner_id
+        old_owners, old_counts = np.unique(region[mask], return_counts=True)
+        for old_owner, count in zip(old_owners.tolist(), old_counts.tolist()):
+            self._adjust_count(None if old_owner == NO_OWNER else old_owner, -count)
+        self._adjust_count(owner_id, int(np.count_nonzero(mask)))
+        region[mask] = owner_id
+        ys, xs = np.nonzero(mask)
+        self._mark_dirty_cells(list(zip((xs + x0).tolist(), (ys + y0).tolist())))
+
+    def recount_territory(self) -> Dict[int, int]:
+        counts = np.bincount(self._owner.ravel() - NO_OWNER)
+        return {owner + NO_OWNER: int(c) for owner, c in enumerate(counts)
+                if owner + NO_OWNER != NO_OWNER and c > 0}
+
+    def reassign_territory(self, old_owner: int, new_owner: Optional[int]) -> int:
+        mask = self._owner == old_owner
+        self._owner[mask] = NO_OWNER if new_owner is None else new_owner
+        ys, xs = np.nonzero(mask)
+        self._mark_dirty_cells(list(zip(xs.tolist(), ys.tolist())))
+        changed = int(np.count_nonzero(mask))
+        self._adjust_count(old_owner, -changed)
+        self._adjust_count(new_owner, changed)
+        return changed
+
+    def get_owner_cells(self, owner_id: int) -> List[Tuple[int, int]]:
+        ys, xs = np.nonzero(self._owner == owner_id)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    def territory_mask(self, owner_id: int):
+        """某玩家领土的布尔网格"""
+        return self._owner == owner_id
+
+    def get_terrain_rows(self) -> List[List[str]]:
+        symbols = [TERRAIN_SYMBOLS[code] for code in range(max(TERRAIN_SYMBOLS) + 1)]
+        return [[symbols[code] for code in row] for row in self._terrain.tolist()]
+
+    def get_territory_rows(self) -> List[List[Optional[int]]]:
+        return [[None if owner == NO_OWNER else owner for owner in row] for row in self._owner.tolist()]
+
+    def load_terrain(self, terrain: List[List[str]]):
+        self._terrain = np.array([[TERRAIN_CODES[t] for t in row] for row in terrain], dtype=np.uint8)
+
+    def load_territory(self, territory: List[List[Optional[int]]]):
+        self._owner[:] = [[NO_OWNER if owner is None else owner for owner in row] for row in territory]
+        self._reset_counts()
+
+    def encode_territory(self) -> str:
+        codes = (self._owner.ravel() - NO_OWNER).astype(np.uint8)
+        # 游程起点：归属变化处和每行行首
+        is_start = np.empty(codes.size, dtype=bool)
+        is_start[0] = True
+        is_start[1:] = codes[1:] != codes[:-1]
+        is_start[::self.width] = True
+        starts = np.flatnonzero(is_start)
+        lengths = np.diff(np.append(starts, codes.size))
+        # 超长游程拆成多个不超过MAX_RUN_LENGTH的游程
+        chunks = (lengths + MAX_RUN_LENGTH - 1) // MAX_RUN_LENGTH
+        run_lengths = np.full(int(chunks.sum()), MAX_RUN_LENGTH, dtype=np.int64)
+        run_lengths[np.cumsum(chunks) - 1] = lengths - MAX_RUN_LENGTH * (chunks - 1)
+        packed = np.empty(run_lengths.size * 2, dtype=np.uint8)
+        packed[0::2] = np.repeat(codes[starts], chunks)
+        packed[1::2] = run_lengths
+        return base64.b64encode(packed.tobytes()).decode('ascii')
+
+    def load_encoded_territory(self, text: str):
+        packed = np.frombuffer(base64.b64decode(text), dtype=np.uint8)
+        flat = np.repeat(packed[0::2], packed[1::2]).astype(np.int16) + NO_OWNER
+        self._owner[:] = flat.reshape(self.height, self.width)
+        self._reset_counts()
+
+
+def create_game_map(width: int = MAP_WIDTH, height: int = MAP_HEIGHT) -> GameMap:
+    """创建地图：numpy可用且启用数组模式时使用ArrayGameMap"""
+    if MAP_ARRAY_BACKEND and np is not None:
+        return ArrayGameMap(width, height)
+    return GameMap(width, height)
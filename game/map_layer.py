@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""地图图层缓存 - 整张地图每格合成后的 (字符, 样式)，摄像机平移和光标移动只需切片"""
+
+from typing import Dict, List, Optional, Set, Tuple
+from game_state import GameState
+from screen import Cell
+from config import (
+    TERRAIN_RIVER, PLAYER_SYMBOLS, PLAYER_COLORS, SYMBOL_CAPITAL, SYMBOL_ARMY, SYMBOL_SELECTED,
+    RAILWAY_SYMBOL_H, RAILWAY_SYMBOL_V, RAILWAY_SYMBOL_CROSS, TRAIN_SYMBOL
+)
+
+RIVER_CELL = ('~', '\033[96m')  # 青色河流
+
+
+class MapLayer:
+    """
+    按当前玩家视角合成的整图格子缓存，每帧update一次：
+    - 领土变化：通过GameMap.watch_territory/take_watched_territory取得变化的格子，只重算这些格子
+    - 铁路变化：重算变化的铁路格及其相邻格（铁路方向取决于相邻格）
+    - 单位/建筑/火车/首都/选中单位的版本变化：重建实体索引，只重算新旧实体所在的格子
+    都没有变化时update不重算任何格子；换了GameState、地图或玩家时整图重建
+    """
+
+    def __init__(self):
+        self.cells: List[List[Cell]] = []
+        self.rebuilt_cells = 0  # 上次update重算的格子数
+        self._state: Optional[GameState] = None
+        self._map = None
+        self._player_id: Optional[int] = None
+        self._territory_watcher: Optional[int] = None  # GameMap.watch_territory返回的编号
+        self._entity_key = None
+        self._railway: frozenset = frozenset()
+        self._capitals: Dict[Tuple[int, int], int] = {}
+        self._units: Dict[Tuple[int, int], list] = {}
+        self._buildings: Dict[Tuple[int, int], object] = {}
+        self._trains: Set[Tuple[int, int]] = set()
+
+    def update(self, game_state: GameState, player_id: int):
+        """使缓存与当前状态一致"""
+        if game_state is not self._state or game_state.game_map is not self._map or player_id != self._player_id:
+            self._rebuild(game_state, player_id)
+            return
+
+        dirty = self._map.take_watched_territory(self._territory_watcher)
+
+        railway = game_state.railway_cells.get(player_id, frozenset())
+        if railway != self._railway:
+            for x, y in self._railway.symmetric_difference(railway):
+                dirty.update(((x, y), (x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)))
+            self._railway = frozenset(railway)
+
+        key = self._make_entity_key()
+        if key != self._entity_key:
+            self._entity_key = key
+            dirty.update(self._capitals, self._units, self._buildings, self._trains)
+            self._index_entities()
+            dirty.update(self._capitals, self._units, self._buildings, self._trains)
+
+        width, height = self._map.width, self._map.height
+        for x, y in dirty:
+            if 0 <= x < width and 0 <= y < height:
+                self.cells[y][x] = self._compose(x, y)
+        self.rebuilt_cells = len(dirty)
+
+    def _rebuild(self, game_state: GameState, player_id: int):
+        if self._map is not None and self._territory_watcher is not None:
+            self._map.unwatch_territory(self._territory_watcher)
+        self._state = game_state
+        self._map = game_state.game_map
+        self._player_id = player_id
+        self._territory_watcher = self._map.watch_territory()
+        self._railway = frozenset(game_state.railway_cells.get(player_id, frozenset()))
+        self._entity_key = self._make_entity_key()
+        self._index_entities()
+        self.cells = [[self._compose(x, y) for x in range(self._map.width)] for y in range(self._map.height)]
+        self.rebuilt_cells = self._map.width * self._map.height
+
+    def _own_trains(self) -> list:
+        return [t for t in self._state.active_trains if t['owner_id'] == self._player_id]
+
+    def _make_entity_key(self) -> tuple:
+        """影响实体显示的版本：单位、建筑索引的版本，选中的单位，火车和首都位置"""
+        state = self._state
+        return (
+            state.units.version(),
+            state.buildings.version(),
+            tuple(u.id for u in state.get_selected_units(self._player_id)),
+            tuple((tuple(t['from']), tuple(t['to'])) for t in self._own_trains()),
+            tuple((p.id, p.capital_x, p.capital_y) for p in state.players.values())
+        )
+
+    def _index_entities(self):
+        state = self._state
+        self._capitals = {}
+        for player in state.players.values():
+            self._capitals.setdefault((player.capital_x, player.capital_y), player.id)
+        self._units = {}
+        for u in state.units:
+            if u.is_alive():
+                self._units.setdefault((u.x, u.y), []).append(u)
+        self._buildings = {(b.x, b.y): b for b in state.buildings}
+        # 火车显示在起点和终点
+        self._trains = set()
+        for train in self._own_trains():
+            self._trains.add((train['from'][0], train['from'][1]))
+            self._trains.add((train['to'][0], train['to'][1]))
+
+    def _compose(self, x: int, y: int) -> Cell:
+        """单元格显示的 (字符, 样式)，优先级：首都 > 单位 > 建筑 > 火车 > 铁路 > 领土 > 地形"""
+        cell = (x, y)
+        owner = self._map.get_territory_owner(x, y)
+        player_id = self._player_id
+
+        capital_owner = self._capitals.get(cell)
+        if capital_owner is not None:
+            return SYMBOL_CAPITAL, PLAYER_COLORS[capital_owner] if owner is not None else ""
+
+        units = self._units.get(cell)
+        if units:
+            color = PLAYER_COLORS[units[0].owner_id]
+            # 自己选中的单位用粗体特殊符号显示
+            if any(u.selected and u.owner_id == player_id for u in units):
+                return SYMBOL_SELECTED, color + "\033[1m"
+            return SYMBOL_ARMY, color
+
+        building = self._buildings.get(cell)
+        if building is not None:
+            return building.symbol, PLAYER_COLORS[building.owner_id]
+
+        if cell in self._trains:
+            return TRAIN_SYMBOL, PLAYER_COLORS[player_id]
+
+        # 铁路（仅在自己的领土内显示）
+        railway = self._railway
+        if cell in railway and owner == player_id:
+            color = PLAYER_COLORS[player_id]
+            has_h = (x - 1, y) in railway or (x + 1, y) in railway
+            has_v = (x, y - 1) in railway or (x, y + 1) in railway
+            if has_h and has_v:
+                return RAILWAY_SYMBOL_CROSS, color
+            elif has_v:
+                return RAILWAY_SYMBOL_V, color
+            return RAILWAY_SYMBOL_H, color
+
+        # 领土内显示玩家符号（小写），无主之地显示地形
+        if owner is not None:
+            return PLAYER_SYMBOLS[owner].lower(), PLAYER_COLORS[owner]
+        terrain = self._map.get_terrain(x, y)
+        if terrain == TERRAIN_RIVER:
+            return RIVER_CELL
+        return terrain, ''
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""网络协议 - 长度前缀消息帧（服务器和客户端共用）
+
+每条消息 = 4字节大端长度 + UTF-8 JSON
+长度最高位为1表示负载经过zlib压缩：同一连接的压缩帧属于同一个流（共享字典），须按顺序解压
+"""
+
+import json
+import socket
+import struct
+import time
+import zlib
+from collections import deque
+from typing import List, Optional
+
+FRAME_HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 64 * 1024 * 1024  # 单帧上限，防止异常长度耗尽内存
+RECV_CHUNK_SIZE = 64 * 1024
+COMPRESSED_FLAG = 0x80000000
+COMPRESSION_NAME = 'zlib'  # 握手中协商的压缩方式
+
+
+class ProtocolError(Exception):
+    """协议错误（帧长度非法等），连接应当断开"""
+    pass
+
+
+def encode_message(msg: dict) -> bytes:
+    """将消息编码为一帧"""
+    payload = json.dumps(msg, separators=(',', ':')).encode()
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def send_message(sock: socket.socket, msg: dict):
+    """发送一条消息（sendall保证整帧写出）"""
+    sock.sendall(encode_message(msg))
+
+
+class FrameCompressor:
+    """
+    单个连接的发送端压缩 - 流式压缩器跨帧共享字典，每帧以SYNC_FLUSH结束以便对方立即解出
+    负载小于阈值的帧原样发送；记录压缩比和耗时
+    """
+
+    def __init__(self, threshold: int, level: int = 6):
+        self.threshold = threshold
+        self._compressor = zlib.compressobj(level)
+        self.frames = 0
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+        self.seconds = 0.0
+
+    def compress_frame(self, frame: bytes) -> bytes:
+        """输入encode_message得到的一帧，返回实际写出的帧"""
+        payload = memoryview(frame)[FRAME_HEADER.size:]
+        if len(payload) < self.threshold:
+            return frame
+        start = time.perf_counter()
+        body = self._compressor.compress(payload) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.seconds += time.perf_counter() - start
+        self.frames += 1
+        self.raw_bytes += len(payload)
+        self.wire_bytes += len(body)
+        return FRAME_HEADER.pack(len(body) | COMPRESSED_FLAG) + body
+
+    def stats(self) -> dict:
+        """已压缩帧的统计：压缩比(原始/压缩后)和平均每帧耗时"""
+        return {
+            'compressed_frames': self.frames,
+            'compressed_raw_bytes': self.raw_bytes,
+            'compressed_wire_bytes': self.wire_bytes,
+            'compression_ratio': self.raw_bytes / self.wire_bytes if self.wire_bytes else 0.0,
+            'compress_ms_per_frame': self.seconds * 1000 / self.frames if self.frames else 0.0
+        }
+
+
+class FrameReader:
+    """
+    增量接收缓冲 - 累积收到的字节，按长度前缀切出完整帧
+    每帧只在收齐后解析一次，大帧不会被反复扫描
+    """
+
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE):
+        self.max_frame_size = max_frame_size
+        self._buffer = bytearray()
+        self._pending = deque()  # 已解析但尚未取走的消息
+        self._decompressor = None  # 收到第一个压缩帧时创建
+
+    def feed(self, data: bytes) -> List[dict]:
+        """写入收到的字节，返回其中所有完整的消息"""
+        self._buffer += data
+        messages = []
+        offset = 0
+        with memoryview(self._buffer) as view:
+            while len(view) - offset >= FRAME_HEADER.size:
+                (length,) = FRAME_HEADER.unpack_from(view, offset)
+                compressed = length & COMPRESSED_FLAG
+                length &= ~COMPRESSED_FLAG
+                if length > self.max_frame_size:
+                    raise ProtocolError(f"消息帧过大: {length} 字节")
+                end = offset + FRAME_HEADER.size + length
+                if end > len(view):
+                    break
+                payload = bytes(view[offset + FRAME_HEADER.size:end])
+                if compressed:
+                    payload = self._decompress(payload)
+                messages.append(json.loads(payload))
+                offset = end
+        if offset:
+            del self._buffer[:offset]
+        return messages
+
+    def _decompress(self, payload: bytes) -> bytes:
+        if self._decompressor is None:
+            self._decompressor = zlib.decompressobj()
+        try:
+            data = self._decompressor.decompress(payload, self.max_frame_size)
+        except zlib.error as e:
+            raise ProtocolError(f"解压失败: {e}")
+        if self._decompressor.unconsumed_tail:
+            raise ProtocolError("解压后的消息帧过大")
+        return data
+
+    def recv(self, sock: socket.socket) -> Optional[List[dict]]:
+        """从套接字读取一次，返回收齐的消息列表；连接关闭时返回None"""
+        if self._pending:
+            messages = list(self._pending)
+            self._pending.clear()
+            return messages
+        data = sock.recv(RECV_CHUNK_SIZE)
+        if not data:
+            return None
+        return self.feed(data)
+
+    def read_message(self, sock: socket.socket) -> Optional[dict]:
+        """阻塞读取一条消息（用于握手），多收到的消息留给后续recv；连接关闭时返回None"""
+        while not self._pending:
+            messages = self.recv(sock)
+            if messages is None:
+                return None
+            self._pending.extend(messages)
+        return self._pending.popleft()
@@ -4,15 +4,19 @@
 import os
 from typing import Optional, List
 from game_state import GameState, Player
+from screen import ScreenBuffer, Line, Cell
+from map_layer import MapLayer
 from config import (
     TERRAIN_PLAIN, TERRAIN_RIVER, TERRAIN_BRIDGE, PLAYER_SYMBOLS, PLAYER_COLORS, COLOR_RESET,
-    SYMBOL_CAPITAL, SYMBOL_ARMY, SYMBOL_SELECTED, BUILDINGS, UNITS, DEMOLISH_REFUND_RATE,
+    BUILDINGS, UNITS, DEMOLISH_REFUND_RATE,
     UNIT_CATEGORIES, get_production_building, GAME_NAME, FOCUS_CATEGORIES, FOCUS_TREE,
     NUKE_MISSILE_COST, NUKE_RADIUS, INTERCEPTOR_RANGE, INTERCEPTOR_COOLDOWN,
-    RAILWAY_SYMBOL_H, RAILWAY_SYMBOL_V, RAILWAY_SYMBOL_CROSS, TRAIN_SYMBOL,
     TERRITORY_POP_GROWTH_BONUS, TERRITORY_POP_CAP_BONUS, TERRITORY_BONUS_THRESHOLD
 )
 
+BLANK_CELL = (' ', '')
+MAP_ROW_PREFIX = [BLANK_CELL, BLANK_CELL]
+
 
 class Renderer:
     """CMD渲染器"""
@@ -24,10 +28,14 @@ class Renderer:
         self.camera_y = 0
         self.selected_x = 0
         self.selected_y = 0
+        self.screen = ScreenBuffer()  # 游戏画面的保留缓冲，只输出与上一帧不同的部分
+        self.map_layer = MapLayer()  # 整图格子缓存，视野从中切片
+        self.keyboard = None  # 由Game设置的KeyboardInput，逐键模式下等待回车需经它恢复行输入
 
     def clear_screen(self):
         """清屏"""
         os.system('cls' if os.name == 'nt' else 'clear')
+        self.screen.invalidate()
 
     def move_camera(self, dx: int, dy: int, game_state: GameState):
         """移动摄像机"""
@@ -63,26 +71,30 @@ class Renderer:
             self.camera_y = min(game_state.game_map.height - self.view_height,
                                self.selected_y - self.view_height + 3)
 
-    def render_game(self, game_state: GameState, current_player_id: int, message: str = ""):
-        """渲染游戏画面"""
-        self.clear_screen()
+    def render_game(self, game_state: GameState, current_player_id: int, message: str = "", overlay: str = ""):
+        """渲染游戏画面（与上一帧比较，只重绘变化的行和格子）"""
+        self.screen.draw(self.build_frame(game_state, current_player_id, message, overlay))
 
+    def build_frame(self, game_state: GameState, current_player_id: int, message: str = "",
+                    overlay: str = "") -> List[Line]:
+        """生成一帧画面的各行（overlay为调试信息，显示在最后一行）"""
+        lines: List[Line] = []
         player = game_state.get_player(current_player_id)
 
         # 计算收入
-        from buildings import Factory
-        factories = [b for b in game_state.buildings if isinstance(b, Factory)]
+        factories = game_state.buildings.of_type('factory')
         income = player.calculate_income(factories)
 
         # 顶部状态栏
-        print("=" * 80)
-        print(f"  回合: {game_state.current_turn}  |  玩家: {player.name} [{PLAYER_SYMBOLS[current_player_id]}]  "
-              f"|  人口: {player.population}k/{player.pop_cap}k  |  经济: {player.economy} (+{income}/回合)")
+        lines.append("=" * 80)
+        lines.append(f"  回合: {game_state.current_turn}  |  玩家: {player.name} [{PLAYER_SYMBOLS[current_player_id]}]  "
+                     f"|  人口: {player.population}k/{player.pop_cap}k  |  经济: {player.economy} (+{income}/回合)")
 
         # 显示选中单位数量
+        status = ""
         selected_units = game_state.get_selected_units(current_player_id)
         if selected_units:
-            print(f"  [已选中 {len(selected_units)} 个单位]", end="")
+            status += f"  [已选中 {len(selected_units)} 个单位]"
 
         # 显示生产队列
         production_queue = game_state.get_player_production_queue(current_player_id)
@@ -90,153 +102,59 @@ class Renderer:
             queue_info = ", ".join([f"{pq.name}({pq.remaining_turns}回合)" for pq in production_queue[:3]])
             if len(production_queue) > 3:
                 queue_info += f" +{len(production_queue)-3}..."
-            print(f"  [生产中: {queue_info}]", end="")
+            status += f"  [生产中: {queue_info}]"
 
-        print()
-        print("=" * 80)
+        lines.append(status)
+        lines.append("=" * 80)
 
         # 渲染地图
-        self._render_map(game_state, current_player_id)
+        lines.extend(self._render_map(game_state, current_player_id))
 
-        print("=" * 80)
+        lines.append("=" * 80)
 
         # 显示选中位置信息
-        self._render_selection_info(game_state, current_player_id)
+        lines.extend(self._render_selection_info(game_state, current_player_id))
 
         # 操作提示
-        print("-" * 80)
-        print("  WASD: 移动  L: 选择单位  CTRL+L: 多选  G: 派遣  F: 进攻方向  R: 防守中心")
-        print("  B: 建造  U: 升级  X: 拆除  P: 生产  M: 移动  T: 攻击  N: 缩编  ESC: 取消选择")
-        print("  J: 国策  K: 核武器  C: 居中首都  E: 结束回合  H: 帮助  Q: 退出")
-        print("-" * 80)
+        lines.append("-" * 80)
+        lines.append("  WASD: 移动  L: 选择单位  CTRL+L: 多选  G: 派遣  F: 进攻方向  R: 防守中心")
+        lines.append("  B: 建造  U: 升级  X: 拆除  P: 生产  M: 移动  T: 攻击  N: 缩编  ESC: 取消选择")
+        lines.append("  J: 国策  K: 核武器  C: 居中首都  E: 结束回合  H: 帮助  Q: 退出")
+        lines.append("-" * 80)
 
         # 显示消息
         if message:
-            print(f"  >>> {message}")
-
-    def _render_map(self, game_state: GameState, current_player_id: int):
-        """渲染地图区域"""
+            lines.append(f"  >>> {message}")
+        if overlay:
+            lines.append(overlay)
+        return lines
+
+    def _render_map(self, game_state: GameState, current_player_id: int) -> List[List[Cell]]:
+        """渲染地图区域：从图层缓存中切出视野，每行为 (字符, 样式) 格子列表"""
+        self.map_layer.update(game_state, current_player_id)
+        cells = self.map_layer.cells
         game_map = game_state.game_map
 
-        # 构建建筑位置映射
-        building_map = {}
-        for b in game_state.buildings:
-            building_map[(b.x, b.y)] = b
-
-        # 构建单位位置映射
-        unit_map = {}
-        for u in game_state.units:
-            if u.is_alive():
-                key = (u.x, u.y)
-                if key not in unit_map:
-                    unit_map[key] = []
-                unit_map[key].append(u)
-
-        # 构建铁路位置映射（当前玩家的铁路）
-        railway_cells = game_state.railway_cells.get(current_player_id, set())
-
-        # 构建火车位置映射
-        train_map = {}
-        for train in game_state.active_trains:
-            if train['owner_id'] == current_player_id:
-                # 将火车显示在起点和终点之间
-                train_map[(train['from'][0], train['from'][1])] = train
-                train_map[(train['to'][0], train['to'][1])] = train
-
-        # 逐行渲染
+        x0 = self.camera_x
+        x1 = min(x0 + self.view_width, game_map.width)
+        padding = [BLANK_CELL] * (self.view_width - max(0, x1 - x0))
+        empty_row = MAP_ROW_PREFIX + [BLANK_CELL] * self.view_width
+
+        rows = []
         for vy in range(self.view_height):
             map_y = self.camera_y + vy
-            line = "  "
-
-            for vx in range(self.view_width):
-                map_x = self.camera_x + vx
-
-                if map_x >= game_map.width or map_y >= game_map.height:
-                    line += " "
-                    continue
-
-                # 检查是否是选中位置
-                is_selected = (map_x == self.selected_x and map_y == self.selected_y)
-
-                # 获取该位置的内容
-                char = self._get_cell_display(game_state, map_x, map_y,
-                                             building_map, unit_map, current_player_id,
-                                             railway_cells, train_map)
-
-                # 选中高亮
-                if is_selected:
-                    line += f"\033[7m{char}\033[0m"  # 反色显示
-                else:
-                    line += char
-
-            print(line)
-
-    def _get_cell_display(self, game_state: GameState, x: int, y: int,
-                          building_map: dict, unit_map: dict, current_player_id: int,
-                          railway_cells: set = None, train_map: dict = None) -> str:
-        """获取单元格显示字符"""
-        game_map = game_state.game_map
-        terrain = game_map.get_terrain(x, y)
-        owner = game_map.get_territory_owner(x, y)
-
-        if railway_cells is None:
-            railway_cells = set()
-        if train_map is None:
-            train_map = {}
-
-        # 检查是否是首都
-        for player in game_state.players.values():
-            if player.capital_x == x and player.capital_y == y:
-                color = PLAYER_COLORS[player.id] if owner is not None else ""
-                return f"{color}{SYMBOL_CAPITAL}{COLOR_RESET}"
-
-        # 检查单位
-        if (x, y) in unit_map:
-            units = unit_map[(x, y)]
-            unit = units[0]
-            color = PLAYER_COLORS[unit.owner_id]
-            # 检查是否有选中的单位
-            has_selected = any(u.selected for u in units)
-            if has_selected:
-                # 选中的单位用特殊符号显示
-                return f"{color}\033[1m{SYMBOL_SELECTED}{COLOR_RESET}"  # 粗体+特殊符号
-            return f"{color}{SYMBOL_ARMY}{COLOR_RESET}"
-
-        # 检查建筑
-        if (x, y) in building_map:
-            building = building_map[(x, y)]
-            color = PLAYER_COLORS[building.owner_id]
-            return f"{color}{building.symbol}{COLOR_RESET}"
-
-        # 检查火车
-        if (x, y) in train_map:
-            color = PLAYER_COLORS[current_player_id]
-            return f"{color}{TRAIN_SYMBOL}{COLOR_RESET}"
-
-        # 检查铁路（仅在自己的领土内显示）
-        if (x, y) in railway_cells and owner == current_player_id:
-            color = PLAYER_COLORS[current_player_id]
-            # 判断铁路方向
-            has_h = ((x-1, y) in railway_cells or (x+1, y) in railway_cells)
-            has_v = ((x, y-1) in railway_cells or (x, y+1) in railway_cells)
-            if has_h and has_v:
-                return f"{color}{RAILWAY_SYMBOL_CROSS}{COLOR_RESET}"
-            elif has_v:
-                return f"{color}{RAILWAY_SYMBOL_V}{COLOR_RESET}"
-            else:
-                return f"{color}{RAILWAY_SYMBOL_H}{COLOR_RESET}"
-
-        # 显示领土或地形
-        if owner is not None:
-            color = PLAYER_COLORS[owner]
-            # 领土内显示玩家符号（小写）
-            symbol = PLAYER_SYMBOLS[owner].lower()
-            return f"{color}{symbol}{COLOR_RESET}"
-        else:
-            # 无主之地显示地形
-            if terrain == TERRAIN_RIVER:
-                return '\033[96m~\033[0m'  # 青色河流
-            return terrain
+            if map_y >= game_map.height:
+                rows.append(empty_row)
+                continue
+            row = MAP_ROW_PREFIX + cells[map_y][x0:x1] + padding
+
+            # 选中高亮（反色显示）
+            if map_y == self.selected_y and x0 <= self.selected_x < x1:
+                i = len(MAP_ROW_PREFIX) + self.selected_x - x0
+                char, style = row[i]
+                row[i] = (char, "\033[7m" + style)
+            rows.append(row)
+        return rows
 
     def _direction_to_name(self, direction: tuple) -> str:
         """将方向元组转换为名称"""
@@ -261,8 +179,9 @@ class Renderer:
             return "西南"
         return "无"
 
-    def _render_selection_info(self, game_state: GameState, current_player_id: int):
+    def _render_selection_info(self, game_state: GameState, current_player_id: int) -> List[str]:
         """渲染选中位置信息"""
+        lines = []
         x, y = self.selected_x, self.selected_y
         terrain = game_state.game_map.get_terrain(x, y)
         owner = game_state.game_map.get_territory_owner(x, y)
@@ -324,7 +243,7 @@ class Renderer:
                 if hasattr(building, 'built_this_turn') and building.built_this_turn:
                     info += " [本回合建造]"
 
-        print(info)
+        lines.append(info)
 
         # 显示单位信息
         units = game_state.get_units_at(x, y)
@@ -335,8 +254,8 @@ class Renderer:
 
                 # 基础信息行
                 trait_mark = f"[{unit.trait_name}]" if unit.trait_name else ""
-                print(f"  {unit.name} {unit.count}k | {owner_name} | 攻:{unit.attack} 防:{unit.defense} "
-                      f"移动:{unit.remaining_moves}/{unit.speed} {trait_mark} {selected_mark}")
+                lines.append(f"  {unit.name} {unit.count}k | {owner_name} | 攻:{unit.attack} 防:{unit.defense} "
+                             f"移动:{unit.remaining_moves}/{unit.speed} {trait_mark} {selected_mark}")
 
                 # 额外信息行（如果有的话）
                 extra_info = []
@@ -354,7 +273,8 @@ class Renderer:
                     extra_info.append(f"进攻:{dir_name}")
 
                 if extra_info:
-                    print(f"    {' | '.join(extra_info)}")
+                    lines.append(f"    {' | '.join(extra_info)}")
+        return lines
 
     def render_main_menu(self):
         """渲染主菜单"""
@@ -497,7 +417,10 @@ class Renderer:
 
     def _wait_key(self, prompt: str = "  -- 按回车继续 --"):
         """等待用户按键"""
-        input(prompt)
+        if self.keyboard:
+            self.keyboard.read_line(prompt)
+        else:
+            input(prompt)
 
     def render_help(self):
         """渲染帮助界面（分页显示）"""
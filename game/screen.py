@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""保留式屏幕缓冲 - 记住上一帧的内容，每帧只输出变化的部分"""
+
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple, Union
+from config import COLOR_RESET
+
+Cell = Tuple[str, str]  # (字符, 样式前缀)，样式为空表示默认颜色；字符须为单列宽
+Line = Union[str, List[Cell]]  # 文本行（可含中文，整行重绘）或逐格的地图行
+
+CLEAR_SCREEN = '\033[H\033[2J'
+CLEAR_TO_EOL = '\033[K'
+CLEAR_BELOW = '\033[J'
+MAX_SPAN_GAP = 6  # 两处变化之间不超过这么多未变格子时一起重写，比移动光标的转义序列短
+
+
+def move_to(row: int, col: int) -> str:
+    """光标移动到第row行第col列（从0开始）"""
+    return f'\033[{row + 1};{col + 1}H'
+
+
+def cells_text(cells: List[Cell]) -> str:
+    """连续格子的输出：相同样式的格子合并为一段，每段只输出一次样式，结尾复位"""
+    parts = []
+    current = ''
+    for char, style in cells:
+        if style != current:
+            if current:
+                parts.append(COLOR_RESET)
+            if style:
+                parts.append(style)
+            current = style
+        parts.append(char)
+    if current:
+        parts.append(COLOR_RESET)
+    return ''.join(parts)
+
+
+def line_text(line: Line) -> str:
+    return line if isinstance(line, str) else cells_text(line)
+
+
+def changed_spans(old: List[Cell], new: List[Cell]) -> List[Tuple[int, int]]:
+    """两行格子中变化的区间 [start, end)，间隔很近的变化合并为一段"""
+    spans = []
+    for col, cell in enumerate(new):
+        if cell == old[col]:
+            continue
+        if spans and col - spans[-1][1] <= MAX_SPAN_GAP:
+            spans[-1][1] = col + 1
+        else:
+            spans.append([col, col + 1])
+    return [(start, end) for start, end in spans]
+
+
+class ScreenBuffer:
+    """
+    保留上一帧的各行：文本行变化时整行重写，地图行只重写变化的区间（按样式分段输出）
+    所有输出拼成一个字符串，一次write写出；帧下方的内容（输入提示等）每帧清除
+    """
+
+    def __init__(self, out=None):
+        self.out = out or sys.stdout
+        self._lines: Optional[List[Line]] = None
+        self.last_frame_bytes = 0
+        self.total_bytes = 0
+        self.frames = 0
+
+    def invalidate(self):
+        """屏幕被其他输出覆盖后调用，下一帧整屏重绘"""
+        self._lines = None
+
+    def draw(self, lines: List[Line]):
+        parts = []
+        previous = self._lines
+        if previous is None:
+            parts.append(CLEAR_SCREEN)
+            previous = []
+        for row, line in enumerate(lines):
+            old = previous[row] if row < len(previous) else None
+            if line == old:
+                continue
+            if isinstance(line, str) or not isinstance(old, list) or len(old) != len(line):
+                parts.append(move_to(row, 0))
+                parts.append(line_text(line))
+                parts.append(CLEAR_TO_EOL)
+                continue
+            for start, end in changed_spans(old, line):
+                parts.append(move_to(row, start))
+                parts.append(cells_text(line[start:end]))
+        # 清除上一帧多出的行以及帧下方的输出，光标停在帧下方
+        parts.append(move_to(len(lines), 0))
+        parts.append(CLEAR_BELOW)
+
+        data = ''.join(parts)
+        self.out.write(data)
+        self.out.flush()
+        self._lines = lines
+        self.last_frame_bytes = len(data.encode())
+        self.total_bytes += self.last_frame_bytes
+        self.frames += 1
+
+
+class FrameLimiter:
+    """
+    渲染节流：两帧之间至少间隔 1/fps_cap 秒，期间到达的按键和状态更新合并到下一帧（总是绘制最新状态）
+    统计帧耗时、丢弃的帧数（未绘制就被后续事件取代的帧）和每帧处理的事件数
+    add_events 可在任意线程调用
+    """
+
+    def __init__(self, fps_cap: float):
+        self.fps_cap = fps_cap
+        self.min_interval = 1.0 / fps_cap if fps_cap > 0 else 0.0
+        self._lock = threading.Lock()
+        self._events = 0  # 上一帧之后到达的事件数
+        self._last_start: Optional[float] = None
+        self.frames = 0
+        self.dropped = 0
+        self.last_frame_ms = 0.0
+        self.last_events = 0
+
+    def add_events(self, count: int = 1):
+        """记录到达的事件（每个事件不节流时都会触发一帧）"""
+        if count:
+            with self._lock:
+                self._events += count
+
+    def time_until_next_frame(self) -> float:
+        """距离允许渲染下一帧还有多少秒（0表示现在即可渲染）"""
+        if self._last_start is None:
+            return 0.0
+        return max(0.0, self._last_start + self.min_interval - time.monotonic())
+
+    @contextmanager
+    def frame(self):
+        """包裹一次渲染：结算本帧合并的事件，并测量渲染耗时"""
+        start = time.monotonic()
+        with self._lock:
+            events, self._events = self._events, 0
+        self.last_events = events
+        self.dropped += max(0, events - 1)
+        self._last_start = start
+        try:
+            yield
+        finally:
+            self.last_frame_ms = (time.monotonic() - start) * 1000
+            self.frames += 1
+
+    def overlay_text(self) -> str:
+        cap = f"{self.fps_cap}fps" if self.min_interval else "不限"
+        return (f"  [调试] 帧耗时 {self.last_frame_ms:.2f}ms | 丢弃帧 {self.dropped} | "
+                f"本帧事件 {self.last_events} | 已渲染 {self.frames} 帧 | 上限 {cap}")
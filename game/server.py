@@ -1,15 +1,26 @@
 # -*- coding: utf-8 -*-
 """游戏服务器"""
 
+import asyncio
 import socket
 import threading
-import json
 import time
 import subprocess
 import os
+from collections import deque
 from typing import Dict, List, Optional, Callable
 from game_state import GameState
-from config import DEFAULT_PORT, MAX_PLAYERS
+from config import (
+    DEFAULT_PORT, MAX_PLAYERS, SYNC_CHECKSUM_INTERVAL, FULL_SYNC_INTERVAL, SYNC_COALESCE_WINDOW,
+    FOG_OF_WAR_SYNC, SERVER_ASYNC_MODE, CLIENT_SEND_QUEUE_LIMIT,
+    NETWORK_COMPRESSION, COMPRESSION_THRESHOLD, COMPRESSION_LEVEL
+)
+from protocol import (
+    FrameReader, FrameCompressor, ProtocolError, encode_message, send_message,
+    RECV_CHUNK_SIZE, COMPRESSION_NAME
+)
+from sync import StateTracker, collect_changes, snapshot_data
+from simulation import SimulationThread, LatencyHistogram
 
 
 def get_local_ip() -> str:
@@ -85,16 +96,152 @@ def open_firewall_port(port: int) -> bool:
         return False
 
 
+class OutboundQueue:
+    """
+    单个客户端的有界发送队列（不含同步，由子类加锁）
+    入队完整状态(sync)时，队列中尚未发出的旧sync和delta都已过时，直接丢弃
+    队列超过上限时丢弃其中的状态帧并标记需要补发完整状态；只剩其他消息仍超限则应断开
+    """
+
+    STATE_KINDS = ('sync', 'delta')
+
+    def __init__(self, limit: int = CLIENT_SEND_QUEUE_LIMIT, compressor: Optional[FrameCompressor] = None):
+        self.limit = limit
+        self.compressor = compressor  # 协商启用压缩时，由写线程/写协程在写出前压缩
+        self.closed = False
+        self.needs_resync = False
+        self.on_resync_needed: Optional[Callable[[], None]] = None  # 被标记需要补发完整状态时调用（不可阻塞）
+        self._frames = deque()  # (消息类型, 帧数据)
+        self.peak_depth = 0
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.frames_coalesced = 0
+        self.frames_dropped = 0
+        self.resyncs = 0
+
+    def _drop_state_frames(self) -> int:
+        kept = deque(frame for frame in self._frames if frame[0] not in self.STATE_KINDS)
+        dropped = len(self._frames) - len(kept)
+        self._frames = kept
+        return dropped
+
+    def _enqueue(self, data: bytes, kind: str) -> bool:
+        """入队一帧，返回False表示客户端严重滞后应断开"""
+        if kind == 'sync':
+            self.frames_coalesced += self._drop_state_frames()
+            self.needs_resync = False
+        self._frames.append((kind, data))
+        if len(self._frames) > self.limit:
+            dropped = self._drop_state_frames()
+            if dropped:
+                self.frames_dropped += dropped
+                if not self.needs_resync:
+                    self.needs_resync = True
+                    if self.on_resync_needed:
+                        self.on_resync_needed()
+            if len(self._frames) > self.limit:
+                return False
+        self.peak_depth = max(self.peak_depth, len(self._frames))
+        return True
+
+    def _wire_frame(self, data: bytes) -> bytes:
+        return self.compressor.compress_frame(data) if self.compressor else data
+
+    def _sent(self, data: bytes):
+        self.bytes_sent += len(data)
+        self.frames_sent += 1
+
+    def stats(self) -> dict:
+        stats = self.compressor.stats() if self.compressor else {}
+        return {
+            **stats,
+            'queue_depth': len(self._frames),
+            'peak_depth': self.peak_depth,
+            'bytes_sent': self.bytes_sent,
+            'frames_sent': self.frames_sent,
+            'frames_coalesced': self.frames_coalesced,
+            'frames_dropped': self.frames_dropped,
+            'resyncs': self.resyncs
+        }
+
+
+class ClientChannel(OutboundQueue):
+    """线程模式的客户端连接：发送队列由独立的写线程写出，慢客户端不会阻塞其他人"""
+
+    def __init__(self, sock: socket.socket, limit: int = CLIENT_SEND_QUEUE_LIMIT,
+                 compressor: Optional[FrameCompressor] = None):
+        super().__init__(limit, compressor)
+        self.sock = sock
+        self._cond = threading.Condition()
+        self._writer = threading.Thread(target=self._run_writer, daemon=True)
+        self._writer.start()
+
+    def send(self, data: bytes, kind: str = None) -> bool:
+        """排入一帧，返回是否成功（连接已关闭或严重滞后时为False，并关闭连接）"""
+        with self._cond:
+            if self.closed:
+                return False
+            ok = self._enqueue(data, kind)
+            self._cond.notify()
+        if not ok:
+            print("客户端读取过慢，断开连接")
+            self.close()
+        return ok
+
+    def _run_writer(self):
+        while True:
+            with self._cond:
+                while not self._frames and not self.closed:
+                    self._cond.wait()
+                if self.closed:
+                    return
+                _, data = self._frames.popleft()
+            data = self._wire_frame(data)
+            if not self._write(data):
+                self.close()
+                return
+            self._sent(data)
+
+    def _write(self, data: bytes) -> bool:
+        """写出整帧；套接字带有读线程设置的超时，超时只表示对方暂未读取，继续等待"""
+        view = memoryview(data)
+        while view:
+            try:
+                sent = self.sock.send(view)
+            except socket.timeout:
+                if self.closed:
+                    return False
+                continue
+            except OSError:
+                return False
+            view = view[sent:]
+        return True
+
+    def close(self):
+        with self._cond:
+            if self.closed:
+                return
+            self.closed = True
+            self._frames.clear()
+            self._cond.notify()
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
 class GameServer:
     """游戏服务器类"""
 
     def __init__(self, port: int = DEFAULT_PORT):
         self.port = port
         self.server_socket: Optional[socket.socket] = None
-        self.clients: Dict[int, socket.socket] = {}  # player_id -> socket
+        self.clients: Dict[int, ClientChannel] = {}  # player_id -> 连接（带发送队列）
         self.client_threads: Dict[int, threading.Thread] = {}
         self.player_names: List[str] = []
         self.game_state: Optional[GameState] = None
+        # 增量同步跟踪：战争迷雾下每个客户端一个（键为player_id），否则共用一个（键为None）
+        self.trackers: Dict[Optional[int], StateTracker] = {}
         self.running = False
         self.game_started = False
         self.internet_mode = False  # 互联网模式
@@ -107,13 +254,15 @@ class GameServer:
         self.on_all_ready: Optional[Callable[[], None]] = None
 
         self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()  # 保证增量按版本顺序生成和发送
+        self.simulation = SimulationThread()  # 单写者：操作、回合结算和同步都在此线程执行
+        self.action_latency = LatencyHistogram()  # 操作从收到到执行完的延迟
+        self._sync_scheduled = False  # 合并窗口内已安排同步
+        self._full_state_cache: Dict[Optional[int], tuple] = {}  # 跟踪器键 -> (版本号, 编码后的完整状态帧)
 
     def start(self, host_name: str) -> str:
         """启动服务器，返回服务器IP"""
-        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind(('0.0.0.0', self.port))
-        self.server_socket.listen(MAX_PLAYERS)
+        self._listen()
         self.running = True
 
         # 房主作为第一个玩家
@@ -127,12 +276,21 @@ class GameServer:
         if not firewall_ok:
             print("  [提示] 无法自动开放防火墙，请手动允许端口或关闭防火墙")
 
-        # 启动接受连接的线程
+        self._start_accepting()
+        return local_ip
+
+    def _listen(self):
+        """绑定端口开始监听"""
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind(('0.0.0.0', self.port))
+        self.server_socket.listen(MAX_PLAYERS)
+
+    def _start_accepting(self):
+        """启动接受连接的线程"""
         accept_thread = threading.Thread(target=self._accept_connections, daemon=True)
         accept_thread.start()
 
-        return local_ip
-
     def enable_internet_mode(self) -> tuple:
         """开启互联网连接模式，返回 (成功, 公网IP或错误信息)"""
         print("  正在获取公网IP...")
@@ -157,32 +315,37 @@ class GameServer:
                 client_socket, address = self.server_socket.accept()
 
                 if len(self.player_names) >= MAX_PLAYERS:
-                    client_socket.send(json.dumps({'type': 'error', 'message': '房间已满'}).encode())
+                    send_message(client_socket, {'type': 'error', 'message': '房间已满'})
                     client_socket.close()
                     continue
 
                 if self.game_started:
-                    client_socket.send(json.dumps({'type': 'error', 'message': '游戏已开始'}).encode())
+                    send_message(client_socket, {'type': 'error', 'message': '游戏已开始'})
                     client_socket.close()
                     continue
 
                 # 接收玩家名称
-                data = client_socket.recv(4096).decode()
-                msg = json.loads(data)
+                reader = FrameReader()
+                msg = reader.read_message(client_socket)
+                if msg is None:
+                    client_socket.close()
+                    continue
                 player_name = msg.get('name', f'玩家{len(self.player_names) + 1}')
 
+                compressor = self._negotiate_compression(msg)
+                channel = ClientChannel(client_socket, compressor=compressor)
+                channel.on_resync_needed = self._schedule_resync
                 with self._lock:
                     player_id = len(self.player_names)
                     self.player_names.append(player_name)
-                    self.clients[player_id] = client_socket
-
-                # 发送确认和当前玩家列表
-                response = {
-                    'type': 'joined',
-                    'player_id': player_id,
-                    'players': self.player_names
-                }
-                client_socket.send(json.dumps(response).encode())
+                    # 发送确认和当前玩家列表
+                    channel.send(encode_message({
+                        'type': 'joined',
+                        'player_id': player_id,
+                        'players': self.player_names,
+                        'compression': COMPRESSION_NAME if compressor else None
+                    }))
+                    self.clients[player_id] = channel
 
                 # 通知其他玩家
                 self._broadcast({
@@ -193,7 +356,7 @@ class GameServer:
                 # 启动该客户端的处理线程
                 client_thread = threading.Thread(
                     target=self._handle_client,
-                    args=(player_id, client_socket),
+                    args=(player_id, client_socket, reader),
                     daemon=True
                 )
                 self.client_threads[player_id] = client_thread
@@ -209,17 +372,23 @@ class GameServer:
                     print(f"接受连接错误: {e}")
                 break
 
-    def _handle_client(self, player_id: int, client_socket: socket.socket):
+    def _negotiate_compression(self, hello: dict) -> Optional[FrameCompressor]:
+        """服务器开启压缩且客户端声明支持时，为该连接创建压缩器"""
+        if NETWORK_COMPRESSION and COMPRESSION_NAME in hello.get('compression', ()):
+            return FrameCompressor(COMPRESSION_THRESHOLD, COMPRESSION_LEVEL)
+        return None
+
+    def _handle_client(self, player_id: int, client_socket: socket.socket, reader: FrameReader):
         """处理单个客户端"""
         while self.running:
             try:
                 client_socket.settimeout(1.0)
-                data = client_socket.recv(4096).decode()
-                if not data:
+                messages = reader.recv(client_socket)
+                if messages is None:
                     break
 
-                msg = json.loads(data)
-                self._process_message(player_id, msg)
+                for msg in messages:
+                    self._process_message(player_id, msg)
 
             except socket.timeout:
                 continue
@@ -229,8 +398,9 @@ class GameServer:
 
         # 玩家断开连接
         with self._lock:
-            if player_id in self.clients:
-                del self.clients[player_id]
+            channel = self.clients.pop(player_id, None)
+        if channel:
+            channel.close()
         if self.on_player_leave:
             self.on_player_leave(player_id)
 
@@ -238,16 +408,23 @@ class GameServer:
         """处理客户端消息"""
         msg_type = msg.get('type')
 
+        # 修改游戏状态的消息排入模拟线程按顺序执行，网络线程不直接改状态
         if msg_type == 'action':
-            if self.on_action:
-                self.on_action(player_id, msg)
+            if not isinstance(msg.get('action'), str):
+                self.send_action_result(player_id, msg, False, "无效操作")
+            elif self.on_action:
+                self.simulation.submit(self._apply_action, player_id, msg, time.perf_counter())
+
+        elif msg_type == 'batch':
+            if isinstance(msg.get('actions'), list):
+                self.simulation.submit(self._apply_batch, player_id, msg, time.perf_counter())
 
         elif msg_type == 'end_turn':
-            if self.game_state:
-                player = self.game_state.get_player(player_id)
-                if player:
-                    player.ready_for_next_turn = True
-                    self._check_all_ready()
+            self.simulation.submit(self.mark_ready, player_id)
+
+        elif msg_type == 'resync':
+            # 客户端版本不连续或校验失败，补发完整状态
+            self.simulation.submit(self.send_full_state, player_id)
 
         elif msg_type == 'chat':
             self._broadcast({
@@ -256,10 +433,50 @@ class GameServer:
                 'message': msg.get('message', '')
             })
 
+    def _apply_action(self, player_id: int, msg: dict, received_at: float):
+        """模拟线程：执行一个操作，记录从收到到执行完的延迟；参数错误时回复失败"""
+        try:
+            self.on_action(player_id, msg)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            self.send_action_result(player_id, msg, False, "操作参数错误")
+        self.action_latency.record(time.perf_counter() - received_at)
+
+    def _apply_batch(self, player_id: int, msg: dict, received_at: float):
+        """模拟线程：执行一批操作，用一条action_results回复所有结果"""
+        results = self.process_batch(player_id, msg['actions'], received_at)
+        reply = {
+            'type': 'action_results',
+            'results': [{'success': success, 'message': message} for success, message in results]
+        }
+        if 'seq' in msg:
+            reply['seq'] = msg['seq']
+        self.send_to_player(player_id, reply)
+
+    def get_action_stats(self) -> dict:
+        """操作延迟直方图统计，以及模拟线程队列中等待的任务数"""
+        stats = self.action_latency.summary()
+        stats['pending'] = self.simulation.pending()
+        return stats
+
+    def mark_ready(self, player_id: int):
+        """玩家结束回合（在模拟线程中执行）"""
+        if not self.game_state:
+            return
+        if not self.simulation.in_simulation_thread():
+            self.simulation.call(self.mark_ready, player_id)
+            return
+        player = self.game_state.get_player(player_id)
+        if player:
+            player.ready_for_next_turn = True
+            self._check_all_ready()
+
     def _check_all_ready(self):
-        """检查是否所有玩家都准备好了"""
+        """检查是否所有玩家都准备好了（在模拟线程中执行）"""
         if not self.game_state:
             return
+        if not self.simulation.in_simulation_thread():
+            self.simulation.call(self._check_all_ready)
+            return
 
         all_ready = all(
             p.ready_for_next_turn or not p.is_alive
@@ -273,47 +490,165 @@ class GameServer:
                 self.on_all_ready()
 
     def _broadcast(self, msg: dict, exclude: int = None):
-        """广播消息给所有客户端"""
-        data = json.dumps(msg).encode()
+        """广播消息给所有客户端（编码一次，排入各连接的发送队列，不等待写出）"""
+        data = encode_message(msg)
         with self._lock:
-            for pid, sock in list(self.clients.items()):
+            for pid, channel in list(self.clients.items()):
                 if pid != exclude:
-                    try:
-                        sock.send(data)
-                    except:
-                        pass
+                    channel.send(data, msg.get('type'))
 
     def start_game(self, map_seed: int = None, map_width: int = None, map_height: int = None):
         """开始游戏"""
         self.game_started = True
         self.game_state = GameState()
         self.game_state.initialize_game(self.player_names, map_seed, map_width, map_height)
+        if FOG_OF_WAR_SYNC:
+            with self._lock:
+                player_ids = list(self.clients)
+            self.trackers = {pid: StateTracker(self.game_state, pid) for pid in player_ids}
+        else:
+            self.trackers = {None: StateTracker(self.game_state)}
+        self._full_state_cache = {}
 
         # 通知所有客户端
-        self._broadcast({
-            'type': 'game_start',
-            'state': self.game_state.to_dict()
-        })
+        for key, tracker in self.trackers.items():
+            self._send_encoded(encode_message({
+                'type': 'game_start',
+                'version': tracker.version,
+                'state': tracker.state_dict()
+            }), 'game_start', self._tracker_targets(key))
+
+    def _tracker_targets(self, key: Optional[int]) -> Optional[List[int]]:
+        """跟踪器对应的接收玩家（None表示所有客户端）"""
+        return None if key is None else [key]
+
+    def _tracker_key(self, player_id: int) -> Optional[int]:
+        return player_id if player_id in self.trackers else None
+
+    def request_sync(self):
+        """标记状态已变化：合并窗口内的多次操作只同步一次（窗口为0时立即同步）"""
+        if SYNC_COALESCE_WINDOW <= 0:
+            self.sync_game_state()
+            return
+        with self._lock:
+            if self._sync_scheduled:
+                return
+            self._sync_scheduled = True
+        self._call_later(SYNC_COALESCE_WINDOW, self._flush_sync)
+
+    def _call_later(self, delay: float, func: Callable):
+        # 由模拟线程计时并执行，不为每个合并窗口另起线程
+        self.simulation.submit_later(delay, func)
+
+    def _flush_sync(self):
+        with self._lock:
+            self._sync_scheduled = False
+        self.sync_game_state()
 
     def sync_game_state(self):
-        """同步游戏状态给所有客户端"""
-        if self.game_state:
-            self._broadcast({
+        """同步游戏状态给所有客户端：广播自上个版本以来的变更集，定期附带校验和或改发完整状态"""
+        if not self.game_state:
+            return
+        if not self.simulation.in_simulation_thread():
+            self.simulation.call(self.sync_game_state)
+            return
+        with self._sync_lock:
+            self._broadcast_changes()
+
+    def _broadcast_changes(self):
+        """生成并发送各跟踪器的变更集，状态的变化集每轮只取出并序列化一次（调用方持有_sync_lock）"""
+        shared = collect_changes(self.game_state)
+        snapshot = None  # 校验和用的快照，各跟踪器共用，需要时才生成
+        for key, tracker in self.trackers.items():
+            changes = tracker.make_delta(shared)
+            if changes is None:
+                continue
+            version = tracker.version
+            if version % FULL_SYNC_INTERVAL == 0:
+                self._send_encoded(self._encoded_full_state(key), 'sync', self._tracker_targets(key))
+                continue
+            msg = {
+                'type': 'delta',
+                'base': version - 1,
+                'version': version,
+                'changes': changes
+            }
+            if version % SYNC_CHECKSUM_INTERVAL == 0:
+                if snapshot is None:
+                    snapshot = snapshot_data(self.game_state)
+                msg['checksum'] = tracker.checksum(snapshot)
+            self._send_encoded(encode_message(msg), 'delta', self._tracker_targets(key))
+        self._resync_laggards()
+
+    def _take_lagging_players(self) -> List[int]:
+        """取出需要补发完整状态的玩家，并计入补发次数"""
+        lagging = []
+        with self._lock:
+            for pid, channel in list(self.clients.items()):
+                if channel.needs_resync:
+                    channel.resyncs += 1
+                    lagging.append(pid)
+        return lagging
+
+    def _schedule_resync(self):
+        """有连接丢弃了状态帧：排入一次同步（其中补发完整状态），不等下一次操作触发广播"""
+        self.simulation.submit(self.sync_game_state)
+
+    def _resync_laggards(self):
+        """给发送队列溢出、丢弃过状态帧的玩家补发完整状态（调用方持有_sync_lock）"""
+        for player_id in self._take_lagging_players():
+            self._send_encoded(self._encoded_full_state(self._tracker_key(player_id)), 'sync', [player_id])
+
+    def _encoded_full_state(self, key: Optional[int]) -> bytes:
+        """跟踪器当前版本的完整状态帧，同一版本只序列化一次（调用方持有_sync_lock）"""
+        tracker = self.trackers[key]
+        cached = self._full_state_cache.get(key)
+        if cached is None or cached[0] != tracker.version:
+            # 地形已在game_start中发送，完整同步只带领土
+            cached = (tracker.version, encode_message({
                 'type': 'sync',
-                'state': self.game_state.to_dict()
-            })
+                'version': tracker.version,
+                'state': tracker.state_dict(include_terrain=False)
+            }))
+            self._full_state_cache[key] = cached
+        return cached[1]
+
+    def send_full_state(self, player_id: int):
+        """给某个玩家补发完整状态"""
+        if not self.game_state:
+            return
+        with self._sync_lock:
+            # 先发出尚未发送的变化，保证完整状态与版本号对应
+            self._broadcast_changes()
+            key = self._tracker_key(player_id)
+            if key in self.trackers:
+                self._send_encoded(self._encoded_full_state(key), 'sync', [player_id])
+
+    def _send_encoded(self, data: bytes, kind: str, player_ids: List[int] = None):
+        """把已编码的帧排入指定玩家（默认所有玩家）的发送队列"""
+        with self._lock:
+            for pid, channel in list(self.clients.items()):
+                if player_ids is None or pid in player_ids:
+                    channel.send(data, kind)
 
     def send_to_player(self, player_id: int, msg: dict):
-        """发送消息给特定玩家"""
+        """发送消息给特定玩家（排入该玩家的发送队列）"""
+        self._send_encoded(encode_message(msg), msg.get('type'), [player_id])
+
+    def send_action_result(self, player_id: int, action: dict, success: bool, message: str):
+        """立即回复单个操作的结果（状态变化随后在同步中送达）；带回客户端的操作序号"""
+        msg = {'type': 'action_result', 'success': success, 'message': message}
+        if 'seq' in action:
+            msg['seq'] = action['seq']
+        self.send_to_player(player_id, msg)
+
+    def get_client_stats(self) -> Dict[int, dict]:
+        """各客户端发送队列统计: 队列深度、峰值、已发送字节/帧数、合并与丢弃的帧数、补发次数"""
         with self._lock:
-            if player_id in self.clients:
-                try:
-                    self.clients[player_id].send(json.dumps(msg).encode())
-                except:
-                    pass
-
-    def process_action(self, player_id: int, action: dict) -> tuple:
-        """处理玩家操作"""
+            return {pid: channel.stats() for pid, channel in list(self.clients.items())}
+
+    def process_action(self, player_id: int, action: dict, sync: bool = True) -> tuple:
+        """处理玩家操作；sync=False时不安排同步（由调用方统一同步）"""
         if not self.game_state:
             return False, "游戏未开始"
 
@@ -371,18 +706,18 @@ class GameServer:
             unit_ids = action.get('unit_ids', [])
             dx, dy = action['dx'], action['dy']
             for uid in unit_ids:
-                for u in self.game_state.units:
-                    if u.id == uid and u.owner_id == player_id:
-                        u.set_attack_direction(dx, dy)
+                u = self.game_state.get_player_unit(player_id, uid)
+                if u:
+                    u.set_attack_direction(dx, dy)
             success, msg = True, f"已设置{len(unit_ids)}个单位的进攻方向"
         elif action_type == 'set_defense_direction':
             # 为多个单位设置防守方向
             unit_ids = action.get('unit_ids', [])
             dx, dy = action['dx'], action['dy']
             for uid in unit_ids:
-                for u in self.game_state.units:
-                    if u.id == uid and u.owner_id == player_id:
-                        u.set_defense_direction(dx, dy)
+                u = self.game_state.get_player_unit(player_id, uid)
+                if u:
+                    u.set_defense_direction(dx, dy)
             success, msg = True, f"已设置{len(unit_ids)}个单位的防守方向"
         elif action_type == 'start_focus':
             success, msg = self.game_state.start_focus(
@@ -408,20 +743,35 @@ class GameServer:
         else:
             return False, "未知操作"
 
-        # 同步状态
-        self.sync_game_state()
+        # 同步状态（合并窗口内的多个操作只同步一次）
+        if sync:
+            self.request_sync()
 
         return success, msg
 
+    def process_batch(self, player_id: int, actions: List[dict], received_at: float = None) -> List[tuple]:
+        """按顺序处理一批操作，全部完成后同步一次，返回每个操作的 (成功, 信息)"""
+        results = []
+        for action in actions:
+            if not isinstance(action, dict):
+                results.append((False, "操作格式错误"))
+                continue
+            try:
+                results.append(self.process_action(player_id, action, sync=False))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                results.append((False, "操作参数错误"))
+            if received_at is not None:
+                self.action_latency.record(time.perf_counter() - received_at)
+        self.sync_game_state()
+        return results
+
     def stop(self):
         """停止服务器"""
         self.running = False
+        self.simulation.stop()
         with self._lock:
-            for sock in self.clients.values():
-                try:
-                    sock.close()
-                except:
-                    pass
+            for channel in self.clients.values():
+                channel.close()
             self.clients.clear()
 
         if self.server_socket:
@@ -435,3 +785,226 @@ class GameServer:
 
     def get_player_names(self) -> List[str]:
         return self.player_names.copy()
+
+
+class EventLoopThread:
+    """在后台线程运行的asyncio事件循环，多个房间可以共用同一个循环"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def call(self, func: Callable, *args):
+        """线程安全地把调用排入事件循环（按提交顺序执行）"""
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def run(self, coro, timeout: float = None):
+        """从其他线程提交协程并等待结果（不能在事件循环线程内调用）"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+
+_shared_loop: Optional[EventLoopThread] = None
+_shared_loop_lock = threading.Lock()
+
+
+def get_shared_event_loop() -> EventLoopThread:
+    """获取进程内共用的事件循环线程"""
+    global _shared_loop
+    with _shared_loop_lock:
+        if _shared_loop is None:
+            _shared_loop = EventLoopThread()
+        return _shared_loop
+
+
+class AsyncConnection(OutboundQueue):
+    """
+    asyncio模式的客户端连接：发送队列由一个写协程依次写出
+    写缓冲满时写协程等待drain（背压），只在事件循环线程中使用
+    """
+
+    def __init__(self, writer: asyncio.StreamWriter, limit: int = CLIENT_SEND_QUEUE_LIMIT,
+                 compressor: Optional[FrameCompressor] = None):
+        super().__init__(limit, compressor)
+        self.writer = writer
+        self._wakeup = asyncio.Event()
+
+    def send(self, data: bytes, kind: str = None) -> bool:
+        """排入一帧，返回是否成功（连接已关闭或严重滞后时为False，并关闭连接）"""
+        if self.closed:
+            return False
+        if not self._enqueue(data, kind):
+            print("客户端读取过慢，断开连接")
+            self.close()
+            return False
+        self._wakeup.set()
+        return True
+
+    async def run_writer(self):
+        """写协程：依次写出队列中的帧"""
+        try:
+            while not self.closed:
+                if not self._frames:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                _, data = self._frames.popleft()
+                data = self._wire_frame(data)
+                self.writer.write(data)
+                await self.writer.drain()
+                self._sent(data)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._frames.clear()
+        self._wakeup.set()
+        self.writer.close()
+
+
+class AsyncGameServer(GameServer):
+    """
+    asyncio版游戏服务器 - 所有连接在同一个事件循环中处理，不为每个连接开线程
+    接口和回调与GameServer相同；加入/离开回调在事件循环线程中执行，操作回调在模拟线程中执行
+    """
+
+    def __init__(self, port: int = DEFAULT_PORT, loop_thread: Optional[EventLoopThread] = None):
+        super().__init__(port)
+        self.loop_thread = loop_thread or get_shared_event_loop()
+        self.clients: Dict[int, AsyncConnection] = {}  # player_id -> 连接（只在事件循环线程中访问）
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def _listen(self):
+        self._server = self.loop_thread.run(asyncio.start_server(
+            self._handle_connection, '0.0.0.0', self.port,
+            backlog=MAX_PLAYERS, reuse_address=True, start_serving=False
+        ))
+
+    def _start_accepting(self):
+        self.loop_thread.run(self._server.start_serving())
+
+    async def _read_handshake(self, reader: asyncio.StreamReader, frames: FrameReader) -> List[dict]:
+        """读取到至少一条消息为止（握手用），返回收齐的消息；连接关闭时返回空列表"""
+        while True:
+            data = await reader.read(RECV_CHUNK_SIZE)
+            if not data:
+                return []
+            messages = frames.feed(data)
+            if messages:
+                return messages
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理单个连接：握手后循环读取消息"""
+        if len(self.player_names) >= MAX_PLAYERS or self.game_started:
+            error = '房间已满' if len(self.player_names) >= MAX_PLAYERS else '游戏已开始'
+            writer.write(encode_message({'type': 'error', 'message': error}))
+            try:
+                await writer.drain()
+            finally:
+                writer.close()
+            return
+
+        frames = FrameReader()
+        try:
+            # 接收玩家名称
+            messages = await self._read_handshake(reader, frames)
+        except (ConnectionError, ProtocolError, ValueError):
+            messages = []
+        if not messages:
+            writer.close()
+            return
+        msg = messages[0]
+        player_name = msg.get('name', f'玩家{len(self.player_names) + 1}')
+
+        with self._lock:
+            player_id = len(self.player_names)
+            self.player_names.append(player_name)
+        compressor = self._negotiate_compression(msg)
+        connection = AsyncConnection(writer, compressor=compressor)
+        connection.on_resync_needed = self._schedule_resync
+        self.clients[player_id] = connection
+        writer_task = asyncio.ensure_future(connection.run_writer())
+
+        # 发送确认和当前玩家列表
+        connection.send(encode_message({
+            'type': 'joined',
+            'player_id': player_id,
+            'players': self.player_names,
+            'compression': COMPRESSION_NAME if compressor else None
+        }))
+
+        # 通知其他玩家
+        self._broadcast({
+            'type': 'player_joined',
+            'players': self.player_names
+        }, exclude=player_id)
+
+        if self.on_player_join:
+            self.on_player_join(player_name)
+
+        try:
+            for msg in messages[1:]:
+                self._process_message(player_id, msg)
+            while self.running and not connection.closed:
+                data = await reader.read(RECV_CHUNK_SIZE)
+                if not data:
+                    break
+                for msg in frames.feed(data):
+                    self._process_message(player_id, msg)
+        except (ConnectionError, ProtocolError, ValueError) as e:
+            print(f"客户端 {player_id} 错误: {e}")
+
+        # 玩家断开连接
+        connection.close()
+        await writer_task
+        if self.clients.get(player_id) is connection:
+            del self.clients[player_id]
+        if self.on_player_leave:
+            self.on_player_leave(player_id)
+
+    def _broadcast(self, msg: dict, exclude: int = None):
+        """广播消息（任意线程可调用，编码一次后排入各连接的发送队列）"""
+        self.loop_thread.call(self._send_all, encode_message(msg), msg.get('type'), exclude)
+
+    def _send_all(self, data: bytes, kind: str, exclude: Optional[int]):
+        for pid, connection in list(self.clients.items()):
+            if pid != exclude:
+                connection.send(data, kind)
+
+    def _send_encoded(self, data: bytes, kind: str, player_ids: List[int] = None):
+        """任意线程可调用，在事件循环中排入发送队列"""
+        self.loop_thread.call(self._send_some, data, kind, player_ids)
+
+    def _send_some(self, data: bytes, kind: str, player_ids: Optional[List[int]]):
+        for pid, connection in list(self.clients.items()):
+            if player_ids is None or pid in player_ids:
+                connection.send(data, kind)
+
+    def stop(self):
+        """停止服务器"""
+        self.running = False
+        self.simulation.stop()
+        self.loop_thread.call(self._close_all)
+
+    def _close_all(self):
+        if self._server:
+            self._server.close()
+        for connection in list(self.clients.values()):
+            connection.close()
+        self.clients.clear()
+
+
+def create_server(port: int = DEFAULT_PORT) -> GameServer:
+    """按配置创建服务器（asyncio模式或线程模式）"""
+    if SERVER_ASYNC_MODE:
+        return AsyncGameServer(port)
+    return GameServer(port)
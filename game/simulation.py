@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""模拟线程 - 所有修改游戏状态的操作按顺序在同一个线程中执行（单写者）"""
+
+import bisect
+import heapq
+import itertools
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+# 延迟直方图的桶上限(ms)，最后一个桶收纳更慢的
+LATENCY_BUCKETS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000]
+
+
+class LatencyHistogram:
+    """固定分桶的延迟直方图（线程安全）"""
+
+    def __init__(self, bounds_ms: List[float] = None):
+        self.bounds_ms = list(bounds_ms or LATENCY_BUCKETS_MS)
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.bounds_ms) + 1)
+            self.count = 0
+            self.total_ms = 0.0
+            self.max_ms = 0.0
+
+    def record(self, seconds: float):
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+            self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, p: float) -> float:
+        """第p百分位所在桶的上限(ms)，不超过记录到的最大值"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            rank = p / 100 * self.count
+            seen = 0
+            for i, n in enumerate(self.counts):
+                seen += n
+                if seen >= rank and n:
+                    return min(self.bounds_ms[i], self.max_ms) if i < len(self.bounds_ms) else self.max_ms
+            return self.max_ms
+
+    def summary(self) -> dict:
+        p50, p99 = self.percentile(50), self.percentile(99)
+        with self._lock:
+            buckets = {f"<={b}ms": n for b, n in zip(self.bounds_ms, self.counts)}
+            buckets[f">{self.bounds_ms[-1]}ms"] = self.counts[-1]
+            return {
+                'count': self.count,
+                'mean_ms': self.total_ms / self.count if self.count else 0.0,
+                'max_ms': self.max_ms,
+                'p50_ms': p50,
+                'p99_ms': p99,
+                'buckets': buckets
+            }
+
+
+class SimulationThread:
+    """
+    单写者模拟线程 - 网络线程只把任务排入队列，由本线程按提交顺序执行
+    call() 在本线程内调用时直接执行，避免自己等待自己；停止后提交的任务在调用方线程直接执行
+    submit_later() 的延迟任务由本线程自己计时，不为每个任务另起线程
+    每个任务执行期间持有lock：其他线程读取状态（如房主渲染）时持有同一把锁，不会看到执行到一半的修改
+    """
+
+    def __init__(self, name: str = 'simulation'):
+        self.lock = threading.RLock()
+        self._queue: queue.Queue = queue.Queue()
+        self._stopped = False
+        self._timers: list = []  # (到期时间, 序号, func, args) 小顶堆，只在本线程中弹出
+        self._timer_lock = threading.Lock()
+        self._timer_seq = itertools.count()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def in_simulation_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, func: Callable, *args) -> Future:
+        """排入任务，返回Future（不等待执行）"""
+        future = Future()
+        if self._stopped:
+            self._execute(func, args, future)
+        else:
+            self._queue.put((func, args, future))
+        return future
+
+    def submit_later(self, delay: float, func: Callable, *args):
+        """delay秒后在模拟线程中执行（不等待）；停止后不再执行"""
+        if self._stopped:
+            return
+        with self._timer_lock:
+            heapq.heappush(self._timers, (time.monotonic() + delay, next(self._timer_seq), func, args))
+        self._queue.put(())  # 唤醒模拟线程重新计算等待时间
+
+    def call(self, func: Callable, *args, timeout: Optional[float] = None):
+        """在模拟线程中执行并等待结果"""
+        if self.in_simulation_thread():
+            return func(*args)
+        if self._stopped:
+            with self.lock:
+                return func(*args)
+        return self.submit(func, *args).result(timeout)
+
+    def pending(self) -> int:
+        """队列中等待执行的任务数"""
+        return self._queue.qsize()
+
+    def stop(self):
+        """处理完已排入的任务后退出"""
+        self._stopped = True
+        self._queue.put(None)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self._next_timer_delay())
+            except queue.Empty:
+                item = ()
+            if item is None:
+                return
+            if item:
+                self._execute(*item)
+            self._run_due_timers()
+
+    def _next_timer_delay(self) -> Optional[float]:
+        with self._timer_lock:
+            if not self._timers:
+                return None
+            return max(0.0, self._timers[0][0] - time.monotonic())
+
+    def _run_due_timers(self):
+        now = time.monotonic()
+        due = []
+        with self._timer_lock:
+            while self._timers and self._timers[0][0] <= now:
+                due.append(heapq.heappop(self._timers))
+        for _, _, func, args in due:
+            self._execute(func, args, Future())
+
+    def _execute(self, func: Callable, args: tuple, future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            with self.lock:
+                result = func(*args)
+            future.set_result(result)
+        except Exception as e:
+            print(f"模拟线程任务错误: {e}")
+            future.set_exception(e)
+
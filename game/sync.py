@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""增量状态同步 - 服务器按版本广播变更集，客户端应用到本地GameState"""
+
+import json
+import zlib
+from typing import Dict, List, Optional, Set
+from game_state import GameState, Player
+from units import Unit, select_unit_columns
+from buildings import create_building
+
+# 整体替换的部分（变化时整段发送）
+SECTION_KEYS = ('production_queue', 'pending_territory', 'focus_trees', 'railway_cells',
+                'active_trains', 'current_turn', 'game_started', 'game_over', 'winner_id')
+# 玩家视图中其他玩家不可见的字段
+PRIVATE_PLAYER_FIELDS = ('economy', 'population', 'pop_cap')
+
+
+def snapshot_data(state: GameState) -> dict:
+    """
+    不含地图的状态数据，经过一次JSON往返：与实时状态不共享可变对象，且与客户端解析出的结构一致
+    只用于计算校验和
+    """
+    return json.loads(json.dumps(state.to_dict(include_map=False, columnar=False)))
+
+
+def section_data(state: GameState) -> dict:
+    """整体替换各部分的当前值，经过一次JSON往返（不与实时状态共享可变对象，跟踪器保存后可直接比较）"""
+    return json.loads(json.dumps(state.sections_to_dict()))
+
+
+def view_sections(data: dict, player_id: int) -> dict:
+    """玩家视角的整体替换部分：生产队列、国策、铁路、火车、待占领领土只保留自己的"""
+    def own(owner) -> bool:
+        return owner is not None and int(owner) == player_id
+
+    view = {key: data[key] for key in SECTION_KEYS}
+    view['production_queue'] = [pq for pq in data['production_queue'] if pq['owner_id'] == player_id]
+    view['pending_territory'] = {key: pid for key, pid in data['pending_territory'].items() if own(pid)}
+    view['focus_trees'] = {pid: ft for pid, ft in data['focus_trees'].items() if own(pid)}
+    view['railway_cells'] = {pid: cells for pid, cells in data['railway_cells'].items() if own(pid)}
+    view['active_trains'] = [t for t in data['active_trains'] if t['owner_id'] == player_id]
+    return view
+
+
+def view_player(data: dict, player_id: int) -> dict:
+    """玩家视角的玩家记录：其他玩家的私有字段置为None（保留键，客户端解析出的结构不变）"""
+    if data['id'] == player_id:
+        return data
+    return {**data, **dict.fromkeys(PRIVATE_PLAYER_FIELDS)}
+
+
+def player_view(state: GameState, data: dict, player_id: int) -> dict:
+    """
+    玩家视角的状态数据（data为to_dict的结果，可含地图）：
+    敌方单位只保留该玩家能发现的，其他玩家的私有字段置空，整体替换部分按view_sections过滤
+    """
+    seen = state.visibility.visible_enemies(player_id)
+
+    def visible(unit_id: int, owner_id: int) -> bool:
+        return owner_id == player_id or unit_id in seen
+
+    view = dict(data)
+    view['players'] = {pid: view_player(p, player_id) for pid, p in data['players'].items()}
+    if 'unit_columns' in data:
+        columns = data['unit_columns']
+        rows = [i for i, (unit_id, owner_id) in enumerate(zip(columns['id'], columns['owner_id']))
+                if visible(unit_id, owner_id)]
+        view['unit_columns'] = select_unit_columns(columns, rows)
+    else:
+        view['units'] = [u for u in data['units'] if visible(u['id'], u['owner_id'])]
+    view.update(view_sections(data, player_id))
+    return view
+
+
+def build_snapshot(state: GameState, player_id: Optional[int] = None, data: Optional[dict] = None) -> Dict[str, dict]:
+    """状态快照（player_id不为None时为该玩家的视图），单位/建筑/玩家按键索引"""
+    if data is None:
+        data = snapshot_data(state)
+    if player_id is not None:
+        data = player_view(state, data, player_id)
+    return {
+        'units': {str(u['id']): u for u in data['units']},
+        'buildings': {f"{b['x']},{b['y']}": b for b in data['buildings']},
+        'players': data['players'],
+        'sections': {key: data[key] for key in SECTION_KEYS}
+    }
+
+
+def state_checksum(state: GameState, snapshot: Optional[dict] = None) -> int:
+    """状态校验和（快照 + 领土），服务器和客户端用同一算法核对是否一致"""
+    if snapshot is None:
+        snapshot = build_snapshot(state)
+    payload = [snapshot, state.game_map.get_territory_rows() if state.game_map else None]
+    return zlib.crc32(json.dumps(payload, sort_keys=True, separators=(',', ':')).encode())
+
+
+def collect_changes(state: GameState) -> dict:
+    """
+    取走状态自上次以来记录的变化并序列化一次，同一轮同步的所有跟踪器共用：
+    单位、建筑来自各自索引的变化集，玩家来自其变化标记，领土来自地图的脏格子，
+    整体替换的部分取当前值，由各跟踪器与上次发送的比较
+    """
+    units, removed_units = state.units.take_changes()
+    buildings, removed_buildings = state.buildings.take_changes()
+    return {
+        'units': {u.id: u.to_dict() for u in units},
+        'removed_units': removed_units,
+        'buildings': [b.to_dict() for b in buildings],
+        'removed_buildings': [f"{x},{y}" for x, y in removed_buildings],
+        'players': [p.to_dict() for p in state.take_player_changes()],
+        'sections': section_data(state),
+        'territory': state.game_map.take_territory_changes() if state.game_map else []
+    }
+
+
+def discard_changes(state: GameState):
+    """丢弃状态记录的变化（不需要转发时，避免变化集增长）"""
+    state.units.take_changes()
+    state.buildings.take_changes()
+    state.take_player_changes()
+    if state.game_map:
+        state.game_map.take_territory_changes()
+
+
+class StateTracker:
+    """
+    服务器端同步跟踪 - 记录已发送的版本号和整体替换部分
+    每次操作后由collect_changes取出的变化集生成变更集，不比较整个状态
+    player_id不为None时跟踪该玩家的视图（战争迷雾），否则跟踪完整状态：
+    另记录该玩家能看到的敌方单位及当时的视野缓存键，键未变时只重新判断变化过的敌方单位；
+    玩家记录去掉私有字段后与上次发送的比较，没有变化的不再发送
+    变更集中都是最新的完整值，重复应用结果相同
+    """
+
+    def __init__(self, state: GameState, player_id: Optional[int] = None):
+        self.state = state
+        self.player_id = player_id
+        self.version = 0
+        self._sections = self._filter_sections(section_data(state))
+        self._visible: Set[int] = set()
+        self._visibility_key = None
+        self._players: Dict[int, dict] = {}  # 已发送的玩家记录（玩家视图）
+        if player_id is not None:
+            self._visible = self._visible_enemies()
+            self._players = {p.id: view_player(p.to_dict(), player_id) for p in state.players.values()}
+        discard_changes(state)
+
+    def _filter_sections(self, sections: dict) -> dict:
+        return sections if self.player_id is None else view_sections(sections, self.player_id)
+
+    def _visible_enemies(self) -> Set[int]:
+        """重新判断所有敌方单位，并记下此时的视野缓存键"""
+        self._visibility_key = self.state.visibility.cache_key(self.player_id)
+        return self.state.visibility.visible_enemies(self.player_id)
+
+    def make_delta(self, changes: Optional[dict] = None) -> Optional[dict]:
+        """
+        生成自上个版本以来的变更集；无变化返回None，否则版本号+1
+        多个跟踪器共用一轮同步时，由调用方传入共享的collect_changes结果
+        """
+        if changes is None:
+            changes = collect_changes(self.state)
+        delta = {}
+        units = self._unit_changes(changes)
+        if units:
+            delta['units'] = units
+        buildings = {}
+        if changes['buildings']:
+            buildings['set'] = changes['buildings']
+        if changes['removed_buildings']:
+            buildings['removed'] = changes['removed_buildings']
+        if buildings:
+            delta['buildings'] = buildings
+        players = self._player_changes(changes['players'])
+        if players:
+            delta['players'] = players
+        sections = self._filter_sections(changes['sections'])
+        changed_sections = {key: value for key, value in sections.items() if self._sections.get(key) != value}
+        self._sections = sections
+        if changed_sections:
+            delta['sections'] = changed_sections
+        if changes['territory']:
+            delta['territory'] = changes['territory']
+
+        if not delta:
+            return None
+        self.version += 1
+        return delta
+
+    def _unit_changes(self, changes: dict) -> dict:
+        """单位变更：完整视图直接取变化集；玩家视图只含自己的和能发现的敌方单位，并补上视野变化带来的出现/消失"""
+        changed, removed = changes['units'], changes['removed_units']
+        if self.player_id is None:
+            units = {}
+            if changed:
+                units['set'] = list(changed.values())
+            if removed:
+                units['removed'] = list(removed)
+            return units
+
+        state, player_id = self.state, self.player_id
+        if state.visibility.cache_key(player_id) != self._visibility_key:
+            visible = self._visible_enemies()
+        else:
+            # 视野没变：只有位置、隐蔽等变化过的敌方单位可能出现或消失
+            enemies = [state.units.get(unit_id) for unit_id, data in changed.items() if data['owner_id'] != player_id]
+            visible = self._visible - changed.keys() - removed.keys()
+            visible |= state.visibility.visible_units(player_id, enemies)
+        appeared = visible - self._visible
+        gone = [unit_id for unit_id in self._visible - visible if unit_id not in removed]
+        gone += [unit_id for unit_id, owner_id in removed.items()
+                 if owner_id == player_id or unit_id in self._visible]
+        self._visible = visible
+        updates = [data for unit_id, data in changed.items()
+                   if data['owner_id'] == player_id or unit_id in visible]
+        updates += [state.units.get(unit_id).to_dict() for unit_id in sorted(appeared)
+                    if unit_id not in changed]
+        units = {}
+        if updates:
+            units['set'] = updates
+        if gone:
+            units['removed'] = gone
+        return units
+
+    def _player_changes(self, players: List[dict]) -> List[dict]:
+        """玩家变更：完整视图直接取变化的玩家；玩家视图去掉其他玩家的私有字段，只发送与上次不同的记录"""
+        if self.player_id is None:
+            return players
+        records = []
+        for data in players:
+            record = view_player(data, self.player_id)
+            if self._players.get(record['id']) != record:
+                self._players[record['id']] = record
+                records.append(record)
+        return records
+
+    def state_dict(self, include_terrain: bool = True) -> dict:
+        """当前状态（按跟踪的视图过滤）的完整数据"""
+        data = self.state.to_dict(include_terrain=include_terrain)
+        if self.player_id is not None:
+            data = player_view(self.state, data, self.player_id)
+        return data
+
+    def checksum(self, data: Optional[dict] = None) -> int:
+        """
+        当前状态（按跟踪的视图）的校验和；在make_delta之后、状态再次变化之前调用，即为刚生成的版本的校验和
+        多个跟踪器同时计算时，可由调用方传入共享的snapshot_data结果
+        """
+        return state_checksum(self.state, build_snapshot(self.state, self.player_id, data))
+
+
+def apply_delta(state: GameState, changes: dict):
+    """客户端：将变更集应用到本地状态"""
+    units = changes.get('units', {})
+    for unit_id in units.get('removed', ()):
+        unit = state.units.get(int(unit_id))
+        if unit:
+            state.units.remove(unit)
+    for data in units.get('set', ()):
+        state.units.add(Unit.from_dict(data))
+
+    buildings = changes.get('buildings', {})
+    for key in buildings.get('removed', ()):
+        x, y = map(int, key.split(','))
+        building = state.buildings.at(x, y)
+        if building:
+            state.buildings.remove(building)
+    for b in buildings.get('set', ()):
+        old = state.buildings.at(b['x'], b['y'])
+        if old:
+            state.buildings.remove(old)
+        state.buildings.add(create_building(b['type'], b['x'], b['y'], b['owner_id'], b['level'], b))
+
+    for data in changes.get('players', ()):
+        state.players[data['id']] = Player.from_dict(data)
+
+    if 'sections' in changes:
+        state.load_sections(changes['sections'])
+
+    for x, y, owner_id in changes.get('territory', ()):
+        state.game_map.set_territory(x, y, owner_id)
+    # 客户端不会再转发这些变化，丢弃本地各索引和地图记录的变化集，避免其无限增长
+    discard_changes(state)
@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 """兵种系统"""
 
-from typing import Tuple, List, Optional
+from typing import Dict, Iterable, Iterator, Set, Tuple, List, Optional
 from config import UNITS, TERRAIN_RIVER, RIVER_MOVE_COST, UNIT_PRODUCTION_SOURCE, get_production_building
 
+_UNSET = object()
+
 
 class Unit:
     """军队单位类"""
 
     _next_id = 1
+    _registry: Optional['UnitRegistry'] = None  # 所在的单位索引，属性变化时记入其变化集
 
     def __init__(self, unit_type: str, x: int, y: int, owner_id: int, count: int = 1):
         self.id = Unit._next_id
@@ -28,6 +31,13 @@ class Unit:
         self.defense_direction: Optional[Tuple[int, int]] = None  # 防守方向 (dx, dy)
         self.target_position: Optional[Tuple[int, int]] = None  # 派遣目标位置
 
+    def __setattr__(self, name, value):
+        # 值改变时记入所在索引的变化集（列表随后可能被原地修改，总是记入），增量同步据此只发送变化的单位
+        registry = self._registry
+        if registry is not None and (getattr(self, name, _UNSET) != value or type(value) is list):
+            registry._changed.add(self.id)
+        object.__setattr__(self, name, value)
+
     @property
     def name(self) -> str:
         return f"{self.config['name']} ({self.count}k)"
@@ -206,6 +216,202 @@ class Unit:
         return unit
 
 
+UNIT_COLUMNS = ('id', 'type', 'x', 'y', 'owner_id', 'count', 'remaining_moves')
+UNIT_EXTRA_DEFAULTS = {'selected': False, 'attack_direction': None, 'defense_direction': None, 'target_position': None}
+
+
+def units_to_columns(units: Iterable[Unit]) -> dict:
+    """
+    按列序列化单位：每个字段一个数组，兵种名只在types表中出现一次（type列为下标）
+    很少使用的微操字段只为非默认值的单位记录在extra中 {行号: {字段: 值}}
+    """
+    types: Dict[str, int] = {}
+    ids, codes, xs, ys, owners, counts, moves = [], [], [], [], [], [], []
+    extra = {}
+    for i, unit in enumerate(units):
+        code = types.get(unit.unit_type)
+        if code is None:
+            code = types[unit.unit_type] = len(types)
+        ids.append(unit.id)
+        codes.append(code)
+        xs.append(unit.x)
+        ys.append(unit.y)
+        owners.append(unit.owner_id)
+        counts.append(unit.count)
+        moves.append(unit.remaining_moves)
+        if unit.selected or unit.attack_direction or unit.defense_direction or unit.target_position:
+            extra[str(i)] = {key: getattr(unit, key) for key, default in UNIT_EXTRA_DEFAULTS.items()
+                             if getattr(unit, key) != default}
+    return {
+        'types': list(types),
+        'id': ids, 'type': codes, 'x': xs, 'y': ys,
+        'owner_id': owners, 'count': counts, 'remaining_moves': moves,
+        'extra': extra
+    }
+
+
+def select_unit_columns(columns: dict, rows: List[int]) -> dict:
+    """取出按列数据中的部分行（行号按原顺序），types表保持不变"""
+    selected = {key: [columns[key][i] for i in rows] for key in UNIT_COLUMNS}
+    extra = columns['extra']
+    selected['types'] = columns['types']
+    selected['extra'] = {str(new): extra[str(old)] for new, old in enumerate(rows) if str(old) in extra}
+    return selected
+
+
+def units_from_columns(columns: dict) -> List[Unit]:
+    """按列数据还原单位；不经过__init__，每个兵种的配置只查一次"""
+    configs = [UNITS[unit_type] for unit_type in columns['types']]
+    types = columns['types']
+    extra = columns['extra']
+    units = []
+    for i, (unit_id, code, x, y, owner_id, count, moves) in enumerate(zip(
+            columns['id'], columns['type'], columns['x'], columns['y'],
+            columns['owner_id'], columns['count'], columns['remaining_moves'])):
+        unit = Unit.__new__(Unit)
+        unit.id = unit_id
+        unit.unit_type = types[code]
+        unit.config = configs[code]
+        unit.x = x
+        unit.y = y
+        unit.owner_id = owner_id
+        unit.count = count
+        unit.remaining_moves = moves
+        unit.__dict__.update(UNIT_EXTRA_DEFAULTS)
+        if extra:
+            unit.__dict__.update(extra.get(str(i), ()))
+        units.append(unit)
+    if units:
+        Unit._next_id = max(Unit._next_id, max(columns['id']) + 1)
+    return units
+
+
+class UnitRegistry:
+    """
+    单位索引 - 按ID、格子和所属玩家维护单位
+    同时记录自上次take_changes以来新增或属性变化、以及移除的单位（供增量同步）；单位同一时间只属于一个索引
+    """
+
+    def __init__(self, units: Iterable[Unit] = ()):
+        self._by_id: Dict[int, Unit] = {}
+        self._by_cell: Dict[Tuple[int, int], List[Unit]] = {}
+        self._by_owner: Dict[int, Dict[int, Unit]] = {}
+        self._cell_of: Dict[int, Tuple[int, int]] = {}  # 单位登记时所在格子
+        self._rank: Dict[int, int] = {}  # 单位在遍历顺序中的序号，同格单位按此排序
+        self._rank_seq = 0
+        self._changed: Set[int] = set()  # 新增或属性变化的单位ID（由Unit.__setattr__记录）
+        self._removed: Dict[int, int] = {}  # 移除的单位 {ID: 所属玩家}
+        self._owner_versions: Dict[int, int] = {}  # 各玩家单位最近一次变化的序号
+        self._version_seq = 0
+        for unit in units:
+            self.add(unit)
+
+    def __iter__(self) -> Iterator[Unit]:
+        # 返回快照，允许遍历时增删单位
+        return iter(list(self._by_id.values()))
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, unit: Unit) -> bool:
+        return self._by_id.get(unit.id) is unit
+
+    def add(self, unit: Unit):
+        """登记单位"""
+        if unit.id in self._by_id:
+            self.remove(self._by_id[unit.id])
+        cell = (unit.x, unit.y)
+        self._by_id[unit.id] = unit
+        self._cell_of[unit.id] = cell
+        self._rank[unit.id] = self._next_rank()
+        self._by_cell.setdefault(cell, []).append(unit)
+        self._by_owner.setdefault(unit.owner_id, {})[unit.id] = unit
+        object.__setattr__(unit, '_registry', self)  # 不经__setattr__记录
+        self._changed.add(unit.id)
+        self._touch(unit.owner_id)
+
+    def remove(self, unit: Unit):
+        """移除单位（死亡或被合并）"""
+        if self._by_id.get(unit.id) is not unit:
+            return
+        del self._by_id[unit.id]
+        del self._rank[unit.id]
+        self._detach_cell(unit, self._cell_of.pop(unit.id))
+        self._by_owner[unit.owner_id].pop(unit.id, None)
+        object.__setattr__(unit, '_registry', None)
+        self._changed.discard(unit.id)
+        self._removed[unit.id] = unit.owner_id
+        self._touch(unit.owner_id)
+
+    def take_changes(self) -> Tuple[List[Unit], Dict[int, int]]:
+        """取走上次调用以来新增或变化的单位（按ID排序），以及移除的单位 {ID: 所属玩家}"""
+        changed = [self._by_id[unit_id] for unit_id in sorted(self._changed)]
+        removed = self._removed
+        self._changed = set()
+        self._removed = {}
+        return changed, removed
+
+    def update_position(self, unit: Unit):
+        """单位坐标改变后更新格子索引"""
+        old_cell = self._cell_of.get(unit.id)
+        new_cell = (unit.x, unit.y)
+        if old_cell is None or old_cell == new_cell:
+            return
+        self._detach_cell(unit, old_cell)
+        self._cell_of[unit.id] = new_cell
+        self._by_cell.setdefault(new_cell, []).append(unit)
+        self._touch(unit.owner_id)
+
+    def move_to_end(self, unit: Unit):
+        """把单位移到遍历顺序末尾（与旧版合并后重建列表的顺序一致）"""
+        if self._by_id.get(unit.id) is not unit:
+            return
+        del self._by_id[unit.id]
+        self._by_id[unit.id] = unit
+        self._rank[unit.id] = self._next_rank()
+
+    def _next_rank(self) -> int:
+        self._rank_seq += 1
+        return self._rank_seq
+
+    def _touch(self, owner_id: int):
+        self._version_seq += 1
+        self._owner_versions[owner_id] = self._version_seq
+
+    def version(self) -> int:
+        """所有单位的版本号（任一单位增删或移动后变化）"""
+        return self._version_seq
+
+    def owner_version(self, owner_id: int) -> int:
+        """某玩家单位的版本号（增删或移动后变化），供视野等缓存判断是否失效"""
+        return self._owner_versions.get(owner_id, 0)
+
+    def _detach_cell(self, unit: Unit, cell: Tuple[int, int]):
+        cell_units = self._by_cell.get(cell)
+        if cell_units is None:
+            return
+        cell_units.remove(unit)
+        if not cell_units:
+            del self._by_cell[cell]
+
+    def get(self, unit_id: int) -> Optional[Unit]:
+        """按ID获取单位"""
+        return self._by_id.get(unit_id)
+
+    def at(self, x: int, y: int) -> List[Unit]:
+        """获取指定格子的所有单位（含已死亡但未移除的），按遍历顺序排列"""
+        cell_units = self._by_cell.get((x, y))
+        if not cell_units:
+            return []
+        if len(cell_units) == 1:
+            return list(cell_units)
+        return sorted(cell_units, key=lambda u: self._rank[u.id])
+
+    def owned_by(self, owner_id: int) -> List[Unit]:
+        """获取指定玩家的所有单位"""
+        return list(self._by_owner.get(owner_id, {}).values())
+
+
 class ProductionQueue:
     """生产队列项"""
 
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""视野系统 - 按玩家批量计算可见区域并缓存"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+from config import BASE_VISIBILITY_RANGE, UNIT_VISIBILITY_BONUS, SCOUT_VISIBILITY_BONUS
+from map_generator import ArrayGameMap
+
+try:
+    import numpy as np
+except ImportError:  # numpy 为可选依赖
+    np = None
+
+NO_SIGNAL = -1  # 场强下限：小于0表示该格不在任何单位的范围内
+
+
+def unit_vision_range(unit) -> int:
+    """单位视野范围（侦察类单位有额外视野加成）"""
+    if unit.category == 'scout':
+        return BASE_VISIBILITY_RANGE + SCOUT_VISIBILITY_BONUS
+    return BASE_VISIBILITY_RANGE + UNIT_VISIBILITY_BONUS
+
+
+def strength_field(seeds: Dict[Tuple[int, int], int], width: int, height: int) -> List[List[int]]:
+    """
+    计算场强网格：每格取 max(源强度 - 曼哈顿距离)，下限为NO_SIGNAL
+    seeds: {(x, y): 强度}，场强>=0的格子即在某个源的范围内
+    """
+    field = [[NO_SIGNAL] * width for _ in range(height)]
+    for (sx, sy), strength in seeds.items():
+        for y in range(max(0, sy - strength), min(height, sy + strength + 1)):
+            row = field[y]
+            rest = strength - abs(y - sy)
+            for x in range(max(0, sx - rest), min(width, sx + rest + 1)):
+                value = rest - abs(x - sx)
+                if value > row[x]:
+                    row[x] = value
+    return field
+
+
+def strength_field_array(seeds: Dict[Tuple[int, int], int], width: int, height: int):
+    """strength_field 的numpy版本：先放置源，再按行、按列各做一次正反向扫描（曼哈顿距离可分离）"""
+    field = np.full((height, width), NO_SIGNAL, dtype=np.int32)
+    if seeds:
+        for (sx, sy), strength in seeds.items():
+            # 地图外的源等价于地图边缘最近点上减去相应距离的源
+            x, y = min(max(sx, 0), width - 1), min(max(sy, 0), height - 1)
+            strength -= abs(sx - x) + abs(sy - y)
+            if strength > field[y, x]:
+                field[y, x] = strength
+        for axis, size in ((1, width), (0, height)):
+            idx = np.arange(size).reshape((1, size) if axis == 1 else (size, 1))
+            forward = np.maximum.accumulate(field + idx, axis=axis) - idx
+            backward = np.flip(np.maximum.accumulate(np.flip(field - idx, axis=axis), axis=axis), axis=axis) + idx
+            field = np.maximum(forward, backward)
+    return field
+
+
+class VisibilityEngine:
+    """
+    视野引擎 - 每个玩家的可见掩码 = 领土 OR 单位视野范围，一次批量算出
+    侦察强度场: 每格取 max(视野 + 侦察能力 - 距离)，单位可见即 强度 >= 目标隐蔽值
+    结果按玩家缓存，只有该玩家的单位或领土变化后才重算
+    """
+
+    def __init__(self, game_state):
+        self.game_state = game_state
+        self._masks: Dict[int, tuple] = {}  # player_id -> (缓存键, 可见掩码)
+        self._detection: Dict[int, tuple] = {}  # player_id -> (缓存键, 侦察强度场)
+        self._unit_arrays = None  # (缓存键, 所有单位的ID/所属玩家/坐标/隐蔽值数组)
+
+    def cache_key(self, player_id: int) -> tuple:
+        """玩家视野的缓存键：键不变时，该玩家对未变化的单位的可见性也不变"""
+        game_map = self.game_state.game_map
+        units = self.game_state.units
+        return (game_map, units, game_map.territory_version(player_id), units.owner_version(player_id))
+
+    def _use_arrays(self) -> bool:
+        return np is not None and isinstance(self.game_state.game_map, ArrayGameMap)
+
+    def _vision_seeds(self, player_id: int, with_detection: bool = False) -> Dict[Tuple[int, int], int]:
+        """同一格子只保留强度最大的单位（with_detection时计入侦察能力）"""
+        seeds = {}
+        for unit in self.game_state.units.owned_by(player_id):
+            if unit.is_alive():
+                cell = (unit.x, unit.y)
+                strength = unit_vision_range(unit)
+                if with_detection:
+                    strength += unit.detection
+                if strength > seeds.get(cell, NO_SIGNAL):
+                    seeds[cell] = strength
+        return seeds
+
+    def _build_field(self, seeds: Dict[Tuple[int, int], int]):
+        game_map = self.game_state.game_map
+        if self._use_arrays():
+            return strength_field_array(seeds, game_map.width, game_map.height)
+        return strength_field(seeds, game_map.width, game_map.height)
+
+    def visibility_mask(self, player_id: int):
+        """玩家的可见掩码（numpy布尔数组，或纯Python的行列表）"""
+        key = self.cache_key(player_id)
+        cached = self._masks.get(player_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        game_map = self.game_state.game_map
+        field = self._build_field(self._vision_seeds(player_id))
+        if self._use_arrays():
+            mask = (field >= 0) | game_map.territory_mask(player_id)
+        else:
+            mask = [[value >= 0 or owner == player_id for value, owner in zip(field_row, owner_row)]
+                    for field_row, owner_row in zip(field, game_map.get_territory_rows())]
+        self._masks[player_id] = (key, mask)
+        return mask
+
+    def is_visible(self, player_id: int, x: int, y: int) -> bool:
+        """某坐标对玩家是否可见（地图外不可见）"""
+        game_map = self.game_state.game_map
+        if not (0 <= x < game_map.width and 0 <= y < game_map.height):
+            return False
+        mask = self.visibility_mask(player_id)
+        if self._use_arrays():
+            return bool(mask[y, x])
+        return mask[y][x]
+
+    def visible_cells(self, player_id: int) -> Set[Tuple[int, int]]:
+        """玩家所有可见格子"""
+        mask = self.visibility_mask(player_id)
+        if self._use_arrays():
+            ys, xs = np.nonzero(mask)
+            return set(zip(xs.tolist(), ys.tolist()))
+        return {(x, y) for y, row in enumerate(mask) for x, visible in enumerate(row) if visible}
+
+    def detection_field(self, player_id: int):
+        """玩家的侦察强度场（只在该玩家单位变化后重算）"""
+        units = self.game_state.units
+        key = (self.game_state.game_map, units, units.owner_version(player_id))
+        cached = self._detection.get(player_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        field = self._build_field(self._vision_seeds(player_id, with_detection=True))
+        self._detection[player_id] = (key, field)
+        return field
+
+    def can_see_unit(self, player_id: int, unit) -> bool:
+        """玩家能否发现某单位：领土内始终可见，否则比较侦察强度与隐蔽值"""
+        game_map = self.game_state.game_map
+        if game_map.get_territory_owner(unit.x, unit.y) == player_id:
+            return True
+        x, y = unit.x, unit.y
+        if not (0 <= x < game_map.width and 0 <= y < game_map.height):
+            # 地图外的单位不在强度场内，逐个比较观察方单位
+            for observer in self.game_state.units.owned_by(player_id):
+                if observer.is_alive():
+                    effective_range = unit_vision_range(observer) + observer.detection - unit.stealth
+                    if abs(observer.x - x) + abs(observer.y - y) <= effective_range:
+                        return True
+            return False
+        field = self.detection_field(player_id)
+        if self._use_arrays():
+            return bool(field[y, x] >= unit.stealth)
+        return field[y][x] >= unit.stealth
+
+    def visible_units(self, player_id: int, units: Iterable) -> Set[int]:
+        """批量判断玩家能发现units中的哪些单位，返回其ID（与逐个can_see_unit结果相同）"""
+        if not self._use_arrays():
+            return {unit.id for unit in units if self.can_see_unit(player_id, unit)}
+        game_map = self.game_state.game_map
+        visible = set()
+        inside = []
+        for unit in units:
+            if 0 <= unit.x < game_map.width and 0 <= unit.y < game_map.height:
+                inside.append(unit)
+            elif self.can_see_unit(player_id, unit):
+                visible.add(unit.id)
+        if inside:
+            xs = np.fromiter((unit.x for unit in inside), dtype=np.intp, count=len(inside))
+            ys = np.fromiter((unit.y for unit in inside), dtype=np.intp, count=len(inside))
+            stealth = np.fromiter((unit.stealth for unit in inside), dtype=np.int32, count=len(inside))
+            seen = game_map.territory_mask(player_id)[ys, xs] | (self.detection_field(player_id)[ys, xs] >= stealth)
+            visible.update(unit.id for unit, hit in zip(inside, seen.tolist()) if hit)
+        return visible
+
+    def _all_unit_arrays(self):
+        """所有单位的 (ID, 所属玩家, x, y, 隐蔽值) 数组，各玩家共用，单位增删或移动后重建"""
+        units = self.game_state.units
+        key = (units, units.version())
+        if self._unit_arrays is None or self._unit_arrays[0] != key:
+            rows = [(unit.id, unit.owner_id, unit.x, unit.y, unit.stealth) for unit in units]
+            columns = np.array(rows, dtype=np.int64).reshape(-1, 5).T
+            self._unit_arrays = (key, columns)
+        return self._unit_arrays[1]
+
+    def visible_enemies(self, player_id: int) -> Set[int]:
+        """玩家能发现的所有敌方单位ID（与逐个can_see_unit结果相同）"""
+        units = self.game_state.units
+        if not self._use_arrays():
+            return self.visible_units(player_id, [unit for unit in units if unit.owner_id != player_id])
+        game_map = self.game_state.game_map
+        ids, owners, xs, ys, stealth = self._all_unit_arrays()
+        enemy = owners != player_id
+        inside = (xs >= 0) & (xs < game_map.width) & (ys >= 0) & (ys < game_map.height)
+        on_map = enemy & inside
+        xs, ys = xs[on_map], ys[on_map]
+        seen = game_map.territory_mask(player_id)[ys, xs] | (self.detection_field(player_id)[ys, xs] >= stealth[on_map])
+        visible = set(ids[on_map][seen].tolist())
+        # 地图外的敌方单位逐个判断
+        off_map = [units.get(unit_id) for unit_id in ids[enemy & ~inside].tolist()]
+        return visible | self.visible_units(player_id, off_map)
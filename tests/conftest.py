@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""测试公共设置：游戏模块以game目录为根导入"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'game'))
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""测试用的固定种子对局"""
+
+import random
+
+from config import UNITS
+from game_state import GameState
+
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+BUILDING_TYPES = ('factory', 'city', 'barracks', 'train_station', 'mobile_launcher', 'nuclear_interceptor')
+
+
+def new_game(seed: int = 1, players: int = 3, width: int = 40, height: int = 24) -> GameState:
+    """初始化对局，玩家资源充足，便于生产和行动"""
+    random.seed(seed)
+    state = GameState()
+    state.initialize_game([f'P{i}' for i in range(players)], map_seed=seed, map_width=width, map_height=height)
+    for player in state.players.values():
+        player.economy = 10 ** 6
+        player.population = 10 ** 5
+    return state
+
+
+def play_turn(state: GameState, rng: random.Random):
+    """所有玩家随机建造、升级、拆除、生产、拆分、移动和攻击，然后结束回合"""
+    for pid in sorted(state.players):
+        player = state.players[pid]
+        x = player.capital_x + rng.randint(-3, 3)
+        y = player.capital_y + rng.randint(-3, 3)
+        action = rng.random()
+        if action < 0.5:
+            state.build(pid, rng.choice(BUILDING_TYPES), x, y)
+        elif action < 0.7:
+            state.upgrade_building(pid, x, y)
+        elif action < 0.8:
+            state.demolish_building(pid, x, y)
+        for launcher in state.get_player_launchers(pid):
+            dx, dy = rng.choice(DIRECTIONS)
+            state.move_mobile_launcher(pid, launcher.x, launcher.y, launcher.x + dx, launcher.y + dy)
+        state.produce_unit(pid, rng.choice(sorted(UNITS)), rng.randint(1, 5), player.capital_x, player.capital_y)
+        for unit in sorted(state.units.owned_by(pid), key=lambda u: u.id):
+            if not unit.is_alive():
+                continue
+            if unit.count > 1 and rng.random() < 0.3:
+                state.split_unit(pid, unit.id, rng.randint(1, unit.count - 1))
+            dx, dy = rng.choice(DIRECTIONS)
+            if rng.random() < 0.8:
+                state.move_unit(pid, unit.id, unit.x + dx, unit.y + dy)
+            else:
+                state.attack(pid, unit.id, unit.x + dx, unit.y + dy)
+        player.ready_for_next_turn = True
+    state.process_turn()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""领土游程编码往返：列表地图与数组地图结果一致"""
+
+import random
+
+import pytest
+
+import map_generator
+from map_generator import ArrayGameMap, GameMap
+
+MAP_CLASSES = [GameMap]
+if map_generator.np is not None:
+    MAP_CLASSES.append(ArrayGameMap)
+
+
+def random_territory(game_map, seed: int):
+    rng = random.Random(seed)
+    for _ in range(game_map.width * game_map.height // 2):
+        x, y = rng.randrange(game_map.width), rng.randrange(game_map.height)
+        game_map.set_territory(x, y, rng.choice([None, 0, 1, 2, 3]))
+    # 一段长于255格的同主领土，覆盖游程拆分
+    for x in range(game_map.width):
+        for y in range(4):
+            game_map.set_territory(x, y, 2)
+
+
+@pytest.mark.parametrize('source_cls', MAP_CLASSES)
+@pytest.mark.parametrize('target_cls', MAP_CLASSES)
+def test_encode_territory_round_trip(source_cls, target_cls):
+    source = source_cls(90, 30)
+    random_territory(source, seed=1)
+    target = target_cls(90, 30)
+    target.load_encoded_territory(source.encode_territory())
+    assert target.get_territory_rows() == source.get_territory_rows()
+
+
+@pytest.mark.parametrize('map_cls', MAP_CLASSES)
+def test_encode_territory_matches_list_map(map_cls):
+    reference = GameMap(50, 20)
+    game_map = map_cls(50, 20)
+    random_territory(reference, seed=2)
+    random_territory(game_map, seed=2)
+    assert game_map.encode_territory() == reference.encode_territory()
+
+
+@pytest.mark.parametrize('map_cls', MAP_CLASSES)
+def test_load_encoded_territory_resets_counts(map_cls):
+    source = GameMap(30, 10)
+    random_territory(source, seed=3)
+    game_map = map_cls(30, 10)
+    game_map.load_encoded_territory(source.encode_territory())
+    for player_id in range(4):
+        expected = sum(row.count(player_id) for row in source.get_territory_rows())
+        assert game_map.count_territory(player_id) == expected
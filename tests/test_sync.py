@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""增量同步往返：客户端从完整状态出发逐版本应用变更集，校验和始终与服务器一致"""
+
+import json
+import random
+
+import pytest
+
+from buildings import create_building
+from config import UNITS
+from game_state import GameState
+from sync import StateTracker, apply_delta, collect_changes, state_checksum
+from units import Unit
+from helpers import new_game, play_turn
+
+
+def transfer(data):
+    """模拟网络传输（JSON往返）"""
+    return json.loads(json.dumps(data))
+
+
+@pytest.mark.parametrize('fog', [False, True])
+def test_apply_delta_tracks_server_checksum(fog):
+    server = new_game(seed=3)
+    player_ids = sorted(server.players) if fog else [None]
+    trackers = {pid: StateTracker(server, pid) for pid in player_ids}
+    clients = {pid: GameState.from_dict(transfer(tracker.state_dict())) for pid, tracker in trackers.items()}
+    for pid, tracker in trackers.items():
+        assert state_checksum(clients[pid]) == tracker.checksum()
+
+    rng = random.Random(3)
+    for _ in range(15):
+        play_turn(server, rng)
+        shared = collect_changes(server)
+        for pid, tracker in trackers.items():
+            changes = tracker.make_delta(shared)
+            if changes is not None:
+                apply_delta(clients[pid], transfer(changes))
+            assert state_checksum(clients[pid]) == tracker.checksum()
+
+
+def test_apply_delta_is_idempotent():
+    server = new_game(seed=5)
+    tracker = StateTracker(server)
+    client = GameState.from_dict(transfer(tracker.state_dict()))
+    play_turn(server, random.Random(5))
+    changes = transfer(tracker.make_delta())
+    apply_delta(client, changes)
+    apply_delta(client, changes)
+    assert state_checksum(client) == tracker.checksum()
+
+
+def test_checksum_detects_divergence():
+    server = new_game(seed=7)
+    tracker = StateTracker(server)
+    client = GameState.from_dict(transfer(tracker.state_dict()))
+    unit = next(iter(client.units))
+    unit.count += 1
+    assert state_checksum(client) != tracker.checksum()
+
+
+def test_apply_delta_drains_client_territory_changes():
+    server = new_game(seed=9)
+    tracker = StateTracker(server)
+    client = GameState.from_dict(transfer(tracker.state_dict()))
+    server.game_map.set_territory(0, 0, 1)
+    apply_delta(client, transfer(tracker.make_delta()))
+    assert client.game_map.get_territory_owner(0, 0) == 1
+    assert client.game_map.take_territory_changes() == []
+
+
+def test_building_changes_follow_moves_and_removal():
+    server = new_game(seed=11)
+    tracker = StateTracker(server)
+    client = GameState.from_dict(transfer(tracker.state_dict()))
+    player = server.players[0]
+    x, y = player.capital_x, player.capital_y + 2
+    launcher = create_building('mobile_launcher', x, y, 0)
+    station = create_building('train_station', x + 2, y, 0)
+    server.buildings.add(launcher)
+    server.buildings.add(station)
+    apply_delta(client, transfer(tracker.make_delta()))
+    assert state_checksum(client) == tracker.checksum()
+
+    launcher.move_to(x + 1, y)
+    server.buildings.update_position(launcher, x, y)
+    station.connected_buildings = []
+    station.connected_buildings.append([player.capital_x, player.capital_y])
+    apply_delta(client, transfer(tracker.make_delta()))
+    assert client.buildings.at(x, y) is None
+    assert client.buildings.at(x + 2, y).connected_buildings == [[player.capital_x, player.capital_y]]
+    assert state_checksum(client) == tracker.checksum()
+
+    server.buildings.remove(launcher)
+    apply_delta(client, transfer(tracker.make_delta()))
+    assert client.buildings.at(x + 1, y) is None
+    assert state_checksum(client) == tracker.checksum()
+
+
+def test_unchanged_state_produces_no_delta():
+    server = new_game(seed=13)
+    tracker = StateTracker(server)
+    unit = next(iter(server.units))
+    unit.remaining_moves = unit.remaining_moves
+    assert tracker.make_delta() is None
+    unit.count += 1
+    assert tracker.make_delta()['units'] == {'set': [unit.to_dict()]}
+
+
+def test_fog_view_follows_enemy_moves():
+    server = new_game(seed=5)
+    viewer, enemy = 0, 1
+    scout = Unit(sorted(UNITS)[0], server.players[viewer].capital_x, server.players[viewer].capital_y, viewer)
+    intruder = Unit(sorted(UNITS)[0], server.players[enemy].capital_x, server.players[enemy].capital_y, enemy)
+    server.units.add(scout)
+    server.units.add(intruder)
+    tracker = StateTracker(server, viewer)
+    client = GameState.from_dict(transfer(tracker.state_dict()))
+    key = server.visibility.cache_key(viewer)
+
+    rng = random.Random(5)
+    seen = set()
+    for _ in range(30):
+        intruder.x = rng.randrange(server.game_map.width)
+        intruder.y = rng.randrange(server.game_map.height)
+        server.units.update_position(intruder)
+        changes = tracker.make_delta()
+        if changes is not None:
+            apply_delta(client, transfer(changes))
+        visible = server.can_see_unit(viewer, intruder)
+        seen.add(visible)
+        assert (client.units.get(intruder.id) is not None) == visible
+        assert state_checksum(client) == tracker.checksum()
+    assert server.visibility.cache_key(viewer) == key
+    assert seen == {True, False}
+
+
+def test_player_view_hides_other_players_private_fields():
+    server = new_game(seed=7)
+    tracker = StateTracker(server, 0)
+    players = transfer(tracker.state_dict())['players']
+    assert players['0']['economy'] == server.players[0].economy
+    assert players['1']['economy'] is None and players['1']['pop_cap'] is None
+    assert players['1']['capital_x'] == server.players[1].capital_x
+
+    server.players[1].economy += 100
+    assert tracker.make_delta() is None
+    server.players[0].economy += 100
+    server.players[1].ready_for_next_turn = True
+    delta = tracker.make_delta()
+    assert [p['id'] for p in delta['players']] == [0, 1]
+    assert delta['players'][1]['economy'] is None
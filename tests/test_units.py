@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""单位按列序列化往返"""
+
+import json
+
+from units import Unit, select_unit_columns, units_from_columns, units_to_columns
+
+
+def make_units():
+    units = [Unit('basic_infantry', x, x % 3, x % 2, count=x + 1) for x in range(6)]
+    units[1].remaining_moves = 0
+    units[2].selected = True
+    units[3].set_attack_direction(0, -1)
+    units[4].set_defense_direction(1, 0)
+    units[5].set_target(3, 4)
+    return units
+
+
+def as_json(units):
+    """单位经JSON传输后的样子（方向和目标元组变为列表）"""
+    return json.loads(json.dumps([u.to_dict() for u in units]))
+
+
+def test_units_columns_round_trip():
+    units = make_units()
+    restored = units_from_columns(units_to_columns(units))
+    assert [u.to_dict() for u in restored] == [u.to_dict() for u in units]
+    assert restored[3].attack_direction == (0, -1)
+    assert restored[4].defense_direction == (1, 0)
+
+
+def test_units_columns_json_round_trip():
+    units = make_units()
+    restored = units_from_columns(json.loads(json.dumps(units_to_columns(units))))
+    assert as_json(restored) == as_json(units)
+
+
+def test_units_columns_only_record_non_default_extra():
+    columns = units_to_columns(make_units())
+    assert sorted(columns['extra']) == ['2', '3', '4', '5']
+    assert columns['types'] == ['basic_infantry']
+
+
+def test_select_unit_columns_keeps_extra_rows():
+    units = make_units()
+    columns = units_to_columns(units)
+    restored = units_from_columns(select_unit_columns(columns, [0, 2, 5]))
+    assert as_json(restored) == as_json(units[i] for i in (0, 2, 5))
+
+
+def test_units_from_columns_advances_next_id():
+    columns = units_to_columns(make_units())
+    columns['id'][0] = Unit._next_id + 100
+    units_from_columns(columns)
+    assert Unit('basic_infantry', 0, 0, 0).id > columns['id'][0]